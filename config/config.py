@@ -1,12 +1,166 @@
+import os
+
 # 相机配置 - 可根据实际摄像头调整
 CAMERA_WIDTH = 640      # 摄像头分辨率宽度
 CAMERA_HEIGHT = 480     # 摄像头分辨率高度
 CAMERA_FPS = 30         # 摄像头帧率
 
+# 相机采集线程配置 - 消费者较慢时丢弃过期帧
+CAMERA_CAPTURE = {
+    'threaded': True,       # 是否使用后台采集线程
+    'ring_size': 4,         # 环形缓冲区帧数
+    'max_frame_age': 0.2,   # 帧最大有效时长(秒)，超过视为过期
+    'read_timeout': 1.0     # 等待新帧的超时时间(秒)
+}
+
 # 人脸识别配置 - 可根据识别效果调整
 FACE_DETECTION_CONFIDENCE = 0.5  # 人脸检测置信度阈值
 FACE_RECOGNITION_THRESHOLD = 0.6 # 人脸识别匹配阈值
 
+# 人脸质量评估配置 - 指标在缩放到crop_size的灰度小图上计算
+FACE_QUALITY = {
+    'min_face_size': 60,        # 人脸最小边长(像素)，达到即得满分
+    'min_brightness': 60,       # 亮度下限
+    'max_brightness': 200,      # 亮度上限
+    'min_sharpness': 100,       # 拉普拉斯方差达到该值即得满分
+    'crop_size': 64,            # 评估用小图边长
+    'weights': {'size': 0.3, 'brightness': 0.3, 'sharpness': 0.4},
+    'confidence_threshold': 0.7 # 总分达到该值才进行识别
+}
+
+# 活体检测配置 - 每个人脸轨迹独立检测，得出结论后缓存
+LIVENESS_DETECTION = {
+    'check_interval': 0.2,      # 同一轨迹两次检测的最小间隔(秒)
+    'threshold': 0.5,           # 综合得分阈值
+    'blink_threshold': 0.21,    # 眼睛纵横比低于该值视为闭眼
+    'head_move_threshold': 1.5, # 特征点平均位移(像素)
+    'mouth_threshold': 0.02,    # 归一化嘴部形状变化
+    'max_checks': 30,           # 检测多少次仍未通过即判定为非活体
+    'verdict_ttl': 10.0,        # 结论缓存时长(秒)，过期后重新检测
+    'session_ttl': 2.0          # 会话超过该时长(秒)未出现即移除，未启用跟踪时按身份保存的会话靠它清理
+}
+
+# 纹理防伪配置 - 在特征点包围盒缩放后的小图上计算
+TEXTURE_ANALYSIS = {
+    'crop_size': 64,                # 分析用小图边长
+    'high_freq_cutoff': 0.25,       # 高频区域的归一化频率下限(周期/像素)
+    'high_freq_threshold': 0.05,    # 高频能量占比达到该值得满分
+    'lbp_entropy_threshold': 5.0    # LBP直方图熵(比特)达到该值得满分
+}
+
+# 人脸库配置
+FACE_DATABASE = {
+    'gallery_dir': 'data/face_gallery',     # 内存映射人脸库目录
+    'legacy_file': 'face_database.pkl',     # 旧版pickle人脸库，首次启动时自动迁移
+    'embedding_dim': 128                    # 特征维度
+}
+
+# 人脸特征匹配配置
+FACE_MATCHER = {
+    'chunk_size': 8192,     # 每块模板数，限制距离矩阵的内存占用
+    'aggregate': 'min',     # 同一身份多个模板的距离聚合方式: min / mean
+    'delta_compact_size': 64,   # 增量缓冲区达到该模板数时在后台合并进主索引
+    'storage': 'float32',       # 主索引存储模式: float32 / float16 / int8 / pq，压缩模式固定按最小距离聚合
+    'rerank_candidates': 32,    # 压缩模式下用原始特征精确重排的候选模板数
+    'pq_subspaces': 16          # 乘积量化的分段数，需整除特征维度
+}
+
+# 人脸跟踪配置 - 检测间隔越大帧率越高，但新出现的人脸发现越慢
+FACE_TRACKING = {
+    'enabled': True,                # 是否启用检测-跟踪模式
+    'detect_interval': 10,          # 每隔多少帧运行一次完整检测
+    'min_tracker_confidence': 7.0,  # 跟踪置信度(PSR)低于该值时立即重新检测
+    'iou_threshold': 0.3,           # 检测框与轨迹关联的最小交并比
+    'confirm_frames': 3,            # 多帧确认所需帧数
+    'tracking_threshold': 0.5,      # 多帧确认的平均距离阈值
+    'state_ttl': 5.0,               # 轨迹超过该时间(秒)未出现即清除其确认状态
+    'max_tracks': 32                # 同时保留确认状态的轨迹上限
+}
+
+# 人脸特征编码缓存 - 同一轨迹在以下条件外复用上次的编码
+FACE_EMBEDDING_CACHE = {
+    'enabled': True,
+    'refresh_interval': 2.0,    # 最长复用时间(秒)
+    'max_scale_change': 0.25,   # 人脸尺寸相对变化超过该值时重新编码
+    'max_yaw_change': 0.15,     # 偏航估计变化超过该值时重新编码
+    'borderline_margin': 0.05   # 匹配距离距识别阈值小于该值时每帧重新编码
+}
+
+# 行为检测配置 - 【重要】模型文件需通过scripts/download_models.py准备
+BEHAVIOR_CLASSES = ['normal', 'fall', 'violence', 'running']  # 行为类别，顺序与模型输出一致
+
+BEHAVIOR_DETECTION = {
+    'model_path': 'models/behavior/fall_detection_model.pth',        # 行为分类模型权重(state_dict)
+    'backbone': 'resnet50',         # 骨干网络: resnet50 / resnet18 / mobilenet_v2 / mobilenet_v3_small，权重需与之匹配
+    'backend': 'torchscript',       # 推理后端: eager / torchscript(冻结) / int8(动态量化) / onnx(OpenCV DNN)
+    'torchscript_path': 'models/behavior/fall_detection_model.pt',   # 由ModelManager导出(附.json元数据)，不存在或与backbone不符时启动时现场trace
+    'onnx_path': 'models/behavior/fall_detection_model.onnx',        # 由ModelManager导出(附.json元数据)，onnx后端必需，元数据不符时报错
+    'pose_model_path': 'models/behavior/pose_estimation_model.pth',  # 姿态估计模型
+    'detection_interval': 0.5,  # 两次检测的最小间隔(秒)
+    'fall_threshold': 0.7,      # 跌倒判定置信度阈值，超过后才运行姿态估计确认
+    'pose_input_size': (368, 368),  # 姿态估计输入尺寸(宽, 高)，越小越快、关键点越粗
+    'pose_confidence': 0.1,     # 关键点热图峰值低于该值视为未检测到
+    'person_detector': 'hog',   # 人员检测: None(整帧分类) / hog / ssd，检测不到人员时退回整帧
+    'person_config_path': 'models/behavior/MobileNetSSD_deploy.prototxt',     # ssd模型结构
+    'person_model_path': 'models/behavior/MobileNetSSD_deploy.caffemodel',    # ssd模型权重
+    'person_confidence': 0.5,   # ssd人员置信度阈值
+    'person_detect_width': 320, # hog检测前把帧缩小到的宽度
+    'max_persons': 4,           # 每帧最多分类的人数
+    'full_frame_interval': 5,   # 检测到人员时每隔多少帧仍对整帧分类一次(找HOG漏检的倒地者)，0为关闭
+    'person_margin': 0.15,      # 人员框四周扩展的比例
+    'person_iou_threshold': 0.3,    # 相邻检测中同一人员框的最小交并比
+    'person_ttl': 5.0,          # 人员超过该时间(秒)未出现即清除其行为历史
+    'abnormal_threshold': 0.8,  # 其他异常行为置信度阈值
+    'min_detection_frames': 3,  # 连续多少次检测到异常才报警
+    'queue_size': 2,            # 待推理帧队列长度，满时丢弃最旧的帧
+    'max_batch_size': 1,        # 推理线程一次最多合并的帧数
+    'result_queue_size': 16     # 结果队列长度，满时丢弃最旧的结果
+}
+
+# 运动门控 - 画面静止时降低人脸和行为检测频率以节省CPU和电量
+MOTION_GATE = {
+    'enabled': True,
+    'size': (80, 60),           # 差分用的缩小尺寸(宽, 高)
+    'pixel_threshold': 25,      # 灰度差超过该值的像素视为变化
+    'min_area': 0.01,           # 变化像素占比超过该值即认为有运动
+    'background_alpha': 0.05,   # 背景滑动平均的更新速率
+    'hold_time': 3.0,           # 运动停止后继续按正常频率运行的时间(秒)
+    'idle_interval': {          # 静止时各阶段的运行间隔(秒)
+        'face': 2.0,
+        'behavior': 5.0
+    }
+}
+
+# 报警配置
+ALERT_CONFIG = {
+    'alert_sound': 'sounds/alert.wav',  # 报警提示音
+    'alert_interval': 30                # 两次报警的最小间隔(秒)
+}
+
+# 计算资源调度 - 按子系统分配CPU核心和线程数，避免在4核设备上过度订阅
+# priority越小优先级越高，nice值 = priority * nice_step；cores为允许运行的CPU编号
+COMPUTE_SCHEDULER = {
+    'enabled': True,
+    'nice_step': 5,             # 每降低一级优先级增加的nice值
+    'opencv_threads': 2,        # OpenCV内部线程池大小（全局）
+    'native_threads': 2,        # OpenMP/BLAS线程池大小，启动前通过环境变量设置
+    'starvation_warning': 0.3,  # 就绪等待时间占比超过该值时告警
+    'subsystems': {
+        'control':    {'priority': 0, 'cores': [0, 1], 'threads': 1},  # 主循环：跟随控制和人脸识别
+        'camera':     {'priority': 0, 'cores': [0], 'threads': 1},     # 摄像头采集线程
+        'speech':     {'priority': 1, 'cores': [1], 'threads': 1},     # 语音监听
+        'behavior':   {'priority': 2, 'cores': [2, 3], 'threads': 2},  # 行为推理，threads为torch线程数
+        'background': {'priority': 3, 'cores': [1], 'threads': 1}      # 提醒检查、系统监控
+    }
+}
+
+# 系统状态监控 - 定期记录温度、电量、资源占用和各子系统的CPU争用
+SYSTEM_STATUS = {
+    'status_interval': 60,      # 检查间隔(秒)，每次同时输出CPU争用报告
+    'battery_warning': 20,      # 电量低于该百分比时语音提醒
+    'temp_warning': 75          # CPU温度高于该值(°C)时语音提醒
+}
+
 # PID控制参数 - 需要根据小车实际运动效果调整
 PID_KP = 0.8   # 比例系数:控制响应速度
 PID_KI = 0.05  # 积分系数:消除稳态误差
@@ -47,6 +201,69 @@ MICROPHONE_INDEX = 0    # 麦克风设备索引
 WAKE_WORD = "小车"      # 唤醒词
 LANGUAGE = "zh-CN"      # 语音识别语言
 
+# 常驻麦克风采集流
+AUDIO_STREAM = {
+    'buffer_seconds': 30,   # 环形缓冲区时长(秒)，识别调用期间的音频保存在这里
+    'pre_roll': 0.5,        # 新读者从多少秒之前开始读取，避免截掉第一个字
+    'max_command_age': 3.0  # 识别完成时语音已结束超过该时长(秒)的命令不再执行
+}
+
+# 语音命令: 唤醒词后的短语 -> 命令类型
+VOICE_COMMANDS = {
+    '跟着我': 'follow',
+    '停下': 'stop',
+    '你好': 'greeting',
+    '再见': 'goodbye',
+    '聊天': 'chat_mode',
+    '设置提醒': 'set_reminder',
+    '查看提醒': 'list_reminders',
+    '删除提醒': 'delete_reminder'
+}
+
+# 语音合成配置
+SPEECH_RATE = 150       # 语速(字/分钟)
+SPEECH_VOLUME = 80      # 音量(0-100)
+
+# 语音回复
+VOICE_RESPONSES = {
+    'greeting': ['你好！', '你好，有什么可以帮你的？'],
+    'goodbye': ['再见！', '下次见！'],
+    'command_accepted': '好的，执行{}',
+    'command_rejected': '抱歉，我没有听懂这个命令',
+    'error': '语音服务出现问题，请稍后再试',
+    'battery_low': '电量不足，请及时充电',
+    'temp_high': '系统温度过高'
+}
+
+# 本地语音前端：VAD和唤醒词检测通过后才调用云端识别
+VOICE_FRONTEND = {
+    'enabled': True,
+    'sample_rate': 16000,
+    'vad': 'energy',             # energy / webrtc(需要安装webrtcvad)
+    'vad_frame_ms': 30,          # VAD帧长(毫秒)，webrtc只支持10/20/30
+    'energy_ratio': 3.0,         # 帧能量超过噪声底的倍数视为语音
+    'min_energy': 0.01,          # 语音帧的最低RMS(满幅为1)
+    'webrtc_aggressiveness': 2,  # 0-3，越大越严格
+    'min_speech_ms': 200,        # 短语中语音帧总时长低于此值视为噪声
+    'spotter': 'snowboy',        # snowboy / template / none，不可用时依次退回
+    'snowboy_resource': 'models/voice/common.res',
+    'snowboy_sensitivity': 0.5,
+    'template_dir': 'models/voice/wake_word',  # template方式的唤醒词录音(16位WAV)
+    'template_threshold': 25.0,  # 归一化DTW距离阈值，越小越严格
+    'wake_window': 5.0           # 唤醒后多少秒内的短语无需再说唤醒词
+}
+
+# 语音识别后端
+ASR_CONFIG = {
+    'backend': 'vosk',           # google(云端) / vosk(本地流式，模型见model_config)
+    'fallback': 'google',        # 首选后端不可用时使用
+    'sample_rate': 16000,        # 整段识别时转换到的采样率
+    'partial_commands': True,    # 流式识别的部分结果已构成命令时立即执行
+    'pause_threshold': 0.8,      # 流式识别时停顿多少秒视为说完
+    'pre_roll': 0.3,             # 语音开始前保留的音频(秒)，避免截掉第一个字
+    'gate_seconds': 1.0          # 流式识别前先交给本地前端判定的音频长度(秒)，需覆盖唤醒词
+}
+
 # OpenAI配置 - 【重要】需要配置自己的API密钥
 OPENAI_CONFIG = {
     'api_key': 'your_api_key_here',  # OpenAI API密钥
@@ -33,6 +33,11 @@ MODEL_CONFIG = {
             'name': 'snowboy_model.pmdl',
             'url': 'your_model_url',  # 需要配置自己的模型URL
             'path': 'models/voice/snowboy_model.pmdl'
+        },
+        'asr': {
+            'name': 'vosk-model-small-cn-0.22',
+            'url': 'https://alphacephei.com/vosk/models/vosk-model-small-cn-0.22.zip',
+            'path': 'models/voice/vosk-model-small-cn-0.22'
         }
     }
 }
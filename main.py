@@ -1,3 +1,7 @@
+# 限制原生线程池大小，必须在导入numpy/torch/dlib之前
+from modules.system.compute_scheduler import ComputeScheduler, limit_native_threads
+limit_native_threads()
+
 from modules.utils.camera import Camera
 from modules.face_recognition.face_detector import FaceDetector
 from modules.motion_control.pid_controller import PIDController
@@ -8,6 +12,9 @@ from modules.utils.logger import Logger
 from modules.ai.chat_assistant import ChatAssistant
 from modules.behavior.behavior_detector import BehaviorDetector
 from modules.assistant.reminder_manager import ReminderManager
+from modules.system.status_monitor import SystemMonitor
+from modules.utils.motion_gate import MotionGate
+from config.config import MOTION_GATE
 import cv2
 import time
 import asyncio
@@ -15,11 +22,16 @@ import asyncio
 async def main():
     logger = Logger.get_logger("Main")
     logger.info("Starting robot control system")
+    # 主循环（跟随控制和人脸识别）优先级最高，需在创建其他线程前设置，
+    # 未单独注册的线程会继承主线程的CPU亲和性
+    ComputeScheduler.get().register_thread('control')
     
     try:
         # 初始化各个组件
         camera = Camera()                    # 初始化摄像头
-        face_detector = FaceDetector()       # 初始化人脸检测器
+        # 运动门控，人脸和行为检测共用，画面静止时降低检测频率
+        motion_gate = MotionGate() if MOTION_GATE['enabled'] else None
+        face_detector = FaceDetector(motion_gate) # 初始化人脸检测器
         pid_controller = PIDController()     # 初始化PID控制器
         motor_controller = MotorController() # 初始化电机控制器
         ultrasonic = MultiUltrasonicSensor() # 初始化超声波传感器
@@ -30,12 +42,15 @@ async def main():
         speech_recognizer.set_chat_assistant(chat_assistant)
         
         # 初始化行为检测器 - 确保模型文件存在
-        behavior_detector = BehaviorDetector(speech_recognizer)
+        behavior_detector = BehaviorDetector(speech_recognizer, motion_gate=motion_gate)
         
         # 初始化提醒管理器 - 确保数据库目录可写
         reminder_manager = ReminderManager(speech_recognizer)
         speech_recognizer.reminder_manager = reminder_manager
         
+        # 系统状态监控，定期记录资源占用和各子系统的CPU争用
+        system_monitor = SystemMonitor(speech_recognizer)
+        
         follow_mode = True  # 默认启动跟随模式
         logger.info("System initialized successfully")
         
@@ -50,6 +65,8 @@ async def main():
         camera.release()
         motor_controller.cleanup()
         reminder_manager.cleanup()
+        system_monitor.cleanup()
+        speech_recognizer.cleanup()
         cv2.destroyAllWindows()
 
 if __name__ == '__main__':
@@ -5,6 +5,7 @@ import time
 import random
 from config.config import REMINDER_CONFIG, REMINDER_TYPES
 from modules.utils.logger import Logger
+from modules.system.compute_scheduler import ComputeScheduler
 
 class ReminderManager:
     def __init__(self, speech_recognizer):
@@ -107,6 +108,7 @@ class ReminderManager:
     
     def _check_reminders_loop(self):
         """检查提醒的循环"""
+        ComputeScheduler.get().register_thread('background')
         while self.running:
             try:
                 current_time = datetime.datetime.now()
@@ -1,65 +1,108 @@
 import torch
-import torch.nn as nn
 import numpy as np
 import cv2
-from torchvision import transforms
 from config.config import BEHAVIOR_DETECTION, BEHAVIOR_CLASSES, ALERT_CONFIG
 from modules.utils.logger import Logger
+from .behavior_model import INPUT_SIZE
+from .inference_backends import load_behavior_model
+from .preprocessing import FramePreprocessor
+from .person_detector import PersonDetector, PersonTracks
+from modules.utils.perf import StageStats
+from modules.utils.motion_gate import GATE_SKIP
+from modules.system.compute_scheduler import ComputeScheduler
+import collections
+import queue
 import time
 import threading
 import pygame
 
-class BehaviorDetectionModel(nn.Module):
-    def __init__(self):
-        super(BehaviorDetectionModel, self).__init__()
-        # 使用预训练的ResNet作为特征提取器
-        self.backbone = torch.hub.load('pytorch/vision:v0.10.0', 
-                                     'resnet50', pretrained=True)
-        # 修改最后的全连接层以适应行为分类
-        num_features = self.backbone.fc.in_features
-        self.backbone.fc = nn.Sequential(
-            nn.Linear(num_features, 512),
-            nn.ReLU(),
-            nn.Dropout(0.5),
-            nn.Linear(512, len(BEHAVIOR_CLASSES))
-        )
-        
-    def forward(self, x):
-        return self.backbone(x)
-
 class BehaviorDetector:
-    def __init__(self, speech_recognizer):
+    """行为检测
+
+    主循环调用submit_frame提交帧后立即返回，推理在监控线程中完成：帧队列有界，
+    满时丢弃最旧的帧（只保留最新画面），可选地把多帧合成一个批次推理。结果
+    写入results队列并调用on_result回调。报警随结果发布（'alert'字段），语音播报
+    交给语音识别线程（SpeechRecognizer.announce），监控线程从不调用阻塞的TTS。
+    detect_behavior保留同步接口，供离线回放使用。
+    """
+    def __init__(self, speech_recognizer=None, on_result=None, motion_gate=None):
         self.logger = Logger.get_logger("BehaviorDetector")
         self.speech = speech_recognizer
+        self.on_result = on_result  # 回调: on_result(result_dict)，在监控线程中调用
+        self.motion_gate = motion_gate  # 运动门控，画面静止时降低检测频率
         self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
         
-        # 加载行为检测模型
-        self.model = BehaviorDetectionModel()
-        self.model.load_state_dict(torch.load(BEHAVIOR_DETECTION['model_path']))
-        self.model.to(self.device)
-        self.model.eval()
+        # torch线程池按behavior子系统的预算设置，需在创建模型前完成
+        self.scheduler = ComputeScheduler.get()
+        self.scheduler.configure_torch()
+        
+        # 按配置创建推理后端，并记录到首次推理完成的耗时
+        start = time.perf_counter()
+        self.model = load_behavior_model(self.device)
+        load_time = time.perf_counter() - start
+        self.model(torch.zeros(1, 3, INPUT_SIZE, INPUT_SIZE))
+        total_time = time.perf_counter() - start
+        self.startup_stats = {
+            'backend': self.model.name,
+            'backbone': BEHAVIOR_DETECTION['backbone'],
+            'load_ms': load_time * 1000,
+            'first_inference_ms': (total_time - load_time) * 1000,
+            'time_to_first_inference_ms': total_time * 1000
+        }
+        self.logger.info(
+            f"Behavior model ready ({self.startup_stats['backbone']}/{self.startup_stats['backend']}): "
+            f"load {self.startup_stats['load_ms']:.0f}ms, "
+            f"first inference {self.startup_stats['first_inference_ms']:.0f}ms"
+        )
         
         # 初始化姿态估计器
         self.pose_estimator = self._init_pose_estimator()
         
-        # 图像预处理
-        self.transform = transforms.Compose([
-            transforms.ToPILImage(),
-            transforms.Resize((224, 224)),
-            transforms.ToTensor(),
-            transforms.Normalize(mean=[0.485, 0.456, 0.406],
-                              std=[0.229, 0.224, 0.225])
-        ])
+        # 人员检测：分类器只处理人员区域，每人保留独立的行为历史
+        self.person_detector = None
+        if BEHAVIOR_DETECTION['person_detector']:
+            try:
+                self.person_detector = PersonDetector()
+            except (cv2.error, AttributeError) as e:
+                # 模型文件缺失或OpenCV版本不带HOG时退回整帧分类
+                self.logger.warning(f"Person detector unavailable, classifying full frames: {str(e)}")
+        self.person_tracks = PersonTracks()
+        self.person_frames = 0  # 检测到人员的帧数，用于按间隔附加整帧分类
+        
+        # 图像预处理，复用预分配的输入缓冲区，一个批次可容纳每帧的全部人员
+        self.max_batch_size = max(1, BEHAVIOR_DETECTION['max_batch_size'])
+        # 偶尔附加的整帧区域超出容量时由_process_batch分块推理
+        crops_per_frame = BEHAVIOR_DETECTION['max_persons'] if self.person_detector is not None else 1
+        self.preprocessor = FramePreprocessor(batch_size=self.max_batch_size * crops_per_frame)
+        # 预处理缓冲区、姿态网络和检测历史由同步接口和监控线程共用
+        self.inference_lock = threading.Lock()
+        
+        # 帧队列（满时丢弃最旧的帧）和结果队列
+        self.frame_queue = collections.deque(maxlen=BEHAVIOR_DETECTION['queue_size'])
+        self.frame_ready = threading.Condition()
+        self.results = queue.Queue(maxsize=BEHAVIOR_DETECTION['result_queue_size'])
+        self.submitted_count = 0
+        self.dropped_count = 0
+        self.processed_count = 0
+        self.batch_count = 0
+        self.inference_stats = StageStats()
+        self.end_to_end_stats = StageStats()
+        self.pose_stats = StageStats()
+        self.person_stats = StageStats()
+        self.stats_lock = threading.Lock()
         
         # 状态变量
         self.last_detection_time = 0
-        self.detection_history = []
         self.last_alert_time = 0
         self.is_monitoring = True
         
-        # 初始化报警声音
-        pygame.mixer.init()
-        self.alert_sound = pygame.mixer.Sound(ALERT_CONFIG['alert_sound'])
+        # 初始化报警声音（没有音频设备时只记录日志）
+        try:
+            pygame.mixer.init()
+            self.alert_sound = pygame.mixer.Sound(ALERT_CONFIG['alert_sound'])
+        except pygame.error as e:
+            self.logger.warning(f"Alert sound unavailable: {str(e)}")
+            self.alert_sound = None
         
         # 启动监控线程
         self.monitor_thread = threading.Thread(target=self._monitor_loop)
@@ -70,65 +113,152 @@ class BehaviorDetector:
         """初始化姿态估计器"""
         return cv2.dnn.readNetFromTensorflow(BEHAVIOR_DETECTION['pose_model_path'])
     
-    def detect_behavior(self, frame):
-        """检测行为"""
+    def submit_frame(self, frame, frame_id=None):
+        """提交一帧给监控线程，不阻塞；未到检测间隔或被运动门控跳过时返回False"""
+        if not self._should_detect(frame, frame_id):
+            return False
+        
+        # 摄像头环形缓冲区中的帧会被覆盖，入队前复制
+        with self.frame_ready:
+            if len(self.frame_queue) == self.frame_queue.maxlen:
+                self.dropped_count += 1
+            self.frame_queue.append((time.perf_counter(), frame.copy()))
+            self.submitted_count += 1
+            self.frame_ready.notify()
+        return True
+    
+    def _should_detect(self, frame, frame_id=None):
+        """结合运动门控和检测间隔判断本帧是否检测"""
         current_time = time.time()
-        if current_time - self.last_detection_time < BEHAVIOR_DETECTION['detection_interval']:
-            return None
-            
+        ready = current_time - self.last_detection_time >= BEHAVIOR_DETECTION['detection_interval']
+        if self.motion_gate is not None:
+            # 运动刚开始时门控返回GATE_TRIGGER，不等待检测间隔
+            ready = self.motion_gate.check('behavior', frame, ready=ready, frame_id=frame_id) != GATE_SKIP
+        if not ready:
+            return False
         self.last_detection_time = current_time
+        return True
+    
+    def get_result(self):
+        """获取最新的检测结果，没有时返回None"""
+        try:
+            return self.results.get_nowait()
+        except queue.Empty:
+            return None
+    
+    def detect_behavior(self, frame, frame_id=None):
+        """同步检测行为（在调用线程中推理）"""
+        if not self._should_detect(frame, frame_id):
+            return None
         
         try:
-            # 姿态估计
-            pose_data = self._estimate_pose(frame)
-            
-            # 行为检测
-            with torch.no_grad():
-                # 预处理图像
-                image_tensor = self.transform(frame).unsqueeze(0).to(self.device)
-                
-                # 模型预测
-                outputs = self.model(image_tensor)
-                probabilities = torch.softmax(outputs, dim=1)
-                behavior_idx = torch.argmax(probabilities).item()
-                confidence = probabilities[0][behavior_idx].item()
-                
-                behavior = BEHAVIOR_CLASSES[behavior_idx]
-                
-                # 结合姿态信息进行判断
-                if behavior == 'fall' and confidence > BEHAVIOR_DETECTION['fall_threshold']:
-                    if self._confirm_fall_detection(pose_data):
-                        self._handle_alert('fall')
-                        return 'fall'
-                elif confidence > BEHAVIOR_DETECTION['abnormal_threshold']:
-                    self._update_detection_history(behavior)
-                    if self._check_continuous_abnormal():
-                        self._handle_alert(behavior)
-                        return behavior
-                
-                return 'normal'
-                
+            return self._process_batch([frame])[0]['behavior']
         except Exception as e:
             self.logger.error(f"Behavior detection error: {str(e)}")
             return None
     
+    def _process_batch(self, frames):
+        """对一批帧中的人员区域批量推理并结合姿态和历史判断，返回每帧的结果字典
+
+        结果: {'behavior': 帧内最严重的行为, 'alert': 本帧触发的报警行为或None,
+        'persons': [{'person_id', 'box', 'behavior', 'label', 'confidence'}, ...]}
+        """
+        with self.inference_lock:
+            start = time.perf_counter()
+            now = time.time()
+            jobs = []  # (帧下标, 人员轨迹, 人员区域)
+            for i, frame in enumerate(frames):
+                for track, crop in self._person_crops(frame, now):
+                    jobs.append((i, track, crop))
+            
+            # 模型预测，人员区域按缓冲区容量分批
+            predictions = []
+            batch_size = self.preprocessor.batch_size
+            for offset in range(0, len(jobs), batch_size):
+                chunk = jobs[offset:offset + batch_size]
+                for slot, (_, _, crop) in enumerate(chunk):
+                    self.preprocessor.write(crop, slot)
+                outputs = self.model(self.preprocessor.batch(len(chunk)))
+                probabilities = torch.softmax(outputs.float(), dim=1)
+                confidences, indices = probabilities.max(dim=1)
+                predictions.extend(zip(indices.tolist(), confidences.tolist()))
+            end = time.perf_counter()
+            with self.stats_lock:
+                self.inference_stats.add(start, end)
+                self.batch_count += 1
+            if self.motion_gate is not None:
+                # 按帧平摊批次耗时
+                per_frame = (end - start) / len(frames)
+                for _ in frames:
+                    self.motion_gate.record_run('behavior', start, start + per_frame)
+            
+            results = [{'behavior': 'normal', 'alert': None, 'persons': []} for _ in frames]
+            for (i, track, crop), (idx, confidence) in zip(jobs, predictions):
+                person, alerted = self._interpret(crop, track, BEHAVIOR_CLASSES[idx], confidence)
+                results[i]['persons'].append(person)
+                if alerted:
+                    results[i]['alert'] = person['behavior']
+                if person['behavior'] != 'normal' and results[i]['behavior'] != 'fall':
+                    results[i]['behavior'] = person['behavior']
+            return results
+    
+    def _person_crops(self, frame, now):
+        """返回 [(人员轨迹, 人员区域)]，未启用或未检测到人员时使用整帧"""
+        if self.person_detector is not None:
+            start = time.perf_counter()
+            boxes = self.person_detector.detect(frame)
+            with self.stats_lock:
+                self.person_stats.add(start, time.perf_counter())
+            if boxes:
+                tracks = self.person_tracks.assign(boxes, now)
+                crops = [(track, frame[y1:y2, x1:x2]) for track, (x1, y1, x2, y2) in zip(tracks, boxes)]
+                # 倒地的人HOG常检测不到，画面中有其他人时也按间隔对整帧分类
+                interval = BEHAVIOR_DETECTION['full_frame_interval']
+                self.person_frames += 1
+                if interval and self.person_frames % interval == 0:
+                    crops.append((self.person_tracks.full_frame(frame, now), frame))
+                return crops
+        # 未检测到人员时整帧分类保证跌倒召回
+        return [(self.person_tracks.full_frame(frame, now), frame)]
+    
+    def _interpret(self, crop, track, behavior, confidence):
+        """结合姿态信息和该人员的检测历史得出最终行为，返回 (结果, 是否触发报警)"""
+        result = {'person_id': track.person_id, 'box': track.box, 'behavior': 'normal',
+                  'label': behavior, 'confidence': confidence}
+        
+        if behavior == 'fall' and confidence > BEHAVIOR_DETECTION['fall_threshold']:
+            # 级联第二级：只对跌倒候选区域运行姿态估计
+            if self._confirm_fall_detection(self._estimate_pose(crop)):
+                result['behavior'] = 'fall'
+                return result, self._handle_alert('fall')
+        elif confidence > BEHAVIOR_DETECTION['abnormal_threshold']:
+            self._update_detection_history(track, behavior)
+            if self._check_continuous_abnormal(track):
+                result['behavior'] = behavior
+                return result, self._handle_alert(behavior)
+        return result, False
+    
     def _estimate_pose(self, frame):
-        """估计人体姿态"""
-        blob = cv2.dnn.blobFromImage(frame, 1.0, (368, 368), 
+        """估计人体姿态，返回每个关键点的 (x, y)，置信度不足时为None"""
+        start = time.perf_counter()
+        blob = cv2.dnn.blobFromImage(frame, 1.0, tuple(BEHAVIOR_DETECTION['pose_input_size']),
                                     (127.5, 127.5, 127.5), swapRB=True, crop=False)
         self.pose_estimator.setInput(blob)
         output = self.pose_estimator.forward()
         
-        # 处理输出，获取关键点
-        points = []
-        for i in range(output.shape[1]):
-            heatMap = output[0, i, :, :]
-            _, conf, _, point = cv2.minMaxLoc(heatMap)
-            x = (frame.shape[1] * point[0]) / output.shape[3]
-            y = (frame.shape[0] * point[1]) / output.shape[2]
-            points.append((int(x), int(y)) if conf > 0.1 else None)
-            
-        return points
+        # 所有热图一次argmax取峰值，与逐通道minMaxLoc结果相同
+        _, channels, height, width = output.shape
+        heatmaps = output[0].reshape(channels, height * width)
+        peaks = heatmaps.argmax(axis=1)
+        confidences = heatmaps[np.arange(channels), peaks]
+        ys, xs = np.divmod(peaks, width)
+        xs = (xs * frame.shape[1] / width).astype(int)
+        ys = (ys * frame.shape[0] / height).astype(int)
+        valid = confidences > BEHAVIOR_DETECTION['pose_confidence']
+        
+        with self.stats_lock:
+            self.pose_stats.add(start, time.perf_counter())
+        return [(x, y) if ok else None for x, y, ok in zip(xs.tolist(), ys.tolist(), valid.tolist())]
     
     def _confirm_fall_detection(self, pose_data):
         """确认跌倒检测"""
@@ -150,52 +280,116 @@ class BehaviorDetector:
             
         return False
     
-    def _update_detection_history(self, behavior):
-        """更新检测历史"""
-        self.detection_history.append((time.time(), behavior))
+    def _update_detection_history(self, track, behavior):
+        """更新该人员的检测历史"""
+        track.history.append((time.time(), behavior))
         # 清理旧记录
         current_time = time.time()
-        self.detection_history = [
-            (t, b) for t, b in self.detection_history 
+        track.history = [
+            (t, b) for t, b in track.history 
             if current_time - t <= BEHAVIOR_DETECTION['detection_interval'] * 
             BEHAVIOR_DETECTION['min_detection_frames']
         ]
     
-    def _check_continuous_abnormal(self):
-        """检查连续异常行为"""
-        if len(self.detection_history) < BEHAVIOR_DETECTION['min_detection_frames']:
+    def _check_continuous_abnormal(self, track):
+        """检查该人员是否连续异常"""
+        if len(track.history) < BEHAVIOR_DETECTION['min_detection_frames']:
             return False
             
         # 检查最近几帧是否都是异常行为
-        recent_behaviors = [b for _, b in self.detection_history[-BEHAVIOR_DETECTION['min_detection_frames']:]]
+        recent_behaviors = [b for _, b in track.history[-BEHAVIOR_DETECTION['min_detection_frames']:]]
         return all(b != 'normal' for b in recent_behaviors)
     
     def _handle_alert(self, behavior_type):
-        """处理报警"""
+        """处理报警，返回是否触发（受报警间隔限制）"""
         current_time = time.time()
         if current_time - self.last_alert_time < ALERT_CONFIG['alert_interval']:
-            return
+            return False
             
         self.last_alert_time = current_time
         
-        # 播放报警声音
-        self.alert_sound.play()
+        # 播放报警声音（pygame在后台通道播放，不阻塞）
+        if self.alert_sound is not None:
+            self.alert_sound.play()
         
-        # 语音提醒
-        alert_message = f"警告！检测到{behavior_type}行为！"
-        self.speech.speak(alert_message)
+        # 语音提醒排队交给语音线程播报，不在推理线程中阻塞
+        if self.speech is not None:
+            self.speech.announce(f"警告！检测到{behavior_type}行为！")
         
         self.logger.warning(f"Abnormal behavior detected: {behavior_type}")
         
         # TODO: 实现紧急联系人通知功能
+        return True
     
     def _monitor_loop(self):
-        """持续监控循环"""
+        """推理线程：从帧队列取最新的若干帧批量推理并发布结果"""
+        self.scheduler.register_thread('behavior')
         while self.is_monitoring:
-            time.sleep(0.1)  # 避免过度占用CPU
+            with self.frame_ready:
+                while self.is_monitoring and not self.frame_queue:
+                    self.frame_ready.wait(0.5)
+                if not self.is_monitoring:
+                    break
+                items = [self.frame_queue.popleft()
+                         for _ in range(min(self.max_batch_size, len(self.frame_queue)))]
+            
+            try:
+                results = self._process_batch([frame for _, frame in items])
+            except Exception as e:
+                self.logger.error(f"Behavior detection error: {str(e)}")
+                continue
+            
+            end = time.perf_counter()
+            with self.stats_lock:
+                for submit_time, _ in items:
+                    self.end_to_end_stats.add(submit_time, end)
+                self.processed_count += len(items)
+            for (submit_time, _), result in zip(items, results):
+                result['latency'] = end - submit_time
+                self._publish(result)
+    
+    def _publish(self, result):
+        """发布结果：结果队列满时丢弃最旧的结果"""
+        while True:
+            try:
+                self.results.put_nowait(result)
+                break
+            except queue.Full:
+                try:
+                    self.results.get_nowait()
+                except queue.Empty:
+                    pass
+        if self.on_result is not None:
+            try:
+                self.on_result(result)
+            except Exception as e:
+                self.logger.error(f"Behavior result callback error: {str(e)}")
+    
+    def get_stats(self):
+        """推理队列和延迟统计"""
+        with self.frame_ready:
+            stats = {
+                'queue_depth': len(self.frame_queue),
+                'submitted': self.submitted_count,
+                'dropped': self.dropped_count
+            }
+        with self.stats_lock:
+            stats.update({
+                'processed': self.processed_count,
+                'batches': self.batch_count,
+                'inference': self.inference_stats.summary(),
+                'pose': self.pose_stats.summary(),
+                'person_detection': self.person_stats.summary(),
+                'tracked_persons': len(self.person_tracks),
+                'end_to_end': self.end_to_end_stats.summary()
+            })
+        return stats
     
     def cleanup(self):
         """清理资源"""
         self.is_monitoring = False
+        with self.frame_ready:
+            self.frame_ready.notify_all()
         self.monitor_thread.join()
-        pygame.mixer.quit() 
\ No newline at end of file
+        if self.alert_sound is not None:
+            pygame.mixer.quit() 
\ No newline at end of file
@@ -0,0 +1,106 @@
+import json
+import os
+import torch
+import torch.nn as nn
+from torchvision import models
+from config.config import BEHAVIOR_DETECTION, BEHAVIOR_CLASSES
+
+INPUT_SIZE = 224  # 模型输入边长
+
+# 可选骨干网络，各自需要单独训练的行为模型权重
+BACKBONES = {
+    'resnet50': models.resnet50,
+    'resnet18': models.resnet18,
+    'mobilenet_v2': models.mobilenet_v2,
+    'mobilenet_v3_small': models.mobilenet_v3_small
+}
+
+def _classifier_head(num_features):
+    return nn.Sequential(
+        nn.Linear(num_features, 512),
+        nn.ReLU(),
+        nn.Dropout(0.5),
+        nn.Linear(512, len(BEHAVIOR_CLASSES))
+    )
+
+class BehaviorDetectionModel(nn.Module):
+    def __init__(self, backbone=None):
+        super(BehaviorDetectionModel, self).__init__()
+        backbone = backbone or BEHAVIOR_DETECTION['backbone']
+        if backbone not in BACKBONES:
+            raise ValueError(f"Unknown behavior backbone: {backbone}")
+        # 在本地构建网络结构，不下载ImageNet预训练权重，全部权重来自行为模型文件
+        self.backbone = BACKBONES[backbone]()
+        # 修改最后的全连接层以适应行为分类
+        if backbone.startswith('resnet'):
+            self.backbone.fc = _classifier_head(self.backbone.fc.in_features)
+        else:
+            last = len(self.backbone.classifier) - 1
+            self.backbone.classifier[last] = _classifier_head(self.backbone.classifier[last].in_features)
+
+    def forward(self, x):
+        return self.backbone(x)
+
+def artifact_path(model_format):
+    """各格式模型文件路径"""
+    paths = {
+        'state_dict': BEHAVIOR_DETECTION['model_path'],
+        'torchscript': BEHAVIOR_DETECTION['torchscript_path'],
+        'onnx': BEHAVIOR_DETECTION['onnx_path']
+    }
+    if model_format not in paths:
+        raise ValueError(f"Unknown behavior model format: {model_format}")
+    return paths[model_format]
+
+def artifact_metadata():
+    """当前配置下导出文件应有的元数据，随模型文件写入 <模型路径>.json"""
+    return {
+        'backbone': BEHAVIOR_DETECTION['backbone'],
+        'input_size': INPUT_SIZE,
+        'classes': list(BEHAVIOR_CLASSES)
+    }
+
+def check_artifact(model_format):
+    """校验导出文件的元数据与当前配置一致，缺失或不一致时抛出ValueError"""
+    path = artifact_path(model_format)
+    meta_path = path + '.json'
+    if not os.path.exists(meta_path):
+        raise ValueError(f"{path} has no metadata file {meta_path}; re-export it")
+    with open(meta_path, 'r', encoding='utf-8') as f:
+        metadata = json.load(f)
+    expected = artifact_metadata()
+    mismatched = [key for key in expected if metadata.get(key) != expected[key]]
+    if mismatched:
+        details = ", ".join(f"{key}: {metadata.get(key)!r} != {expected[key]!r}" for key in mismatched)
+        raise ValueError(f"{path} was exported for a different model ({details}); re-export it")
+    return metadata
+
+def load_state_dict_model():
+    """构建配置中的骨干网络并加载state_dict权重"""
+    model = BehaviorDetectionModel()
+    model.load_state_dict(torch.load(artifact_path('state_dict'), map_location='cpu'))
+    return model.eval()
+
+def export_behavior_model(model_format):
+    """将state_dict权重导出为TorchScript或ONNX文件，返回导出路径"""
+    if model_format == 'state_dict':
+        raise ValueError("state_dict is the source format and cannot be exported to")
+    path = artifact_path(model_format)
+    model = load_state_dict_model()
+    example = torch.zeros(1, 3, INPUT_SIZE, INPUT_SIZE)
+
+    # 先写临时文件再原子替换，避免导出中断留下损坏的模型
+    temp_path = path + '.exporting'
+    with torch.no_grad():
+        if model_format == 'torchscript':
+            torch.jit.trace(model, example).save(temp_path)
+        else:
+            torch.onnx.export(model, example, temp_path,
+                              input_names=['input'], output_names=['logits'],
+                              dynamic_axes={'input': {0: 'batch'}, 'logits': {0: 'batch'}},
+                              opset_version=11)
+    with open(path + '.json.exporting', 'w', encoding='utf-8') as f:
+        json.dump(dict(artifact_metadata(), format=model_format), f, ensure_ascii=False)
+    os.replace(temp_path, path)
+    os.replace(path + '.json.exporting', path + '.json')
+    return path
@@ -0,0 +1,98 @@
+import os
+import platform
+import cv2
+import torch
+import torch.nn as nn
+from config.config import BEHAVIOR_DETECTION
+from modules.utils.logger import Logger
+from .behavior_model import INPUT_SIZE, artifact_path, check_artifact, load_state_dict_model
+
+class EagerBackend:
+    """PyTorch eager模式，基准实现"""
+    name = 'eager'
+
+    def __init__(self, device='cpu'):
+        self.device = device
+        self.model = load_state_dict_model().to(device)
+
+    def __call__(self, batch):
+        with torch.inference_mode():
+            return self.model(batch.to(self.device))
+
+class TorchScriptBackend:
+    """冻结的TorchScript模型：常量折叠、Conv+BN融合，去掉Python调度开销
+
+    优先加载ModelManager导出的TorchScript文件，文件不存在或其元数据与当前配置
+    不一致时从state_dict现场trace。
+    """
+    name = 'torchscript'
+
+    def __init__(self, device='cpu'):
+        self.device = device
+        path = artifact_path('torchscript')
+        module = None
+        if os.path.exists(path):
+            try:
+                check_artifact('torchscript')
+                module = torch.jit.load(path, map_location=device)
+            except ValueError as e:
+                Logger.get_logger("InferenceBackend").warning(f"Ignoring TorchScript artifact: {e}")
+        if module is None:
+            model = load_state_dict_model().to(device)
+            with torch.no_grad():
+                module = torch.jit.trace(model, torch.zeros(1, 3, INPUT_SIZE, INPUT_SIZE, device=device))
+        module = torch.jit.freeze(module.eval())
+        self.model = torch.jit.optimize_for_inference(module)
+
+    def __call__(self, batch):
+        with torch.inference_mode():
+            return self.model(batch.to(self.device))
+
+class DynamicInt8Backend:
+    """全连接层动态int8量化，卷积层保持fp32，只支持CPU"""
+    name = 'int8'
+
+    def __init__(self, device='cpu'):
+        self.device = 'cpu'
+        # ARM上只有qnnpack内核
+        if platform.machine().lower() in ('aarch64', 'arm64', 'armv7l'):
+            torch.backends.quantized.engine = 'qnnpack'
+        self.model = torch.quantization.quantize_dynamic(
+            load_state_dict_model(), {nn.Linear}, dtype=torch.qint8
+        )
+
+    def __call__(self, batch):
+        with torch.inference_mode():
+            return self.model(batch.cpu())
+
+class OnnxBackend:
+    """用OpenCV DNN运行ModelManager导出的ONNX模型，不经过PyTorch运行时"""
+    name = 'onnx'
+
+    def __init__(self, device='cpu'):
+        # ONNX文件是唯一来源，元数据不一致时直接报错
+        check_artifact('onnx')
+        self.net = cv2.dnn.readNetFromONNX(artifact_path('onnx'))
+
+    def __call__(self, batch):
+        self.net.setInput(batch.cpu().numpy())
+        return torch.from_numpy(self.net.forward())
+
+BACKENDS = {
+    backend.name: backend
+    for backend in (EagerBackend, TorchScriptBackend, DynamicInt8Backend, OnnxBackend)
+}
+
+def create_backend(name, device='cpu'):
+    """按名称创建行为分类推理后端，调用 backend(batch) 返回logits"""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown behavior inference backend: {name}")
+    return BACKENDS[name](device)
+
+def load_behavior_model(device='cpu'):
+    """行为模型的唯一加载入口：按BEHAVIOR_DETECTION['backend']创建推理后端
+
+    后端决定读取哪种格式的模型文件（state_dict/TorchScript/ONNX），
+    导出见behavior_model.export_behavior_model。
+    """
+    return create_backend(BEHAVIOR_DETECTION['backend'], device)
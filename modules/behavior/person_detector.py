@@ -0,0 +1,139 @@
+import collections
+import itertools
+import cv2
+import numpy as np
+from config.config import BEHAVIOR_DETECTION
+from modules.utils.geometry import iou
+
+# MobileNet-SSD (VOC) 中person的类别编号
+SSD_PERSON_CLASS = 15
+
+class PersonDetector:
+    """轻量行人检测，返回加边距后的人员框 [(x1, y1, x2, y2), ...]
+
+    hog使用OpenCV自带的HOG行人检测器，在缩小的帧上运行，无需模型文件；
+    ssd使用MobileNet-SSD (Caffe) 的OpenCV DNN模型，对非直立姿态更稳健。
+    """
+    def __init__(self, method=None):
+        self.method = method or BEHAVIOR_DETECTION['person_detector']
+        if self.method == 'hog':
+            self.hog = cv2.HOGDescriptor()
+            self.hog.setSVMDetector(cv2.HOGDescriptor_getDefaultPeopleDetector())
+        elif self.method == 'ssd':
+            self.net = cv2.dnn.readNetFromCaffe(BEHAVIOR_DETECTION['person_config_path'],
+                                                BEHAVIOR_DETECTION['person_model_path'])
+        else:
+            raise ValueError(f"Unknown person detector: {self.method}")
+        self.max_persons = BEHAVIOR_DETECTION['max_persons']
+        self.margin = BEHAVIOR_DETECTION['person_margin']
+
+    def detect(self, frame):
+        h, w = frame.shape[:2]
+        if self.method == 'hog':
+            rects, scores = self._detect_hog(frame)
+        else:
+            rects, scores = self._detect_ssd(frame)
+        if len(rects) == 0:
+            return []
+
+        keep = cv2.dnn.NMSBoxes(rects.tolist(), scores.tolist(), 0.0, 0.4)
+        keep = np.asarray(keep, dtype=int).ravel()
+        keep = keep[np.argsort(-scores[keep])][:self.max_persons]
+
+        boxes = []
+        for x, y, bw, bh in rects[keep]:
+            # 四周加边距，保留肢体和周围的地面信息
+            mx, my = bw * self.margin, bh * self.margin
+            boxes.append((
+                int(max(0, x - mx)), int(max(0, y - my)),
+                int(min(w, x + bw + mx)), int(min(h, y + bh + my))
+            ))
+        return [box for box in boxes if box[2] - box[0] >= 8 and box[3] - box[1] >= 8]
+
+    def _detect_hog(self, frame):
+        """在缩小的帧上运行HOG检测，返回原图坐标的 (x, y, w, h) 和得分"""
+        scale = min(1.0, BEHAVIOR_DETECTION['person_detect_width'] / float(frame.shape[1]))
+        small = frame if scale == 1.0 else cv2.resize(frame, None, fx=scale, fy=scale,
+                                                      interpolation=cv2.INTER_AREA)
+        rects, weights = self.hog.detectMultiScale(small, winStride=(8, 8), padding=(8, 8), scale=1.05)
+        if len(rects) == 0:
+            return np.empty((0, 4)), np.empty(0)
+        return np.asarray(rects, dtype=np.float32) / scale, np.asarray(weights, dtype=np.float32).ravel()
+
+    def _detect_ssd(self, frame):
+        """MobileNet-SSD检测，只保留person类别"""
+        h, w = frame.shape[:2]
+        blob = cv2.dnn.blobFromImage(frame, 0.007843, (300, 300), 127.5)
+        self.net.setInput(blob)
+        detections = self.net.forward()[0, 0]
+        detections = detections[(detections[:, 1] == SSD_PERSON_CLASS) &
+                                (detections[:, 2] >= BEHAVIOR_DETECTION['person_confidence'])]
+        corners = detections[:, 3:7] * np.array([w, h, w, h], dtype=np.float32)
+        rects = np.column_stack([corners[:, :2], corners[:, 2:] - corners[:, :2]])
+        return rects, detections[:, 2]
+
+class PersonTrack:
+    """单个人员的行为历史"""
+    def __init__(self, person_id, box, now):
+        self.person_id = person_id
+        self.box = box
+        self.last_seen = now
+        self.history = []  # [(时间, 行为)]
+
+class PersonTracks:
+    """按交并比关联相邻检测中的人员框，每人维护独立的行为历史
+
+    整帧分类（未检测到人员时，以及按间隔附加的一次）使用person_id为None的整帧轨迹，
+    超过TTL未出现的轨迹被移除。
+    """
+    def __init__(self):
+        self.iou_threshold = BEHAVIOR_DETECTION['person_iou_threshold']
+        self.ttl = BEHAVIOR_DETECTION['person_ttl']
+        self.tracks = collections.OrderedDict()
+        self._next_id = itertools.count()
+
+    def assign(self, boxes, now):
+        """为每个人员框返回对应的轨迹，顺序与boxes一致"""
+        self.evict(now)
+        candidates = [t for t in self.tracks.values() if t.person_id is not None]
+        pairs = sorted(
+            ((iou(track.box, box), t, b)
+             for t, track in enumerate(candidates)
+             for b, box in enumerate(boxes)),
+            key=lambda pair: pair[0], reverse=True
+        )
+        assigned = [None] * len(boxes)
+        used = set()
+        for overlap, t, b in pairs:
+            if overlap < self.iou_threshold:
+                break
+            if t in used or assigned[b] is not None:
+                continue
+            used.add(t)
+            assigned[b] = candidates[t]
+
+        for b, box in enumerate(boxes):
+            track = assigned[b]
+            if track is None:
+                track = assigned[b] = PersonTrack(next(self._next_id), box, now)
+                self.tracks[track.person_id] = track
+            track.box = box
+            track.last_seen = now
+        return assigned
+
+    def full_frame(self, frame, now):
+        """整帧分类使用的轨迹"""
+        self.evict(now)
+        h, w = frame.shape[:2]
+        track = self.tracks.get(None)
+        if track is None:
+            track = self.tracks[None] = PersonTrack(None, (0, 0, w, h), now)
+        track.last_seen = now
+        return track
+
+    def evict(self, now):
+        for person_id in [pid for pid, t in self.tracks.items() if now - t.last_seen > self.ttl]:
+            del self.tracks[person_id]
+
+    def __len__(self):
+        return len(self.tracks)
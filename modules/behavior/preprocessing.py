@@ -0,0 +1,48 @@
+import cv2
+import numpy as np
+import torch
+from .behavior_model import INPUT_SIZE
+
+# ImageNet归一化参数（RGB顺序）
+MEAN = np.array([0.485, 0.456, 0.406], dtype=np.float32)
+STD = np.array([0.229, 0.224, 0.225], dtype=np.float32)
+
+class FramePreprocessor:
+    """将BGR帧直接预处理到预分配的NCHW float32缓冲区
+
+    缩放和BGR->RGB转换由OpenCV写入复用的uint8缓冲区，归一化在写入
+    float32缓冲区时一次完成（x * scale + offset），缓冲区通过
+    torch.from_numpy零拷贝包装为张量。返回的张量在下次调用时会被覆盖，
+    需要保留时由调用方clone；单个预处理器不可跨线程共享。
+    """
+    def __init__(self, size=INPUT_SIZE, batch_size=1):
+        self.size = size
+        self.batch_size = batch_size
+        self._resized = np.empty((size, size, 3), dtype=np.uint8)
+        self._rgb = np.empty((size, size, 3), dtype=np.uint8)
+        self._buffer = np.empty((batch_size, 3, size, size), dtype=np.float32)
+        self.tensor = torch.from_numpy(self._buffer)
+        # (x / 255 - mean) / std == x * scale + offset
+        self._scale = 1.0 / (255.0 * STD)
+        self._offset = -MEAN / STD
+
+    def __call__(self, frame, index=0):
+        """预处理一帧写入批次中的第index个位置，返回长度为1的批次张量"""
+        self.write(frame, index)
+        return self.tensor[index:index + 1]
+
+    def write(self, frame, index):
+        """预处理一帧写入批次中的第index个位置"""
+        h, w = frame.shape[:2]
+        # 缩小用INTER_AREA抗锯齿，接近torchvision对PIL图像的缩放效果
+        interpolation = cv2.INTER_AREA if h > self.size or w > self.size else cv2.INTER_LINEAR
+        cv2.resize(frame, (self.size, self.size), dst=self._resized, interpolation=interpolation)
+        cv2.cvtColor(self._resized, cv2.COLOR_BGR2RGB, dst=self._rgb)
+        out = self._buffer[index]
+        for c in range(3):
+            np.multiply(self._rgb[:, :, c], self._scale[c], out=out[c], casting='unsafe')
+            out[c] += self._offset[c]
+
+    def batch(self, count):
+        """前count个位置组成的批次张量"""
+        return self.tensor[:count]
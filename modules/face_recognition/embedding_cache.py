@@ -0,0 +1,109 @@
+import time
+from config.config import FACE_EMBEDDING_CACHE, FACE_RECOGNITION_THRESHOLD
+
+def estimate_yaw(landmarks):
+    """根据68点特征粗略估计偏航角：鼻尖在两眼外角间的相对位置，正脸约为0"""
+    left, right = landmarks[36, 0], landmarks[45, 0]
+    width = float(right - left)
+    if width <= 0:
+        return 0.0
+    return (landmarks[30, 0] - left) / width - 0.5
+
+class EmbeddingCacheEntry:
+    """单个轨迹缓存的特征编码和识别结果"""
+    __slots__ = ('descriptor', 'location', 'yaw', 'timestamp', 'identity', 'distance')
+
+    def __init__(self, descriptor, location, yaw, timestamp):
+        self.descriptor = descriptor
+        self.location = location
+        self.yaw = yaw
+        self.timestamp = timestamp
+        self.identity = None
+        self.distance = None
+
+class EmbeddingCache:
+    """按人脸轨迹缓存ResNet特征编码
+
+    同一轨迹只在以下情况重新计算编码：超过刷新间隔、人脸尺度或姿态
+    变化较大、上次匹配距离处于阈值附近。
+    """
+    def __init__(self):
+        self.refresh_interval = FACE_EMBEDDING_CACHE['refresh_interval']
+        self.max_scale_change = FACE_EMBEDDING_CACHE['max_scale_change']
+        self.max_yaw_change = FACE_EMBEDDING_CACHE['max_yaw_change']
+        self.borderline_margin = FACE_EMBEDDING_CACHE['borderline_margin']
+        self.entries = {}
+        self.hits = 0
+        self.misses = {'new': 0, 'expired': 0, 'scale': 0, 'pose': 0, 'borderline': 0}
+
+    @staticmethod
+    def _size(location):
+        x1, y1, x2, y2 = location
+        return max(1, min(x2 - x1, y2 - y1))
+
+    def _miss_reason(self, entry, location, yaw, now):
+        if entry is None:
+            return 'new'
+        if now - entry.timestamp >= self.refresh_interval:
+            return 'expired'
+        scale = self._size(location) / float(self._size(entry.location))
+        if abs(scale - 1.0) > self.max_scale_change:
+            return 'scale'
+        if abs(yaw - entry.yaw) > self.max_yaw_change:
+            return 'pose'
+        if entry.distance is not None and \
+           abs(entry.distance - FACE_RECOGNITION_THRESHOLD) < self.borderline_margin:
+            return 'borderline'
+        return None
+
+    def lookup(self, track_id, location, yaw):
+        """查询缓存，命中时返回特征编码，否则返回None"""
+        if track_id is None:
+            return None
+        now = time.monotonic()
+        entry = self.entries.get(track_id)
+        reason = self._miss_reason(entry, location, yaw, now)
+        if reason is not None:
+            self.misses[reason] += 1
+            return None
+        self.hits += 1
+        return entry.descriptor
+
+    def store(self, track_id, location, yaw, descriptor):
+        """保存新计算的特征编码"""
+        if track_id is None:
+            return
+        self.entries[track_id] = EmbeddingCacheEntry(descriptor, location, yaw, time.monotonic())
+
+    def update_identity(self, track_id, identity, distance):
+        """记录轨迹最近的匹配结果，用于判断是否处于阈值边界"""
+        entry = self.entries.get(track_id)
+        if entry is not None:
+            entry.identity = identity
+            entry.distance = distance
+
+    def get_identity(self, track_id):
+        """获取轨迹缓存的身份和距离"""
+        entry = self.entries.get(track_id)
+        if entry is None:
+            return None, None
+        return entry.identity, entry.distance
+
+    def retain(self, active_track_ids):
+        """移除已离开画面的轨迹"""
+        active = set(active_track_ids)
+        for track_id in list(self.entries.keys()):
+            if track_id not in active:
+                del self.entries[track_id]
+
+    def get_stats(self):
+        """获取命中/未命中统计"""
+        total_misses = sum(self.misses.values())
+        total = self.hits + total_misses
+        return {
+            'hits': self.hits,
+            'misses': total_misses,
+            'miss_reasons': dict(self.misses),
+            'hit_rate': self.hits / total if total else 0.0,
+            'entries': len(self.entries)
+        }
@@ -1,44 +1,41 @@
 import numpy as np
-import pickle
 import os
+from config.config import FACE_DATABASE
+from .face_gallery import FaceGallery
 
 class FaceDatabase:
-    def __init__(self, database_file='face_database.pkl'):
-        self.database_file = database_file
-        self.known_faces = {}  # {name: face_encoding}
+    def __init__(self, database_file=None, gallery_dir=None):
+        self.database_file = database_file or FACE_DATABASE['legacy_file']
+        self.gallery = FaceGallery(gallery_dir or FACE_DATABASE['gallery_dir'],
+                                   FACE_DATABASE['embedding_dim'])
         self.load_database()
-    
+
     def load_database(self):
-        """加载人脸数据库"""
-        if os.path.exists(self.database_file):
-            with open(self.database_file, 'rb') as f:
-                self.known_faces = pickle.load(f)
-    
-    def save_database(self):
-        """保存人脸数据库"""
-        with open(self.database_file, 'wb') as f:
-            pickle.dump(self.known_faces, f)
-    
+        """加载人脸数据库，首次启动时从旧版pickle文件迁移"""
+        if len(self.gallery) == 0 and os.path.exists(self.database_file):
+            self.gallery.migrate_from_pickle(self.database_file)
+
+    @property
+    def known_faces(self):
+        """兼容旧接口：{name: face_encoding}，同名多个模板时取最新的一个"""
+        names, embeddings = self.gallery.snapshot()
+        return {name: embeddings[i] for i, name in enumerate(names)}
+
     def add_face(self, name, face_encoding):
-        """添加新的人脸特征"""
-        self.known_faces[name] = face_encoding
-        self.save_database()
-    
+        """添加新的人脸特征（追加写入并原子提交），返回新模板的行号"""
+        return self.gallery.add(name, face_encoding)
+
     def identify_face(self, face_encoding, threshold=0.6):
         """识别人脸"""
-        if not self.known_faces:
+        names, embeddings = self.gallery.snapshot()
+        if not names:
             return None, None
-            
-        min_distance = float('inf')
-        best_match = None
-        
-        # 与数据库中的人脸特征进行比对
-        for name, known_encoding in self.known_faces.items():
-            distance = np.linalg.norm(face_encoding - known_encoding)
-            if distance < min_distance:
-                min_distance = distance
-                best_match = name
-        
+
+        # 与数据库中的全部模板一次性比对
+        distances = np.linalg.norm(embeddings - np.asarray(face_encoding, dtype=np.float32), axis=1)
+        best = int(np.argmin(distances))
+        min_distance = float(distances[best])
+
         if min_distance <= threshold:
-            return best_match, min_distance
-        return None, None 
\ No newline at end of file
+            return names[best], min_distance
+        return None, None
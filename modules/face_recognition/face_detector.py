@@ -1,16 +1,20 @@
-import cv2
+import time
 import dlib
 import numpy as np
-from config.config import FACE_DETECTION_CONFIDENCE
+from config.config import FACE_TRACKING, FACE_EMBEDDING_CACHE
 from .face_database import FaceDatabase
 from modules.utils.logger import Logger
-from .face_quality import FaceQualityAssessor, LivenessDetector
-import collections
+from modules.utils.motion_gate import GATE_SKIP
+from .face_quality import FaceQualityAssessor
 from .face_matcher import FaceMatcher
 from .liveness_detection import LivenessDetector
+from .frame_context import FrameContext
+from .face_tracker import FaceTracker
+from .embedding_cache import EmbeddingCache, estimate_yaw
+from .track_state import TrackStateStore
 
 class FaceDetector:
-    def __init__(self):
+    def __init__(self, motion_gate=None):
         self.logger = Logger.get_logger("FaceDetector")
         self.logger.info("Initializing face detector")
         # 使用dlib的人脸检测器
@@ -22,82 +26,187 @@ class FaceDetector:
         self.face_db = FaceDatabase()
         self.quality_assessor = FaceQualityAssessor()
         self.liveness_detector = LivenessDetector()
-        self.face_tracker = collections.defaultdict(list)  # 用于多帧确认
+        # 用于多帧确认，按轨迹保存有界的匹配历史
+        self.track_states = TrackStateStore(
+            FACE_TRACKING['confirm_frames'],
+            FACE_TRACKING['tracking_threshold'],
+            FACE_TRACKING['state_ttl'],
+            FACE_TRACKING['max_tracks']
+        )
         self.pose_estimator = None  # TODO: 添加姿态估计器
         self.face_matcher = FaceMatcher()
+        self.face_matcher.load_gallery(self.face_db.gallery)
+        # 检测-跟踪模式：只每隔N帧运行完整检测
+        self.tracker = FaceTracker(self.detector) if FACE_TRACKING['enabled'] else None
+        # 按轨迹缓存特征编码，需要跟踪模式提供轨迹ID
+        self.embedding_cache = EmbeddingCache() if FACE_EMBEDDING_CACHE['enabled'] else None
+        # 运动门控：画面静止时跳过识别并返回上次结果
+        self.motion_gate = motion_gate
+        self.last_result = ([], [], [])
         
-    def detect_faces(self, frame):
-        # 转换为灰度图
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        # 检测人脸
-        faces = self.detector(gray)
+    def create_context(self, frame):
+        """为一帧图像创建共享上下文"""
+        return FrameContext(frame, self.predictor)
         
+    def locate_faces(self, context):
+        """定位人脸，返回 [(track_id, (x1, y1, x2, y2)), ...]，未启用跟踪时track_id为None"""
+        if self.tracker is not None:
+            return self.tracker.update(context)
+        # 检测人脸（灰度图由上下文缓存）
+        faces = self.detector(context.gray)
+        return [(None, (face.left(), face.top(), face.right(), face.bottom())) for face in faces]
+    
+    def track_faces(self, frame, context=None):
+        """定位人脸并计算特征编码，返回 (track_ids, face_locations, face_encodings)"""
+        if context is None:
+            context = self.create_context(frame)
+        
+        track_ids = []
         face_locations = []
         face_encodings = []
+        pending = []  # 需要重新计算编码的人脸下标
+        yaws = {}
         
-        for face in faces:
-            # 获取人脸区域和特征编码
-            x1, y1, x2, y2 = face.left(), face.top(), face.right(), face.bottom()
-            face_locations.append((x1, y1, x2, y2))
+        for track_id, face_location in self.locate_faces(context):
+            track_ids.append(track_id)
+            face_locations.append(face_location)
+            face_encodings.append(None)
             
-            # 获取人脸特征点并计算编码
-            shape = self.predictor(gray, face)
-            face_encoding = np.array(self.face_rec.compute_face_descriptor(frame, shape))
-            face_encodings.append(face_encoding)
+            # 同一轨迹姿态和尺度变化不大时复用缓存的编码
+            if self.embedding_cache is not None and track_id is not None:
+                yaw = estimate_yaw(context.landmarks(face_location))
+                yaws[len(face_locations) - 1] = yaw
+                face_encoding = self.embedding_cache.lookup(track_id, face_location, yaw)
+                if face_encoding is not None:
+                    face_encodings[-1] = face_encoding
+                    continue
+            pending.append(len(face_locations) - 1)
+        
+        # 未命中缓存的人脸一次性批量计算编码
+        if pending:
+            descriptors = self.encode_faces([(context, [face_locations[i] for i in pending])])[0]
+            for i, face_encoding in zip(pending, descriptors):
+                face_encodings[i] = face_encoding
+                if i in yaws:
+                    self.embedding_cache.store(track_ids[i], face_locations[i], yaws[i], face_encoding)
+        
+        if self.tracker is not None:
+            self.quality_assessor.retain(track_ids)
+            self.liveness_detector.retain(track_ids)
+            if self.embedding_cache is not None:
+                self.embedding_cache.retain(track_ids)
             
+        return track_ids, face_locations, face_encodings
+    
+    def encode_faces(self, batch):
+        """批量计算人脸特征编码
+        
+        batch为 [(context, [face_location, ...]), ...]，可以包含一个短时间窗口内的多帧，
+        所有人脸的特征点组成 full_object_detections 后一次调用ResNet。
+        返回与输入顺序一致的 [[encoding, ...], ...]
+        """
+        images = []
+        shape_batches = []
+        for context, face_locations in batch:
+            if not face_locations:
+                continue
+            shapes = dlib.full_object_detections()
+            for face_location in face_locations:
+                shapes.append(context.shape(face_location))
+            images.append(context.frame)
+            shape_batches.append(shapes)
+        
+        if not images:
+            return [[] for _ in batch]
+        if len(images) == 1:
+            descriptors = [self.face_rec.compute_face_descriptor(images[0], shape_batches[0])]
+        else:
+            descriptors = self.face_rec.compute_face_descriptor(images, shape_batches)
+        
+        results = []
+        frame_descriptors = iter(descriptors)
+        for _, face_locations in batch:
+            if not face_locations:
+                results.append([])
+                continue
+            results.append([np.array(d) for d in next(frame_descriptors)])
+        return results
+    
+    def detect_faces(self, frame, context=None):
+        _, face_locations, face_encodings = self.track_faces(frame, context)
         return face_locations, face_encodings 
     
-    def detect_and_identify_faces(self, frame):
-        """检测并识别人脸"""
-        face_locations, face_encodings = self.detect_faces(frame)
+    def detect_and_identify_faces(self, frame, frame_id=None):
+        """检测并识别人脸，frame_id为帧序号（如Camera.last_seq），供运动门控按帧去重"""
+        if self.motion_gate is not None:
+            if self.motion_gate.check('face', frame, frame_id=frame_id) == GATE_SKIP:
+                return self.last_result
+            start = time.perf_counter()
+            self.last_result = self._identify_faces(frame)
+            self.motion_gate.record_run('face', start, time.perf_counter())
+            return self.last_result
+        return self._identify_faces(frame)
+    
+    def _identify_faces(self, frame):
+        context = self.create_context(frame)
+        track_ids, face_locations, face_encodings = self.track_faces(frame, context)
+        self.track_states.evict()
         identities = []
         confirmed_faces = []
         
         if face_encodings:
-            # 批量特征匹配
-            names, distances = self.face_matcher.batch_match_faces(face_encodings)
+            # 批量特征匹配，编码顺序与人脸位置一致
+            names, distances = self.face_matcher.batch_match_faces(np.array(face_encodings))
             
             for i, (face_location, name, distance) in enumerate(zip(face_locations, names, distances)):
+                if self.embedding_cache is not None:
+                    self.embedding_cache.update_identity(track_ids[i], name, distance)
+                
                 # 质量检查
-                quality_ok, quality_scores = self.quality_assessor.assess_quality(frame, face_location)
-                if not quality_ok:
+                quality_score, _ = self.quality_assessor.assess_quality(
+                    context, face_location, track_ids[i], face_encodings[i])
+                if not self.quality_assessor.is_acceptable(quality_score):
                     continue
                 
-                # 获取面部关键点
-                shape = self.predictor(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY),
-                                     dlib.rectangle(*face_location))
+                # 活体检测和多帧确认按轨迹累计，未启用跟踪时按姓名累计
+                track_key = track_ids[i] if track_ids[i] is not None else name
                 
-                # 活体检测
-                if not self.liveness_detector.detect_liveness(frame, shape):
+                # 活体检测（复用上下文中的面部关键点）
+                if not self.liveness_detector.detect_liveness(context, face_location, track_key):
                     continue
                 
-                # 多帧确认
-                if name:
-                    self.face_tracker[name].append((face_location, distance))
-                    if len(self.face_tracker[name]) >= FACE_TRACKING['confirm_frames']:
-                        recent_distances = [d for _, d in self.face_tracker[name][-FACE_TRACKING['confirm_frames']:]]
-                        if np.mean(recent_distances) <= FACE_TRACKING['tracking_threshold']:
-                            confirmed_faces.append(face_location)
-                            identities.append(name)
-                            self.logger.info(f"Confirmed identity: {name}")
-                            continue
+                if track_key is not None and self.track_states.update(track_key, name, distance):
+                    confirmed_faces.append(face_location)
+                    identities.append(name)
+                    self.logger.info(f"Confirmed identity: {name}")
+                    continue
                 
                 identities.append("Unknown")
                 
         return confirmed_faces, face_encodings, identities
     
-    def _cleanup_tracking_data(self):
-        """清理过期的人脸跟踪数据"""
-        for name in list(self.face_tracker.keys()):
-            if len(self.face_tracker[name]) > FACE_TRACKING['max_frames_missing']:
-                self.face_tracker[name] = self.face_tracker[name][-FACE_TRACKING['max_frames_missing']:]
+    def get_cache_stats(self):
+        """获取特征编码缓存的命中统计"""
+        if self.embedding_cache is None:
+            return None
+        return self.embedding_cache.get_stats()
     
     def register_face(self, frame, name):
         """注册新的人脸"""
         self.logger.info(f"Attempting to register new face for: {name}")
-        result = super().register_face(frame, name)
+        track_ids, face_locations, face_encodings = self.track_faces(frame)
+        result = len(face_encodings) > 0
         if result:
+            # 取画面中最大的人脸，优先使用该轨迹中质量最高的一帧
+            largest = int(np.argmax([(x2 - x1) * (y2 - y1) for x1, y1, x2, y2 in face_locations]))
+            face_encoding = face_encodings[largest]
+            best = self.quality_assessor.best_for_track(track_ids[largest])
+            if best is not None and best.best_encoding is not None:
+                face_encoding = best.best_encoding
+            # 写入人脸库后增量加入匹配索引，不阻塞识别
+            row_ids = self.face_db.add_face(name, face_encoding)
+            self.face_matcher.add_templates(name, face_encoding, row_ids)
             self.logger.info(f"Successfully registered face for: {name}")
         else:
             self.logger.warning(f"Failed to register face for: {name}")
-        return result
\ No newline at end of file
+        return result
@@ -0,0 +1,153 @@
+import json
+import os
+import pickle
+import threading
+import numpy as np
+from modules.utils.logger import Logger
+
+class FaceGallery:
+    """基于内存映射的列式人脸库
+
+    目录结构：
+        embeddings.f32  连续的float32特征矩阵，每行一个模板，只追加
+        index.jsonl     与矩阵行一一对应的 {"id": 行号, "name": 姓名}
+        manifest.json   已提交的行数，通过原子替换提交
+
+    加载时只信任manifest中记录的行数，写入中途崩溃留下的尾部数据会被截断。
+    """
+    EMBEDDINGS_FILE = 'embeddings.f32'
+    INDEX_FILE = 'index.jsonl'
+    MANIFEST_FILE = 'manifest.json'
+
+    def __init__(self, gallery_dir, dim=128):
+        self.logger = Logger.get_logger("FaceGallery")
+        self.gallery_dir = gallery_dir
+        self.dim = dim
+        self.count = 0
+        self.names = []
+        self.index_bytes = 0  # 已提交的index.jsonl字节数
+        self.embeddings = np.empty((0, dim), dtype=np.float32)
+        self.lock = threading.Lock()
+        os.makedirs(gallery_dir, exist_ok=True)
+        self.load()
+
+    def _path(self, name):
+        return os.path.join(self.gallery_dir, name)
+
+    def load(self):
+        """加载人脸库并映射特征矩阵"""
+        manifest_path = self._path(self.MANIFEST_FILE)
+        if os.path.exists(manifest_path):
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            self.dim = manifest['dim']
+            self.count = manifest['count']
+        else:
+            self.count = 0
+
+        # 丢弃未提交的尾部数据
+        self._truncate(self._path(self.EMBEDDINGS_FILE), self.count * self.dim * 4)
+        names = []
+        index_path = self._path(self.INDEX_FILE)
+        if os.path.exists(index_path):
+            with open(index_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if len(names) >= self.count:
+                        break
+                    names.append(json.loads(line)['name'])
+        self.index_bytes = self._index_size(names)
+        self._truncate(index_path, self.index_bytes)
+        if len(names) != self.count:
+            raise ValueError(f"Face gallery index has {len(names)} entries, manifest expects {self.count}")
+        self.names = names
+        self._map()
+        self.logger.info(f"Face gallery loaded: {self.count} templates")
+
+    def _map(self):
+        if self.count == 0:
+            self.embeddings = np.empty((0, self.dim), dtype=np.float32)
+            return
+        self.embeddings = np.memmap(
+            self._path(self.EMBEDDINGS_FILE), dtype=np.float32, mode='r',
+            shape=(self.count, self.dim)
+        )
+
+    @staticmethod
+    def _index_line(row_id, name):
+        return json.dumps({'id': row_id, 'name': name}, ensure_ascii=False) + '\n'
+
+    def _index_size(self, names):
+        return sum(len(self._index_line(i, n).encode('utf-8')) for i, n in enumerate(names))
+
+    @staticmethod
+    def _truncate(path, size):
+        if os.path.exists(path) and os.path.getsize(path) > size:
+            with open(path, 'r+b') as f:
+                f.truncate(size)
+
+    def _rollback(self):
+        """把两个数据文件截断到已提交的大小"""
+        self._truncate(self._path(self.EMBEDDINGS_FILE), self.count * self.dim * 4)
+        self._truncate(self._path(self.INDEX_FILE), self.index_bytes)
+
+    def _commit(self, count):
+        """原子写入manifest提交新的行数"""
+        tmp_path = self._path(self.MANIFEST_FILE + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': 1, 'dim': self.dim, 'count': count}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self._path(self.MANIFEST_FILE))
+
+    def add(self, names, encodings):
+        """追加一个或多个模板并原子提交，返回新行号列表"""
+        if isinstance(names, str):
+            names = [names]
+        encodings = np.asarray(encodings, dtype=np.float32).reshape(-1, self.dim)
+        if len(names) != len(encodings):
+            raise ValueError("names and encodings must have the same length")
+
+        with self.lock:
+            start = self.count
+            lines = ''.join(self._index_line(start + offset, name) for offset, name in enumerate(names))
+            # 行号按已提交的行数分配，追加前先截掉之前失败写入留下的尾部数据
+            self._rollback()
+            try:
+                with open(self._path(self.EMBEDDINGS_FILE), 'ab') as f:
+                    f.write(encodings.tobytes())
+                    f.flush()
+                    os.fsync(f.fileno())
+                with open(self._path(self.INDEX_FILE), 'ab') as f:
+                    f.write(lines.encode('utf-8'))
+                    f.flush()
+                    os.fsync(f.fileno())
+                self._commit(start + len(names))
+            except Exception:
+                self._rollback()
+                raise
+
+            self.index_bytes += len(lines.encode('utf-8'))
+            self.count = start + len(names)
+            self.names = self.names + list(names)
+            self._map()
+            return list(range(start, self.count))
+
+    def __len__(self):
+        return self.count
+
+    def snapshot(self):
+        """返回 (names, embeddings)，embeddings为只读内存映射"""
+        with self.lock:
+            return self.names, self.embeddings
+
+    def migrate_from_pickle(self, database_file):
+        """从旧版pickle人脸库 {name: encoding} 一次性迁移"""
+        with open(database_file, 'rb') as f:
+            known_faces = pickle.load(f)
+        if not known_faces:
+            return 0
+        names = list(known_faces.keys())
+        encodings = np.array([np.asarray(e).ravel() for e in known_faces.values()], dtype=np.float32)
+        self.add(names, encodings)
+        self.logger.info(f"Migrated {len(names)} faces from {database_file}")
+        return len(names)
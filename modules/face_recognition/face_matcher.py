@@ -1,66 +1,364 @@
 import numpy as np
-from sklearn.neighbors import KDTree
+import tempfile
 import threading
+from config.config import FACE_MATCHER
 from modules.utils.logger import Logger
+from .quantization import create_codec, slice_codes, concat_codes
+
+class MatcherIndex:
+    """不可变的模板索引快照
+
+    构建完成后不再修改，读者拿到引用即可无锁查询。
+    """
+    def __init__(self, names, encodings, chunk_size, row_ids=None, codec=None, rerank=0):
+        self.names = list(names)
+        self.identities = list(dict.fromkeys(self.names))
+        self.identity_index = {name: i for i, name in enumerate(self.identities)}
+        self.encodings = encodings
+        # 模板在人脸库中的行号，-1表示不来自人脸库
+        self.row_ids = np.full(len(self.names), -1, dtype=np.int64) if row_ids is None \
+            else np.asarray(row_ids, dtype=np.int64)
+        self.template_ids = template_ids = np.fromiter((self.identity_index[n] for n in self.names),
+                                                       dtype=np.int64, count=len(self.names))
+        self.codec = codec
+        self.codes = None
+        self.rerank = rerank
+
+        # 预先计算模板平方范数，并为每个块记录按身份分段的排列
+        self.sq_norms = np.empty(len(self.names), dtype=np.float32)
+        self.chunks = []
+        for start in range(0, len(self.names), chunk_size):
+            end = min(start + chunk_size, len(self.names))
+            block = np.asarray(encodings[start:end], dtype=np.float32)
+            self.sq_norms[start:end] = np.einsum('ij,ij->i', block, block)
+            ids = template_ids[start:end]
+            order = np.argsort(ids, kind='stable')
+            sorted_ids = ids[order]
+            seg_starts = np.flatnonzero(np.r_[True, sorted_ids[1:] != sorted_ids[:-1]])
+            self.chunks.append((start, end, order, seg_starts, sorted_ids[seg_starts]))
+
+        # 压缩模式：按块编码，原始特征仅在精确重排时按行读取
+        if codec is not None and len(self.names) > 0:
+            codec.fit(encodings)
+            self.codes = concat_codes([
+                codec.encode(np.asarray(encodings[start:end], dtype=np.float32))
+                for start, end, *_ in self.chunks
+            ])
+            if not isinstance(encodings, np.memmap):
+                self.encodings = self._spill(encodings)
+
+    @staticmethod
+    def _spill(encodings):
+        """把重排用的原始特征写入临时文件并内存映射，不再常驻内存"""
+        mapped = np.memmap(tempfile.TemporaryFile(), dtype=np.float32, mode='w+',
+                           shape=np.shape(encodings))
+        mapped[:] = encodings
+        mapped.flush()
+        return mapped
+
+    @classmethod
+    def empty(cls, chunk_size):
+        return cls([], np.empty((0, 0), dtype=np.float32), chunk_size)
+
+    def __len__(self):
+        return len(self.names)
+
+    def subset(self, indices, chunk_size):
+        """按模板下标取子集，返回新快照"""
+        indices = np.asarray(indices, dtype=np.int64)
+        if len(indices) == 0:
+            return MatcherIndex.empty(chunk_size)
+        return MatcherIndex([self.names[i] for i in indices],
+                            np.asarray(self.encodings, dtype=np.float32)[indices],
+                            chunk_size, self.row_ids[indices])
+
+    def resident_encodings_bytes(self):
+        """常驻内存的原始float32特征；内存映射（人脸库或压缩模式的临时文件）按需分页，不计入"""
+        if isinstance(self.encodings, np.memmap):
+            return 0
+        return np.asarray(self.encodings).nbytes
+
+    def memory_usage(self):
+        """常驻内存占用（字节）
+
+        压缩模式下精确重排的原始特征放在内存映射中，只计入压缩编码。
+        """
+        overhead = self.sq_norms.nbytes + self.template_ids.nbytes + self.row_ids.nbytes
+        codes = self.codec.nbytes(self.codes) if self.codes is not None else 0
+        return codes + self.resident_encodings_bytes() + overhead
+
+    def _compressed_scores(self, queries, q_norms):
+        """压缩模式：查表近似距离选出候选模板，再用原始特征精确重排"""
+        candidates = []
+        approx_distances = []
+        for start, end, *_ in self.chunks:
+            approx = self.codec.approx_sq_distances(queries, q_norms, slice_codes(self.codes, start, end))
+            r = min(self.rerank, end - start)
+            part = np.argpartition(approx, r - 1, axis=1)[:, :r]
+            candidates.append(part + start)
+            approx_distances.append(np.take_along_axis(approx, part, axis=1))
+        candidates = np.concatenate(candidates, axis=1)
+        if candidates.shape[1] > self.rerank:
+            approx = np.concatenate(approx_distances, axis=1)
+            best = np.argpartition(approx, self.rerank - 1, axis=1)[:, :self.rerank]
+            candidates = np.take_along_axis(candidates, best, axis=1)
+
+        totals = np.full((len(queries), len(self.identities)), np.inf, dtype=np.float32)
+        for row, query, rows in zip(totals, queries, candidates):
+            rows = np.sort(rows)
+            exact = np.linalg.norm(np.asarray(self.encodings[rows], dtype=np.float32) - query, axis=1)
+            np.minimum.at(row, self.template_ids[rows], exact)
+        return totals, None
+
+    def identity_scores(self, queries, q_norms, aggregate):
+        """计算每个查询对每个身份的距离汇总
+
+        aggregate为min时返回 (最小距离, None)，为mean时返回 (距离和, 模板数)。
+        压缩模式只对重排候选计算精确距离，固定按最小值聚合。
+        """
+        if self.codes is not None:
+            return self._compressed_scores(queries, q_norms)
+        n_ids = len(self.identities)
+        if aggregate == 'mean':
+            totals = np.zeros((len(queries), n_ids), dtype=np.float32)
+            counts = np.zeros(n_ids, dtype=np.float32)
+        else:
+            totals = np.full((len(queries), n_ids), np.inf, dtype=np.float32)
+            counts = None
+
+        for start, end, order, seg_starts, seg_ids in self.chunks:
+            block = np.asarray(self.encodings[start:end], dtype=np.float32)
+            d2 = q_norms + self.sq_norms[start:end] - 2.0 * (queries @ block.T)
+            np.maximum(d2, 0.0, out=d2)
+            d2 = np.sqrt(d2, out=d2)[:, order]
+            if aggregate == 'mean':
+                totals[:, seg_ids] += np.add.reduceat(d2, seg_starts, axis=1)
+                counts[seg_ids] += np.diff(np.r_[seg_starts, end - start])
+            else:
+                totals[:, seg_ids] = np.minimum(totals[:, seg_ids],
+                                                np.minimum.reduceat(d2, seg_starts, axis=1))
+        return totals, counts
 
 class FaceMatcher:
-    def __init__(self):
+    """基于矩阵乘法的暴力特征匹配
+
+    每个身份可以有多个模板，全部模板存放在一个连续矩阵中。查询时利用
+    |q-t|² = |q|² + |t|² - 2q·t 展开，用一次BLAS矩阵乘法计算所有距离，
+    大库按块处理以限制内存占用，再按身份聚合（最小值或平均值）。
+
+    索引以读-复制-更新方式维护：主索引和增量缓冲区都是不可变快照，
+    写入方在热路径之外构建新快照后整体替换，查询从不加锁等待。
+    少量新增模板先进入增量缓冲区，与主索引一起检索，达到阈值后在后台合并。
+    """
+    def __init__(self, config=None):
         self.logger = Logger.get_logger("FaceMatcher")
-        self.face_tree = None
-        self.names = []
-        self.encodings = []
-        self.lock = threading.Lock()
-        
+        config = FACE_MATCHER if config is None else config
+        self.chunk_size = config['chunk_size']
+        self.aggregate = config['aggregate']
+        self.delta_compact_size = config['delta_compact_size']
+        self.storage = config['storage']
+        self.rerank = config['rerank_candidates']
+        self.pq_subspaces = config['pq_subspaces']
+        if self.storage != 'float32' and self.aggregate != 'min':
+            self.logger.warning(f"Storage mode {self.storage} only supports 'min' aggregation")
+            self.aggregate = 'min'
+        self.gallery = None
+        # (主索引, 增量缓冲区)，整体替换保证读者看到一致的状态
+        self._state = (MatcherIndex.empty(self.chunk_size), MatcherIndex.empty(self.chunk_size))
+        self.write_lock = threading.Lock()    # 保护增量缓冲区的读-改-写
+        self.compact_lock = threading.Lock()  # 同一时间只允许一次全量重建
+        self.compact_event = threading.Event()
+        self.compact_thread = None
+
+    @property
+    def names(self):
+        main, delta = self._state
+        return main.names + delta.names
+
+    @property
+    def identities(self):
+        return self._merged_identities(*self._state)[0]
+
+    def _build_main(self, names, encodings, row_ids=None):
+        """按配置的存储模式构建主索引，增量缓冲区始终使用float32"""
+        codec = create_codec(self.storage, num_subspaces=self.pq_subspaces)
+        return MatcherIndex(names, encodings, self.chunk_size, row_ids, codec, self.rerank)
+
+    def memory_usage(self):
+        """报告索引内存占用"""
+        main, delta = self._state
+        return {
+            'storage': self.storage,
+            'templates': len(main) + len(delta),
+            'index_bytes': main.memory_usage() + delta.memory_usage(),
+            # 其中常驻内存的原始特征，内存映射（人脸库或压缩模式）时为0
+            'rerank_bytes': main.resident_encodings_bytes() + delta.resident_encodings_bytes(),
+            'float32_bytes': sum(len(index) * index.encodings.shape[-1] * 4 for index in (main, delta))
+        }
+
     def update_database(self, known_faces):
-        """更新人脸特征数据库并构建KD树"""
-        with self.lock:
-            self.names = list(known_faces.keys())
-            self.encodings = np.array(list(known_faces.values()))
-            if len(self.encodings) > 0:
-                self.face_tree = KDTree(self.encodings)
-                self.logger.info("Face matching KD-tree updated")
+        """更新人脸特征数据库，值可以是单个编码或 (n, dim) 的多模板矩阵"""
+        names = []
+        encodings = []
+        for name, value in known_faces.items():
+            value = np.asarray(value, dtype=np.float32)
+            value = value.reshape(-1, value.shape[-1])
+            names.extend([name] * len(value))
+            encodings.append(value)
+        matrix = np.concatenate(encodings) if encodings else np.empty((0, 0), dtype=np.float32)
+        self.gallery = None
+        self.set_templates(names, matrix)
+
+    def load_gallery(self, gallery):
+        """直接使用人脸库的内存映射特征矩阵"""
+        self.gallery = gallery
+        names, embeddings = gallery.snapshot()
+        self.set_templates(names, embeddings, np.arange(len(names)))
+
+    def set_templates(self, names, encodings, row_ids=None):
+        """全量替换模板，encodings可以是内存映射矩阵，不会被复制"""
+        with self.compact_lock:
+            # 在写锁外构建新快照，查询线程继续使用旧快照
+            main = self._build_main(names, encodings, row_ids)
+            with self.write_lock:
+                self._state = (main, MatcherIndex.empty(self.chunk_size))
+        self.logger.info(f"Face matcher updated: {len(main.identities)} identities, {len(main)} templates")
+
+    def add_templates(self, names, encodings, row_ids=None):
+        """增量添加模板（注册新人脸），写入增量缓冲区后立即可查"""
+        if isinstance(names, str):
+            names = [names]
+        encodings = np.asarray(encodings, dtype=np.float32).reshape(len(names), -1)
+        row_ids = np.full(len(names), -1, dtype=np.int64) if row_ids is None \
+            else np.asarray(row_ids, dtype=np.int64)
+
+        with self.write_lock:
+            main, delta = self._state
+            delta_encodings = encodings if len(delta) == 0 else \
+                np.concatenate([np.asarray(delta.encodings, dtype=np.float32), encodings])
+            new_delta = MatcherIndex(delta.names + list(names), delta_encodings,
+                                     self.chunk_size, np.r_[delta.row_ids, row_ids])
+            self._state = (main, new_delta)
+
+        if len(new_delta) >= self.delta_compact_size:
+            self._schedule_compaction()
+
+    def _schedule_compaction(self):
+        """唤醒后台合并线程，首次调用时在写锁内创建，避免并发启动多个线程"""
+        with self.write_lock:
+            if self.compact_thread is None:
+                self.compact_thread = threading.Thread(target=self._compact_loop)
+                self.compact_thread.daemon = True
+                self.compact_thread.start()
+        self.compact_event.set()
+
+    def _compact_loop(self):
+        """后台合并增量缓冲区"""
+        while True:
+            self.compact_event.wait()
+            self.compact_event.clear()
+            try:
+                self.compact()
+            except Exception as e:
+                self.logger.error(f"Face matcher compaction error: {str(e)}")
+
+    def compact(self):
+        """将增量缓冲区合并进主索引"""
+        with self.compact_lock:
+            main, delta = self._state
+            if len(delta) == 0:
+                return
+
+            if self.gallery is not None:
+                # 人脸库已包含新增行，直接重新映射即可
+                names, embeddings = self.gallery.snapshot()
+                new_main = self._build_main(names, embeddings, np.arange(len(names)))
+                covered = len(new_main)
             else:
-                self.face_tree = None
-    
+                parts = [np.asarray(delta.encodings, dtype=np.float32)]
+                if len(main) > 0:
+                    parts.insert(0, np.asarray(main.encodings, dtype=np.float32))
+                new_main = self._build_main(main.names + delta.names, np.concatenate(parts))
+                covered = None
+
+            with self.write_lock:
+                _, current_delta = self._state
+                # 保留合并期间新增、尚未进入新主索引的模板
+                if covered is not None:
+                    keep = np.flatnonzero((current_delta.row_ids < 0) | (current_delta.row_ids >= covered))
+                else:
+                    keep = np.arange(len(delta), len(current_delta))
+                self._state = (new_main, current_delta.subset(keep, self.chunk_size))
+        self.logger.info(f"Face matcher compacted: {len(new_main)} templates in main index")
+
+    @staticmethod
+    def _merged_identities(main, delta):
+        """主索引身份在前，增量缓冲区中的新身份追加在后"""
+        identities = list(main.identities)
+        delta_columns = []
+        for name in delta.identities:
+            column = main.identity_index.get(name)
+            if column is None:
+                column = len(identities)
+                identities.append(name)
+            delta_columns.append(column)
+        return identities, np.asarray(delta_columns, dtype=np.int64)
+
+    def _identity_distances(self, main, delta, queries):
+        """计算每个查询到每个身份的聚合距离，返回 (identities, (n_queries, n_identities))"""
+        queries = np.asarray(queries, dtype=np.float32).reshape(len(queries), -1)
+        q_norms = np.einsum('ij,ij->i', queries, queries)[:, None]
+        totals, counts = main.identity_scores(queries, q_norms, self.aggregate)
+        identities = main.identities
+
+        if len(delta) > 0:
+            identities, columns = self._merged_identities(main, delta)
+            delta_totals, delta_counts = delta.identity_scores(queries, q_norms, self.aggregate)
+            extra = len(identities) - totals.shape[1]
+            if self.aggregate == 'mean':
+                totals = np.pad(totals, ((0, 0), (0, extra)))
+                counts = np.pad(counts, (0, extra))
+                totals[:, columns] += delta_totals
+                counts[columns] += delta_counts
+            else:
+                totals = np.pad(totals, ((0, 0), (0, extra)), constant_values=np.inf)
+                totals[:, columns] = np.minimum(totals[:, columns], delta_totals)
+
+        if self.aggregate == 'mean':
+            totals /= np.maximum(counts, 1.0)
+        return identities, totals
+
+    def query(self, face_encodings, k=1):
+        """返回每个查询距离最近的k个身份 [[(name, distance), ...], ...]"""
+        main, delta = self._state  # 原子读取当前快照，无需加锁
+        if len(main) + len(delta) == 0 or len(face_encodings) == 0:
+            return [[] for _ in range(len(face_encodings))]
+        identities, distances = self._identity_distances(main, delta, face_encodings)
+
+        k = min(k, distances.shape[1])
+        top = np.argpartition(distances, k - 1, axis=1)[:, :k]
+        results = []
+        for row, candidates in zip(distances, top):
+            candidates = candidates[np.argsort(row[candidates])]
+            # 压缩模式下未进入重排候选的身份距离为inf，不返回
+            results.append([(identities[i], float(row[i])) for i in candidates if np.isfinite(row[i])])
+        return results
+
     def match_face(self, face_encoding, threshold=0.6):
-        """使用KD树进行快速特征匹配"""
-        with self.lock:
-            if self.face_tree is None or len(self.encodings) == 0:
-                return None, None
-                
-            # 使用KD树查找最近邻
-            distances, indices = self.face_tree.query(
-                face_encoding.reshape(1, -1), 
-                k=1
-            )
-            
-            distance = distances[0][0]
-            if distance <= threshold:
-                return self.names[indices[0][0]], distance
-                
-            return None, None
-    
+        """匹配单个人脸特征"""
+        names, distances = self.batch_match_faces(np.asarray(face_encoding).reshape(1, -1), threshold)
+        return names[0], distances[0]
+
     def batch_match_faces(self, face_encodings, threshold=0.6):
         """批量匹配多个人脸特征"""
-        with self.lock:
-            if self.face_tree is None or len(self.encodings) == 0:
-                return [None] * len(face_encodings), [None] * len(face_encodings)
-                
-            # 批量查询KD树
-            distances, indices = self.face_tree.query(
-                np.array(face_encodings), 
-                k=1
-            )
-            
-            names = []
-            match_distances = []
-            
-            for distance, idx in zip(distances, indices):
-                if distance <= threshold:
-                    names.append(self.names[idx[0]])
-                    match_distances.append(distance)
-                else:
-                    names.append(None)
-                    match_distances.append(None)
-                    
-            return names, match_distances 
\ No newline at end of file
+        names = []
+        match_distances = []
+        for candidates in self.query(face_encodings, k=1):
+            if candidates and candidates[0][1] <= threshold:
+                names.append(candidates[0][0])
+                match_distances.append(candidates[0][1])
+            else:
+                names.append(None)
+                match_distances.append(None)
+
+        return names, match_distances
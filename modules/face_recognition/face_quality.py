@@ -1,81 +1,115 @@
 import cv2
+import time
 import numpy as np
 from config.config import FACE_QUALITY
 from modules.utils.logger import Logger
 
+class TrackQuality:
+    """单个轨迹的质量缓存"""
+    __slots__ = ('score', 'metrics', 'location', 'timestamp',
+                 'best_score', 'best_location', 'best_encoding', 'best_timestamp')
+
+    def __init__(self):
+        self.score = 0.0
+        self.metrics = None
+        self.location = None
+        self.timestamp = 0.0
+        self.best_score = -1.0
+        self.best_location = None
+        self.best_encoding = None
+        self.best_timestamp = 0.0
+
 class FaceQualityAssessor:
+    """人脸质量评估
+
+    人脸区域先裁剪到画面范围内，再缩放到固定尺寸的预分配缓冲区，亮度和
+    清晰度都在该小图上计算，单个评估器不可跨线程共享。
+    """
     def __init__(self):
         self.logger = Logger.get_logger("FaceQualityAssessor")
-        
-    def assess_quality(self, frame, face_location):
-        """评估人脸图像质量"""
+        size = FACE_QUALITY['crop_size']
+        self.crop_size = size
+        self._crop = np.empty((size, size), dtype=np.uint8)
+        self._laplacian = np.empty((size, size), dtype=np.float32)
+        self.weights = FACE_QUALITY['weights']
+        self.track_cache = {}
+
+    @staticmethod
+    def clamp_location(face_location, shape):
+        """将人脸框限制在画面范围内"""
+        h, w = shape[:2]
         x1, y1, x2, y2 = face_location
-        face_img = frame[y1:y2, x1:x2]
-        
-        quality_scores = {}
-        
-        # 检查人脸大小
-        face_size = min(x2-x1, y2-y1)
-        quality_scores['size'] = face_size >= FACE_QUALITY['min_face_size']
-        
-        # 检查亮度
-        gray = cv2.cvtColor(face_img, cv2.COLOR_BGR2GRAY)
-        brightness = np.mean(gray)
-        quality_scores['brightness'] = brightness >= FACE_QUALITY['min_brightness']
-        
-        # 检查清晰度
-        laplacian = cv2.Laplacian(gray, cv2.CV_64F)
-        sharpness = np.var(laplacian)
-        quality_scores['sharpness'] = sharpness >= FACE_QUALITY['min_sharpness']
-        
-        # 计算总体质量分数
-        overall_score = sum(quality_scores.values()) / len(quality_scores)
-        
-        return overall_score >= FACE_QUALITY['confidence_threshold'], quality_scores
-
-class LivenessDetector:
-    def __init__(self):
-        self.logger = Logger.get_logger("LivenessDetector")
-        self.last_check_time = 0
-        self.blink_detector = None  # 使用dlib的眼睛关键点检测
-        self.last_eye_state = None
-        self.blink_count = 0
-        
-    def detect_liveness(self, frame, face_shape):
-        """检测活体"""
-        current_time = time.time()
-        if current_time - self.last_check_time < LIVENESS_DETECTION['check_interval']:
-            return True
-            
-        self.last_check_time = current_time
-        
-        # 检测眨眼
-        eye_state = self._check_eye_state(face_shape)
-        if eye_state != self.last_eye_state:
-            if eye_state == 'closed':
-                self.blink_count += 1
-        self.last_eye_state = eye_state
-        
-        # 检测头部运动
-        head_movement = self._check_head_movement(face_shape)
-        
-        # 综合判断
-        is_live = (self.blink_count > 0 or head_movement)
-        
-        if is_live:
-            self.logger.info("Liveness check passed")
+        return max(0, x1), max(0, y1), min(w, x2), min(h, y2)
+
+    def _measure(self, gray, face_location):
+        """在固定尺寸的小图上计算尺寸、亮度和清晰度"""
+        x1, y1, x2, y2 = self.clamp_location(face_location, gray.shape)
+        face_size = min(x2 - x1, y2 - y1)
+        if face_size < 2:
+            return {'size': max(face_size, 0), 'brightness': 0.0, 'sharpness': 0.0}
+
+        cv2.resize(gray[y1:y2, x1:x2], (self.crop_size, self.crop_size),
+                   dst=self._crop, interpolation=cv2.INTER_AREA)
+        cv2.Laplacian(self._crop, cv2.CV_32F, dst=self._laplacian)
+        brightness = cv2.mean(self._crop)[0]
+        _, std = cv2.meanStdDev(self._laplacian)
+        return {'size': face_size, 'brightness': brightness, 'sharpness': float(std[0, 0]) ** 2}
+
+    def _score(self, metrics):
+        """将各项指标归一化到0~1后加权求和"""
+        size_score = min(1.0, metrics['size'] / float(FACE_QUALITY['min_face_size']))
+
+        brightness = metrics['brightness']
+        if brightness < FACE_QUALITY['min_brightness']:
+            brightness_score = brightness / FACE_QUALITY['min_brightness']
+        elif brightness > FACE_QUALITY['max_brightness']:
+            brightness_score = (255.0 - brightness) / (255.0 - FACE_QUALITY['max_brightness'])
         else:
-            self.logger.warning("Possible spoofing attempt detected")
-            
-        return is_live
-        
-    def _check_eye_state(self, face_shape):
-        """检查眼睛状态（开/闭）"""
-        # 使用面部关键点计算眼睛纵横比(EAR)
-        # 实际实现需要使用dlib的面部关键点
-        pass
-        
-    def _check_head_movement(self, face_shape):
-        """检测头部运动"""
-        # 使用连续帧中的面部关键点计算头部姿态变化
-        pass 
\ No newline at end of file
+            brightness_score = 1.0
+
+        sharpness_score = min(1.0, metrics['sharpness'] / float(FACE_QUALITY['min_sharpness']))
+
+        return (self.weights['size'] * size_score +
+                self.weights['brightness'] * brightness_score +
+                self.weights['sharpness'] * sharpness_score)
+
+    def assess_quality(self, context, face_location, track_id=None, face_encoding=None):
+        """评估人脸图像质量，返回 (score, metrics)，score取值0~1
+
+        提供track_id时缓存该轨迹的最新结果和质量最高的一帧（连同其特征编码），
+        供识别和注册时选择最佳帧。
+        """
+        metrics = self._measure(context.gray, face_location)
+        score = self._score(metrics)
+
+        if track_id is not None:
+            now = time.monotonic()
+            entry = self.track_cache.get(track_id)
+            if entry is None:
+                entry = self.track_cache[track_id] = TrackQuality()
+            entry.score = score
+            entry.metrics = metrics
+            entry.location = face_location
+            entry.timestamp = now
+            if score > entry.best_score:
+                entry.best_score = score
+                entry.best_location = face_location
+                entry.best_encoding = face_encoding
+                entry.best_timestamp = now
+
+        return score, metrics
+
+    def is_acceptable(self, score):
+        """质量分数是否达到识别要求"""
+        return score >= FACE_QUALITY['confidence_threshold']
+
+    def best_for_track(self, track_id):
+        """获取轨迹中质量最高的一帧记录"""
+        return self.track_cache.get(track_id)
+
+    def retain(self, active_track_ids):
+        """移除已离开画面的轨迹缓存"""
+        active = set(active_track_ids)
+        for track_id in list(self.track_cache.keys()):
+            if track_id not in active:
+                del self.track_cache[track_id]
@@ -0,0 +1,118 @@
+import itertools
+import dlib
+from config.config import FACE_TRACKING
+from modules.utils.logger import Logger
+from modules.utils.geometry import iou
+
+class FaceTrack:
+    """单个人脸轨迹"""
+    def __init__(self, track_id, location):
+        self.track_id = track_id
+        self.location = location
+        self.confidence = float('inf')
+        self.tracker = dlib.correlation_tracker()
+
+    def restart(self, gray, location):
+        """用检测结果重新初始化相关滤波跟踪器"""
+        self.location = location
+        self.confidence = float('inf')
+        self.tracker.start_track(gray, dlib.rectangle(*location))
+
+    def update(self, gray):
+        """跟踪到新帧，返回跟踪置信度(PSR)"""
+        self.confidence = self.tracker.update(gray)
+        pos = self.tracker.get_position()
+        h, w = gray.shape[:2]
+        self.location = (
+            max(0, int(pos.left())),
+            max(0, int(pos.top())),
+            min(w - 1, int(pos.right())),
+            min(h - 1, int(pos.bottom()))
+        )
+        return self.confidence
+
+class FaceTracker:
+    """检测-跟踪混合的人脸定位器
+
+    每隔 detect_interval 帧或跟踪置信度过低时运行完整的HOG检测，
+    其余帧使用 dlib.correlation_tracker 跟踪，每个人脸拥有稳定的轨迹ID。
+    """
+    def __init__(self, detector):
+        self.logger = Logger.get_logger("FaceTracker")
+        self.detector = detector
+        self.detect_interval = FACE_TRACKING['detect_interval']
+        self.min_confidence = FACE_TRACKING['min_tracker_confidence']
+        self.iou_threshold = FACE_TRACKING['iou_threshold']
+        self.tracks = []
+        self.frames_since_detect = 0
+        self._next_id = itertools.count(1)
+        self.detect_count = 0
+        self.track_count = 0
+
+    def update(self, context):
+        """处理一帧，返回 [(track_id, (x1, y1, x2, y2)), ...]"""
+        gray = context.gray
+        self.frames_since_detect += 1
+        need_detect = not self.tracks or self.frames_since_detect >= self.detect_interval
+
+        if not need_detect:
+            for track in self.tracks:
+                if track.update(gray) < self.min_confidence:
+                    need_detect = True
+                    break
+
+        if need_detect:
+            self._detect(gray)
+        else:
+            self.track_count += 1
+
+        return [(track.track_id, track.location) for track in self.tracks]
+
+    def _detect(self, gray):
+        """运行完整检测并与现有轨迹关联"""
+        self.frames_since_detect = 0
+        self.detect_count += 1
+        detections = [(f.left(), f.top(), f.right(), f.bottom()) for f in self.detector(gray)]
+
+        # 按交并比贪心匹配检测结果和已有轨迹
+        pairs = sorted(
+            ((iou(track.location, det), t, d)
+             for t, track in enumerate(self.tracks)
+             for d, det in enumerate(detections)),
+            reverse=True
+        )
+        matched_tracks, matched_dets = set(), set()
+        tracks = []
+        for overlap, t, d in pairs:
+            if overlap < self.iou_threshold:
+                break
+            if t in matched_tracks or d in matched_dets:
+                continue
+            matched_tracks.add(t)
+            matched_dets.add(d)
+            track = self.tracks[t]
+            track.restart(gray, detections[d])
+            tracks.append(track)
+
+        # 未匹配的检测结果创建新轨迹，未匹配的旧轨迹丢弃
+        for d, det in enumerate(detections):
+            if d not in matched_dets:
+                track = FaceTrack(next(self._next_id), det)
+                track.restart(gray, det)
+                tracks.append(track)
+                self.logger.debug(f"New face track {track.track_id}")
+
+        self.tracks = tracks
+
+    def reset(self):
+        """清空所有轨迹"""
+        self.tracks = []
+        self.frames_since_detect = 0
+
+    def get_stats(self):
+        """获取检测/跟踪帧数统计"""
+        return {
+            'detect_frames': self.detect_count,
+            'track_frames': self.track_count,
+            'active_tracks': len(self.tracks)
+        }
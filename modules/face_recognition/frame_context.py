@@ -0,0 +1,48 @@
+import cv2
+import dlib
+import numpy as np
+
+class FrameContext:
+    """单帧共享上下文
+
+    人脸流水线的各个阶段共用同一个上下文，灰度图、dlib特征点及其numpy
+    数组均在首次访问时计算并缓存，避免重复转换。
+    """
+    def __init__(self, frame, predictor=None):
+        self.frame = frame
+        self.predictor = predictor
+        self._gray = None
+        self._shapes = {}
+        self._landmarks = {}
+
+    @property
+    def gray(self):
+        """灰度图"""
+        if self._gray is None:
+            self._gray = cv2.cvtColor(self.frame, cv2.COLOR_BGR2GRAY)
+        return self._gray
+
+    @staticmethod
+    def _key(face_location):
+        return tuple(int(v) for v in face_location)
+
+    def shape(self, face_location):
+        """获取人脸68点特征（dlib full_object_detection）"""
+        key = self._key(face_location)
+        shape = self._shapes.get(key)
+        if shape is None:
+            if self.predictor is None:
+                raise ValueError("FrameContext has no shape predictor")
+            shape = self.predictor(self.gray, dlib.rectangle(*key))
+            self._shapes[key] = shape
+        return shape
+
+    def landmarks(self, face_location):
+        """获取人脸68点特征的 (68, 2) numpy数组"""
+        key = self._key(face_location)
+        landmarks = self._landmarks.get(key)
+        if landmarks is None:
+            shape = self.shape(key)
+            landmarks = np.array([[p.x, p.y] for p in shape.parts()], dtype=np.int32)
+            self._landmarks[key] = landmarks
+        return landmarks
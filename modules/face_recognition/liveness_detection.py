@@ -1,47 +1,98 @@
-import cv2
+import time
+import collections
 import numpy as np
-import dlib
-from scipy.spatial import distance as dist
 from config.config import LIVENESS_DETECTION
 from modules.utils.logger import Logger
+from .texture_analysis import TextureAnalyzer
 
-class LivenessDetector:
-    def __init__(self):
-        self.logger = Logger.get_logger("LivenessDetector")
+# dlib 68点特征中的下标
+MOUTH = slice(48, 68)
+EYES = slice(36, 48)
+
+class LivenessSession:
+    """单个人脸轨迹的活体检测状态"""
+    def __init__(self, previous=None):
         self.last_check_time = 0
+        self.last_seen = 0
         self.last_eye_state = None
         self.blink_count = 0
         self.last_landmarks = None
-        self.movement_history = []
-        self.expression_history = []
-        
-    def detect_liveness(self, frame, face_shape):
-        """增强的活体检测"""
+        self.movement_history = collections.deque(maxlen=10)
+        self.last_mouth_shape = None
+        self.checks = 0
+        self.is_live = False
+        self.verdict = None  # 确定后缓存verdict_ttl秒
+        self.verdict_time = 0
+        self.previous = previous  # 结论过期复查期间沿用上一次结论
+
+class LivenessDetector:
+    """按人脸轨迹进行活体检测
+
+    每个轨迹拥有独立的眨眼、头动和表情状态，不同人的特征点不会混在一起。
+    轨迹通过检测（或多次检测均未通过）后缓存结论，超过verdict_ttl秒重新检测，
+    复查期间沿用上一次结论。未启用跟踪时调用方以匹配到的身份作为键，与多帧
+    确认一致；键为None（未启用跟踪且未匹配到身份）时每次只做无状态的单帧检测，
+    不缓存任何结论。超过session_ttl秒未出现的会话被移除。
+    """
+    def __init__(self):
+        self.logger = Logger.get_logger("LivenessDetector")
+        self.sessions = {}
+        self.texture_analyzer = TextureAnalyzer()
+
+    def detect_liveness(self, context, face_location, track_id=None):
+        """增强的活体检测，track_id为轨迹ID或未启用跟踪时的身份"""
         current_time = time.time()
-        if current_time - self.last_check_time < LIVENESS_DETECTION['check_interval']:
-            return True
-            
-        self.last_check_time = current_time
-        
-        # 转换关键点为numpy数组
-        landmarks = np.array([[p.x, p.y] for p in face_shape.parts()])
-        
+        if track_id is None:
+            return self._check(LivenessSession(), context, face_location)
+
+        self._evict(current_time)
+        session = self.sessions.get(track_id)
+        if session is None:
+            session = self.sessions[track_id] = LivenessSession()
+        elif session.verdict is not None:
+            if current_time - session.verdict_time < LIVENESS_DETECTION['verdict_ttl']:
+                session.last_seen = current_time
+                return session.verdict
+            session = self.sessions[track_id] = LivenessSession(previous=session.verdict)
+        session.last_seen = current_time
+
+        if current_time - session.last_check_time < LIVENESS_DETECTION['check_interval']:
+            return session.is_live or bool(session.previous)
+
+        session.last_check_time = current_time
+        session.checks += 1
+        is_live = self._check(session, context, face_location)
+
+        if is_live:
+            session.verdict = True
+            session.verdict_time = current_time
+            self.logger.info(f"Liveness check passed for track {track_id}")
+        elif session.checks >= LIVENESS_DETECTION['max_checks']:
+            session.verdict = False
+            session.verdict_time = current_time
+            self.logger.warning(f"Possible spoofing attempt on track {track_id}")
+            return False
+
+        return is_live or bool(session.previous)
+
+    def _check(self, session, context, face_location):
+        """用当前帧更新会话并返回本次是否判定为活体"""
+        # 关键点numpy数组由帧上下文缓存
+        landmarks = context.landmarks(face_location).astype(np.float32)
+
         # 1. 眨眼检测
         eye_aspect_ratio = self._get_eye_aspect_ratio(landmarks)
-        blink_detected = self._check_blink(eye_aspect_ratio)
-        
-        # 2. 头部姿态估计
-        head_movement = self._detect_head_movement(landmarks)
-        
+        blink_detected = self._check_blink(session, eye_aspect_ratio)
+
+        # 2. 头部运动
+        head_movement = self._detect_head_movement(session, landmarks)
+
         # 3. 表情变化检测
-        expression_change = self._detect_expression_change(landmarks)
-        
-        # 4. 纹理分析（检测打印照片）
-        texture_score = self._analyze_texture(frame, landmarks)
-        
-        # 5. 红外反射检测（如果有红外摄像头）
-        # ir_score = self._check_ir_reflection(frame)
-        
+        expression_change = self._detect_expression_change(session, landmarks)
+
+        # 4. 纹理分析（检测打印照片和屏幕翻拍）
+        texture_score = self._analyze_texture(context, landmarks)
+
         # 综合评分
         liveness_score = self._compute_liveness_score(
             blink_detected,
@@ -49,100 +100,80 @@ class LivenessDetector:
             expression_change,
             texture_score
         )
-        
-        is_live = liveness_score >= LIVENESS_DETECTION['threshold']
-        
-        if is_live:
-            self.logger.info(f"Liveness check passed (score: {liveness_score:.2f})")
-        else:
-            self.logger.warning(f"Possible spoofing attempt (score: {liveness_score:.2f})")
-            
-        return is_live
-    
-    def _get_eye_aspect_ratio(self, landmarks):
-        """计算眼睛纵横比"""
-        # 假设使用dlib的68点标记，眼睛点的索引
-        left_eye = landmarks[36:42]
-        right_eye = landmarks[42:48]
-        
-        # 计算眼睛的纵横比
-        left_ear = self._eye_aspect_ratio(left_eye)
-        right_ear = self._eye_aspect_ratio(right_eye)
-        
-        return (left_ear + right_ear) / 2.0
-    
-    def _eye_aspect_ratio(self, eye):
-        """计算单眼纵横比"""
-        # 计算垂直方向的两组点之间的距离
-        A = dist.euclidean(eye[1], eye[5])
-        B = dist.euclidean(eye[2], eye[4])
-        # 计算水平方向的距离
-        C = dist.euclidean(eye[0], eye[3])
-        # 计算纵横比
-        ear = (A + B) / (2.0 * C)
-        return ear
-    
-    def _check_blink(self, eye_aspect_ratio):
+        self.logger.debug(f"Liveness score: {liveness_score:.2f}")
+
+        session.is_live = liveness_score >= LIVENESS_DETECTION['threshold']
+        return session.is_live
+
+    def _evict(self, now):
+        """移除长时间未出现的会话，避免之后复用陈旧的特征点历史"""
+        for key in [k for k, s in self.sessions.items() if now - s.last_seen > LIVENESS_DETECTION['session_ttl']]:
+            del self.sessions[key]
+
+    def retain(self, active_track_ids):
+        """移除已离开画面的轨迹会话"""
+        active = set(active_track_ids)
+        for track_id in list(self.sessions.keys()):
+            if track_id not in active:
+                del self.sessions[track_id]
+
+    @staticmethod
+    def _get_eye_aspect_ratio(landmarks):
+        """同时计算双眼纵横比(EAR)并取平均"""
+        eyes = landmarks[EYES].reshape(2, 6, 2)
+        # 两组垂直距离 (p1-p5, p2-p4) 和一组水平距离 (p0-p3)
+        vertical = np.linalg.norm(eyes[:, [1, 2]] - eyes[:, [5, 4]], axis=-1).sum(axis=1)
+        horizontal = np.linalg.norm(eyes[:, 0] - eyes[:, 3], axis=-1)
+        return float(np.mean(vertical / (2.0 * np.maximum(horizontal, 1e-6))))
+
+    @staticmethod
+    def _check_blink(session, eye_aspect_ratio):
         """检测眨眼"""
         if eye_aspect_ratio < LIVENESS_DETECTION['blink_threshold']:
-            if self.last_eye_state != 'closed':
-                self.blink_count += 1
-            self.last_eye_state = 'closed'
+            if session.last_eye_state != 'closed':
+                session.blink_count += 1
+            session.last_eye_state = 'closed'
         else:
-            self.last_eye_state = 'open'
-        
-        return self.blink_count > 0
-    
-    def _detect_head_movement(self, landmarks):
+            session.last_eye_state = 'open'
+
+        return session.blink_count > 0
+
+    @staticmethod
+    def _detect_head_movement(session, landmarks):
         """检测头部运动"""
-        if self.last_landmarks is not None:
-            movement = np.mean(np.abs(landmarks - self.last_landmarks))
-            self.movement_history.append(movement)
-            if len(self.movement_history) > 10:
-                self.movement_history.pop(0)
-        
-        self.last_landmarks = landmarks.copy()
-        
-        if len(self.movement_history) >= 3:
-            return np.mean(self.movement_history) > LIVENESS_DETECTION['head_move_threshold']
+        if session.last_landmarks is not None:
+            session.movement_history.append(float(np.mean(np.abs(landmarks - session.last_landmarks))))
+        session.last_landmarks = landmarks
+
+        if len(session.movement_history) >= 3:
+            return np.mean(session.movement_history) > LIVENESS_DETECTION['head_move_threshold']
         return False
-    
-    def _detect_expression_change(self, landmarks):
+
+    @staticmethod
+    def _get_shape_features(landmarks):
+        """嘴部形状特征：相对嘴部中心的坐标，按双眼外角间距归一化"""
+        mouth = landmarks[MOUTH]
+        scale = max(float(np.linalg.norm(landmarks[45] - landmarks[36])), 1e-6)
+        return (mouth - mouth.mean(axis=0)) / scale
+
+    def _detect_expression_change(self, session, landmarks):
         """检测表情变化"""
-        # 计算嘴部和眉毛的关键点变化
-        mouth_points = landmarks[48:68]
-        mouth_shape = self._get_shape_features(mouth_points)
-        
-        if len(self.expression_history) > 0:
-            change = np.abs(mouth_shape - self.expression_history[-1])
+        mouth_shape = self._get_shape_features(landmarks)
+
+        if session.last_mouth_shape is not None:
+            change = np.abs(mouth_shape - session.last_mouth_shape)
             expression_changed = np.mean(change) > LIVENESS_DETECTION['mouth_threshold']
         else:
             expression_changed = False
-            
-        self.expression_history.append(mouth_shape)
-        if len(self.expression_history) > 10:
-            self.expression_history.pop(0)
-            
+
+        session.last_mouth_shape = mouth_shape
         return expression_changed
-    
-    def _analyze_texture(self, frame, landmarks):
-        """分析图像纹理以检测打印照片"""
-        # 提取面部区域
-        hull = cv2.convexHull(landmarks)
-        mask = np.zeros(frame.shape[:2], dtype=np.uint8)
-        cv2.fillConvexPoly(mask, hull, 255)
-        
-        # 应用LBP或其他纹理分析
-        face_texture = frame[mask > 0]
-        
-        # 计算纹理特征
-        gray = cv2.cvtColor(face_texture, cv2.COLOR_BGR2GRAY)
-        gradient_magnitude = np.abs(cv2.Sobel(gray, cv2.CV_64F, 1, 1))
-        texture_score = np.mean(gradient_magnitude)
-        
-        return texture_score > 50  # 阈值需要根据实际情况调整
-    
-    def _compute_liveness_score(self, blink_detected, head_movement, 
+
+    def _analyze_texture(self, context, landmarks):
+        """分析特征点包围盒内的纹理以检测打印照片，返回0~1的得分"""
+        return self.texture_analyzer.analyze(context.gray, landmarks)['score']
+
+    def _compute_liveness_score(self, blink_detected, head_movement,
                               expression_change, texture_score):
         """计算综合活体得分"""
         weights = {
@@ -151,12 +182,12 @@ class LivenessDetector:
             'expression': 0.2,
             'texture': 0.2
         }
-        
+
         score = (
             weights['blink'] * float(blink_detected) +
             weights['movement'] * float(head_movement) +
             weights['expression'] * float(expression_change) +
             weights['texture'] * float(texture_score)
         )
-        
-        return score 
\ No newline at end of file
+
+        return score
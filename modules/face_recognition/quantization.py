@@ -0,0 +1,130 @@
+import numpy as np
+
+class Float16Codec:
+    """半精度存储，内存减半"""
+    name = 'float16'
+
+    def fit(self, encodings):
+        return self
+
+    def encode(self, encodings):
+        return np.asarray(encodings, dtype=np.float16)
+
+    def approx_sq_distances(self, queries, q_norms, codes):
+        block = codes.astype(np.float32)
+        t_norms = np.einsum('ij,ij->i', block, block)
+        return q_norms + t_norms - 2.0 * (queries @ block.T)
+
+    def nbytes(self, codes):
+        return codes.nbytes
+
+class Int8Codec:
+    """int8存储，每个向量单独保存缩放系数，内存约为float32的1/4"""
+    name = 'int8'
+
+    def fit(self, encodings):
+        return self
+
+    def encode(self, encodings):
+        encodings = np.asarray(encodings, dtype=np.float32)
+        scales = np.abs(encodings).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        values = np.round(encodings / scales[:, None]).astype(np.int8)
+        # 反量化向量的平方范数，查询时直接使用
+        norms = np.einsum('ij,ij->i', values.astype(np.float32), values.astype(np.float32)) * scales ** 2
+        return values, scales.astype(np.float32), norms.astype(np.float32)
+
+    def approx_sq_distances(self, queries, q_norms, codes):
+        values, scales, norms = codes
+        dots = (queries @ values.astype(np.float32).T) * scales
+        return q_norms + norms - 2.0 * dots
+
+    def nbytes(self, codes):
+        return sum(c.nbytes for c in codes)
+
+class PQCodec:
+    """乘积量化：特征切分为m段，每段用256个中心之一的下标表示
+
+    查询时为每段预先计算到全部中心的距离查找表，模板距离为m次查表求和。
+    """
+    name = 'pq'
+
+    def __init__(self, num_subspaces=16, num_centroids=256, train_size=20000, iterations=15, seed=0):
+        self.num_subspaces = num_subspaces
+        self.num_centroids = num_centroids
+        self.train_size = train_size
+        self.iterations = iterations
+        self.rng = np.random.default_rng(seed)
+        self.codebooks = None  # (m, k, sub_dim)
+
+    @staticmethod
+    def _sq_distances(x, centroids):
+        return (np.einsum('ij,ij->i', x, x)[:, None]
+                + np.einsum('ij,ij->i', centroids, centroids)[None, :]
+                - 2.0 * (x @ centroids.T))
+
+    def _kmeans(self, x, k):
+        centroids = x[self.rng.choice(len(x), k, replace=False)].copy()
+        for _ in range(self.iterations):
+            assign = self._sq_distances(x, centroids).argmin(axis=1)
+            counts = np.bincount(assign, minlength=k)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, x)
+            nonempty = counts > 0
+            centroids[nonempty] = sums[nonempty] / counts[nonempty, None]
+        return centroids
+
+    def fit(self, encodings):
+        # 大库只抽样训练，避免把整个内存映射矩阵读入内存
+        if len(encodings) > self.train_size:
+            encodings = encodings[np.sort(self.rng.choice(len(encodings), self.train_size, replace=False))]
+        encodings = np.asarray(encodings, dtype=np.float32)
+        dim = encodings.shape[1]
+        if dim % self.num_subspaces:
+            raise ValueError(f"Embedding dim {dim} is not divisible by {self.num_subspaces} subspaces")
+        k = min(self.num_centroids, len(encodings))
+        subspaces = encodings.reshape(len(encodings), self.num_subspaces, -1)
+        self.codebooks = np.stack([self._kmeans(subspaces[:, j], k) for j in range(self.num_subspaces)])
+        return self
+
+    def encode(self, encodings):
+        encodings = np.asarray(encodings, dtype=np.float32)
+        subspaces = encodings.reshape(len(encodings), self.num_subspaces, -1)
+        codes = np.empty((len(encodings), self.num_subspaces), dtype=np.uint8)
+        for j in range(self.num_subspaces):
+            codes[:, j] = self._sq_distances(subspaces[:, j], self.codebooks[j]).argmin(axis=1)
+        return codes
+
+    def approx_sq_distances(self, queries, q_norms, codes):
+        # 查找表 (n_queries, m, k)：每段查询向量到每个中心的平方距离
+        q_sub = queries.reshape(len(queries), self.num_subspaces, 1, -1)
+        tables = ((q_sub - self.codebooks[None]) ** 2).sum(axis=-1)
+        columns = np.arange(self.num_subspaces)
+        return np.stack([table[columns, codes].sum(axis=1) for table in tables])
+
+    def nbytes(self, codes):
+        return codes.nbytes + self.codebooks.nbytes
+
+def slice_codes(codes, start, end):
+    """截取编码的一段，兼容由多个数组组成的编码"""
+    if isinstance(codes, tuple):
+        return tuple(c[start:end] for c in codes)
+    return codes[start:end]
+
+def concat_codes(parts):
+    """拼接分块编码的结果"""
+    if isinstance(parts[0], tuple):
+        return tuple(np.concatenate(c) for c in zip(*parts))
+    return np.concatenate(parts)
+
+def create_codec(storage, **kwargs):
+    """按存储模式创建编码器，float32返回None表示不压缩"""
+    if storage == 'float32':
+        return None
+    if storage == 'float16':
+        return Float16Codec()
+    if storage == 'int8':
+        return Int8Codec()
+    if storage == 'pq':
+        return PQCodec(**kwargs)
+    raise ValueError(f"Unknown face matcher storage mode: {storage}")
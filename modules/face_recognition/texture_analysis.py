@@ -0,0 +1,90 @@
+import cv2
+import numpy as np
+from config.config import TEXTURE_ANALYSIS
+
+# LBP八邻域相对中心像素的偏移 (dy, dx)，按位顺序排列
+_LBP_OFFSETS = [(-1, -1), (-1, 0), (-1, 1), (0, 1), (1, 1), (1, 0), (1, -1), (0, -1)]
+
+class TextureAnalyzer:
+    """基于人脸局部小图的纹理防伪分析
+
+    只处理特征点包围盒，缩放到固定尺寸后计算LBP直方图熵和频域高频能量占比：
+    打印照片和屏幕翻拍会丢失皮肤的细微纹理和高频成分。所有中间结果写入
+    预分配缓冲区，单个分析器不可跨线程共享。也可以直接对保存的人脸小图调用
+    analyze_crop，便于离线评估。
+    """
+    def __init__(self, crop_size=None):
+        size = crop_size or TEXTURE_ANALYSIS['crop_size']
+        self.crop_size = size
+        self._crop = np.empty((size, size), dtype=np.uint8)
+        self._crop_f32 = np.empty((size, size), dtype=np.float32)
+        # LBP缓冲区（去掉一圈边界）
+        inner = size - 2
+        self._codes = np.empty((inner, inner), dtype=np.uint8)
+        self._cmp = np.empty((inner, inner), dtype=np.bool_)
+        self._bits = np.empty((inner, inner), dtype=np.uint8)
+        # 频域缓冲区和高频区域掩码
+        self._spectrum = np.empty((size, size, 2), dtype=np.float32)
+        self._power = np.empty((size, size), dtype=np.float32)
+        fy = np.fft.fftfreq(size)[:, None]
+        fx = np.fft.fftfreq(size)[None, :]
+        radius = np.sqrt(fx ** 2 + fy ** 2)
+        self._high_mask = (radius >= TEXTURE_ANALYSIS['high_freq_cutoff']).astype(np.float32).ravel()
+        self.hf_threshold = TEXTURE_ANALYSIS['high_freq_threshold']
+        self.entropy_threshold = TEXTURE_ANALYSIS['lbp_entropy_threshold']
+
+    def analyze(self, gray, landmarks):
+        """分析特征点包围盒内的纹理，返回特征字典"""
+        h, w = gray.shape[:2]
+        x1, y1 = np.maximum(landmarks.min(axis=0).astype(int), 0)
+        x2, y2 = landmarks.max(axis=0).astype(int) + 1
+        x2, y2 = min(x2, w), min(y2, h)
+        if x2 - x1 < 4 or y2 - y1 < 4:
+            return {'lbp_entropy': 0.0, 'high_freq_ratio': 0.0, 'score': 0.0}
+        cv2.resize(gray[y1:y2, x1:x2], (self.crop_size, self.crop_size),
+                   dst=self._crop, interpolation=cv2.INTER_AREA)
+        return self._features()
+
+    def analyze_crop(self, face_crop):
+        """分析已裁剪好的人脸灰度图（离线评估用）"""
+        if face_crop.ndim == 3:
+            face_crop = cv2.cvtColor(face_crop, cv2.COLOR_BGR2GRAY)
+        cv2.resize(face_crop, (self.crop_size, self.crop_size),
+                   dst=self._crop, interpolation=cv2.INTER_AREA)
+        return self._features()
+
+    def _lbp_entropy(self):
+        """向量化计算LBP编码直方图的熵（比特）"""
+        crop = self._crop
+        n = self.crop_size
+        center = crop[1:n - 1, 1:n - 1]
+        self._codes.fill(0)
+        bits_as_bool = self._cmp.view(np.uint8)
+        for bit, (dy, dx) in enumerate(_LBP_OFFSETS):
+            neighbor = crop[1 + dy:n - 1 + dy, 1 + dx:n - 1 + dx]
+            np.greater_equal(neighbor, center, out=self._cmp)
+            np.left_shift(bits_as_bool, bit, out=self._bits)
+            np.bitwise_or(self._codes, self._bits, out=self._codes)
+        hist = np.bincount(self._codes.ravel(), minlength=256).astype(np.float32)
+        hist /= hist.sum()
+        nonzero = hist[hist > 0]
+        return float(-(nonzero * np.log2(nonzero)).sum())
+
+    def _high_freq_ratio(self):
+        """频谱中高频能量占比（去掉直流分量）"""
+        np.copyto(self._crop_f32, self._crop)
+        self._crop_f32 -= self._crop_f32.mean()
+        cv2.dft(self._crop_f32, dst=self._spectrum, flags=cv2.DFT_COMPLEX_OUTPUT)
+        np.multiply(self._spectrum, self._spectrum, out=self._spectrum)
+        np.add(self._spectrum[..., 0], self._spectrum[..., 1], out=self._power)
+        total = float(self._power.sum())
+        if total <= 0:
+            return 0.0
+        return float(np.dot(self._power.ravel(), self._high_mask)) / total
+
+    def _features(self):
+        entropy = self._lbp_entropy()
+        hf_ratio = self._high_freq_ratio()
+        score = 0.5 * min(1.0, entropy / self.entropy_threshold) + \
+                0.5 * min(1.0, hf_ratio / self.hf_threshold)
+        return {'lbp_entropy': entropy, 'high_freq_ratio': hf_ratio, 'score': score}
@@ -0,0 +1,85 @@
+import collections
+import time
+
+class TrackState:
+    """单个人脸轨迹的多帧确认状态"""
+    __slots__ = ('identity', 'distances', 'distance_sum', 'last_seen')
+
+    def __init__(self, window, now):
+        self.identity = None
+        self.distances = collections.deque(maxlen=window)
+        self.distance_sum = 0.0
+        self.last_seen = now
+
+    def reset(self, identity):
+        self.identity = identity
+        self.distances.clear()
+        self.distance_sum = 0.0
+
+    def push(self, distance):
+        """加入新的匹配距离，O(1)维护窗口内距离之和"""
+        if len(self.distances) == self.distances.maxlen:
+            self.distance_sum -= self.distances[0]
+        self.distances.append(distance)
+        self.distance_sum += distance
+
+    @property
+    def full(self):
+        return len(self.distances) == self.distances.maxlen
+
+    @property
+    def mean_distance(self):
+        return self.distance_sum / len(self.distances) if self.distances else float('inf')
+
+class TrackStateStore:
+    """有界的人脸轨迹状态存储
+
+    每个轨迹只保留固定长度的最近匹配距离，超过TTL未出现的轨迹被移除，
+    轨迹总数超过上限时淘汰最久未出现的轨迹，长时间运行内存占用保持不变。
+    """
+    def __init__(self, window, threshold, ttl, max_tracks):
+        self.window = window
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_tracks = max_tracks
+        self.states = collections.OrderedDict()  # 按最近出现时间排序
+        self.evicted_count = 0
+
+    def update(self, key, identity, distance, now=None):
+        """记录一次匹配结果，返回该轨迹是否已确认为identity"""
+        now = time.monotonic() if now is None else now
+        state = self.states.get(key)
+        if state is None:
+            state = TrackState(self.window, now)
+            self.states[key] = state
+        else:
+            self.states.move_to_end(key)
+        state.last_seen = now
+
+        # 身份变化时重新开始确认
+        if identity != state.identity:
+            state.reset(identity)
+        if identity is not None:
+            state.push(distance)
+
+        self.evict(now)
+        return identity is not None and state.full and state.mean_distance <= self.threshold
+
+    def evict(self, now=None):
+        """移除过期轨迹和超出上限的轨迹"""
+        now = time.monotonic() if now is None else now
+        while self.states:
+            key, state = next(iter(self.states.items()))
+            if now - state.last_seen <= self.ttl and len(self.states) <= self.max_tracks:
+                break
+            del self.states[key]
+            self.evicted_count += 1
+
+    def __len__(self):
+        return len(self.states)
+
+    def __contains__(self, key):
+        return key in self.states
+
+    def get(self, key):
+        return self.states.get(key)
@@ -0,0 +1,151 @@
+import os
+import threading
+import time
+from config.config import COMPUTE_SCHEDULER
+from modules.utils.logger import Logger
+
+# 原生线程池的环境变量，必须在导入numpy/torch/dlib之前设置
+_NATIVE_THREAD_VARS = ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS')
+
+def limit_native_threads():
+    """限制OpenMP/BLAS线程池大小，需在导入numpy/torch/dlib之前调用"""
+    if not COMPUTE_SCHEDULER['enabled']:
+        return
+    for name in _NATIVE_THREAD_VARS:
+        os.environ.setdefault(name, str(COMPUTE_SCHEDULER['native_threads']))
+
+def _read_task_stats(tid):
+    """读取线程的调度统计: (运行时间秒, 就绪等待时间秒, 被抢占次数)，线程已退出时返回None"""
+    try:
+        with open(f'/proc/self/task/{tid}/schedstat') as f:
+            run_ns, wait_ns, _ = (int(v) for v in f.read().split())
+        preempted = 0
+        with open(f'/proc/self/task/{tid}/status') as f:
+            for line in f:
+                if line.startswith('nonvoluntary_ctxt_switches'):
+                    preempted = int(line.split()[1])
+                    break
+        return run_ns / 1e9, wait_ns / 1e9, preempted
+    except (OSError, ValueError):
+        return None
+
+class ComputeScheduler:
+    """按子系统分配CPU核心、线程数和优先级的中央调度器
+
+    各工作线程启动时调用register_thread声明所属子系统，调度器据此设置该线程的
+    CPU亲和性和nice值（优先级越低nice越大）；之后由该线程创建的线程（如torch的
+    OpenMP线程）继承同样的亲和性。torch和OpenCV的线程池大小按配置统一设置。
+    get_report通过/proc统计各子系统的CPU占用和就绪等待时间，等待占比高说明该
+    子系统在和其他子系统争抢CPU。
+    """
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    @classmethod
+    def get(cls):
+        """获取全局调度器"""
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls()
+            return cls._instance
+
+    def __init__(self):
+        self.logger = Logger.get_logger("ComputeScheduler")
+        self.enabled = COMPUTE_SCHEDULER['enabled']
+        self.subsystems = COMPUTE_SCHEDULER['subsystems']
+        self.cpu_count = os.cpu_count() or 1
+        self.lock = threading.Lock()
+        self.threads = {}        # 线程native_id -> (子系统, 线程名)
+        self._last_sample = {}   # 线程native_id -> 上次统计值
+        self._last_report_time = time.monotonic()
+        if self.enabled:
+            import cv2
+            cv2.setNumThreads(COMPUTE_SCHEDULER['opencv_threads'])
+
+    def configure_torch(self):
+        """按behavior子系统的线程预算设置torch线程池，在创建模型前调用"""
+        if not self.enabled:
+            return
+        import torch
+        torch.set_num_threads(self.subsystems['behavior']['threads'])
+        try:
+            torch.set_num_interop_threads(1)
+        except RuntimeError:
+            # 已经执行过并行任务后不能再设置
+            pass
+
+    def register_thread(self, subsystem):
+        """把当前线程归入子系统，按配置设置CPU亲和性和nice值"""
+        tid = threading.get_native_id()
+        with self.lock:
+            self.threads[tid] = (subsystem, threading.current_thread().name)
+        config = self.subsystems.get(subsystem)
+        if not self.enabled or config is None:
+            return
+
+        cores = [c for c in config.get('cores', []) if c < self.cpu_count]
+        if cores and hasattr(os, 'sched_setaffinity'):
+            try:
+                os.sched_setaffinity(tid, cores)
+            except OSError as e:
+                self.logger.warning(f"Cannot set CPU affinity for {subsystem}: {str(e)}")
+
+        # Linux上setpriority作用于单个线程；非root只能调高nice值
+        nice = config['priority'] * COMPUTE_SCHEDULER['nice_step']
+        if nice and hasattr(os, 'setpriority'):
+            try:
+                os.setpriority(os.PRIO_PROCESS, tid, nice)
+            except OSError as e:
+                self.logger.warning(f"Cannot set priority for {subsystem}: {str(e)}")
+        self.logger.debug(f"Thread {threading.current_thread().name} ({tid}) -> {subsystem}, "
+                          f"cores {cores or 'all'}, nice {nice}")
+
+    def get_report(self):
+        """返回自上次调用以来各子系统的CPU争用统计"""
+        now = time.monotonic()
+        report = {}
+        with self.lock:
+            elapsed = max(now - self._last_report_time, 1e-6)
+            self._last_report_time = now
+            for tid, (subsystem, _) in list(self.threads.items()):
+                stats = _read_task_stats(tid)
+                if stats is None:
+                    # 线程已退出
+                    del self.threads[tid]
+                    self._last_sample.pop(tid, None)
+                    continue
+                last = self._last_sample.get(tid, (0.0, 0.0, 0))
+                self._last_sample[tid] = stats
+                entry = report.setdefault(subsystem, {'threads': 0, 'cpu_s': 0.0, 'wait_s': 0.0, 'preempted': 0})
+                entry['threads'] += 1
+                entry['cpu_s'] += stats[0] - last[0]
+                entry['wait_s'] += stats[1] - last[1]
+                entry['preempted'] += stats[2] - last[2]
+
+        for subsystem, entry in report.items():
+            busy = entry['cpu_s'] + entry['wait_s']
+            config = self.subsystems.get(subsystem, {})
+            cores = len([c for c in config.get('cores', []) if c < self.cpu_count]) or self.cpu_count
+            entry['priority'] = config.get('priority')
+            # 就绪但未被调度的时间占比，越高说明越被其他线程挤占
+            entry['wait_ratio'] = entry['wait_s'] / busy if busy > 0 else 0.0
+            entry['core_utilization'] = entry['cpu_s'] / (elapsed * cores)
+        return report
+
+    def check_starvation(self, report=None):
+        """返回等待占比超过阈值的子系统列表，按优先级排序"""
+        report = self.get_report() if report is None else report
+        starving = [
+            (entry['priority'] if entry['priority'] is not None else 99, subsystem, entry['wait_ratio'])
+            for subsystem, entry in report.items()
+            if entry['wait_ratio'] > COMPUTE_SCHEDULER['starvation_warning']
+        ]
+        return [(subsystem, ratio) for _, subsystem, ratio in sorted(starving)]
+
+    def format_report(self, report):
+        lines = [f"{'subsystem':<12} {'prio':>4} {'thr':>4} {'cpu_s':>7} {'wait_s':>7} {'wait%':>6} {'util%':>6} {'preempt':>8}"]
+        for subsystem, e in sorted(report.items(), key=lambda item: (item[1]['priority'] or 0, item[0])):
+            lines.append(f"{subsystem:<12} {str(e['priority']):>4} {e['threads']:>4} {e['cpu_s']:>7.2f} "
+                         f"{e['wait_s']:>7.2f} {e['wait_ratio'] * 100:>6.1f} "
+                         f"{e['core_utilization'] * 100:>6.1f} {e['preempted']:>8}")
+        return '\n'.join(lines)
@@ -2,8 +2,9 @@ import psutil
 import time
 import threading
 from datetime import datetime
-from config.config import SYSTEM_STATUS, VOICE_RESPONSES
+from config.config import SYSTEM_STATUS, VOICE_RESPONSES, BASE_SPEED, MAX_SPEED, MIN_SPEED
 from modules.utils.logger import Logger
+from .compute_scheduler import ComputeScheduler
 
 class SystemMonitor:
     def __init__(self, speech_recognizer):
@@ -23,6 +24,7 @@ class SystemMonitor:
     
     def _monitor_loop(self):
         """持续监控系统状态"""
+        ComputeScheduler.get().register_thread('background')
         last_check = 0
         while self.running:
             current_time = time.time()
@@ -51,7 +53,14 @@ class SystemMonitor:
                 'base_speed': self.base_speed
             }
             
+            # 各子系统的CPU争用情况
+            scheduler = ComputeScheduler.get()
+            compute = scheduler.get_report()
+            status_data['starving_subsystems'] = scheduler.check_starvation(compute)
             self.logger.info(f"System status: {status_data}")
+            self.logger.info(f"Compute contention:\n{scheduler.format_report(compute)}")
+            if status_data['starving_subsystems']:
+                self.logger.warning(f"CPU starvation: {status_data['starving_subsystems']}")
             
             # 检查警告条件
             self._check_warnings(status_data)
@@ -84,11 +93,11 @@ class SystemMonitor:
         """检查是否需要发出警告"""
         if status['battery_level'] is not None and \
            status['battery_level'] < SYSTEM_STATUS['battery_warning']:
-            self.speech_recognizer.speak(VOICE_RESPONSES['battery_low'])
+            self.speech_recognizer.announce(VOICE_RESPONSES['battery_low'])
             
         if status['cpu_temperature'] is not None and \
            status['cpu_temperature'] > SYSTEM_STATUS['temp_warning']:
-            self.speech_recognizer.speak(VOICE_RESPONSES['temp_high'])
+            self.speech_recognizer.announce(VOICE_RESPONSES['temp_high'])
     
     def get_status_report(self):
         """获取状态报告"""
@@ -1,18 +1,201 @@
 import cv2
-from config.config import CAMERA_WIDTH, CAMERA_HEIGHT, CAMERA_FPS
+import threading
+import time
+import numpy as np
+from config.config import CAMERA_WIDTH, CAMERA_HEIGHT, CAMERA_FPS, CAMERA_CAPTURE
+from modules.utils.logger import Logger
+from modules.system.compute_scheduler import ComputeScheduler
+
+class FrameRing:
+    """预分配的最新帧环形缓冲区
+
+    只有采集线程写入；序号为seq的帧固定存放在 seq % size 槽位，
+    get返回的是槽位数组本身，只在之后 size-1 次采集内有效，需要长时间
+    使用的消费者必须拷贝（Camera.read_frame会拷贝）。
+    """
+    def __init__(self, size, shape, dtype=np.uint8):
+        self.size = max(2, size)
+        self.buffers = [np.empty(shape, dtype=dtype) for _ in range(self.size)]
+        self.seqs = [-1] * self.size
+        self.timestamps = [0.0] * self.size
+        self.latest_seq = -1
+        self.closed = False
+        self.cond = threading.Condition()
+
+    def next_buffer(self):
+        """获取下一个写入槽位（仅采集线程调用）"""
+        slot = (self.latest_seq + 1) % self.size
+        return slot, self.buffers[slot]
+
+    def commit(self, slot, frame, timestamp):
+        """提交已写入的帧并唤醒等待者"""
+        with self.cond:
+            # 驱动可能重新分配了数组（如分辨率变化）
+            self.buffers[slot] = frame
+            self.latest_seq += 1
+            self.seqs[slot] = self.latest_seq
+            self.timestamps[slot] = timestamp
+            self.cond.notify_all()
+            return self.latest_seq
+
+    def close(self):
+        """关闭缓冲区，唤醒所有等待者"""
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+    def get(self, seq):
+        """按序号获取帧，已被覆盖或正在写入时返回None"""
+        # 下一个写入槽位上的旧帧随时会被覆盖，不可读取
+        if seq < 0 or seq > self.latest_seq or seq <= self.latest_seq - self.size + 1:
+            return None
+        slot = seq % self.size
+        if self.seqs[slot] != seq:
+            return None
+        return seq, self.timestamps[slot], self.buffers[slot]
 
 class Camera:
-    def __init__(self):
+    def __init__(self, threaded=None):
+        self.logger = Logger.get_logger("Camera")
         self.cap = cv2.VideoCapture(0)
         self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, CAMERA_WIDTH)
         self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, CAMERA_HEIGHT)
         self.cap.set(cv2.CAP_PROP_FPS, CAMERA_FPS)
-    
+
+        self.threaded = CAMERA_CAPTURE['threaded'] if threaded is None else threaded
+        self.max_frame_age = CAMERA_CAPTURE['max_frame_age']
+        self.ring = None
+        self.capture_thread = None
+        self.running = False
+
+        # 统计信息
+        self.stats_lock = threading.Lock()
+        self.captured_count = 0
+        self.dropped_count = 0   # 从未交付给消费者即被跳过的帧
+        self.stale_count = 0     # 因超过max_frame_age被丢弃的帧
+        self.delivered_seq = -1
+        self.last_seq = -1       # read_frame最近返回帧的序号，供下游按帧去重
+
+        if self.threaded:
+            self.start()
+
+    def start(self):
+        """启动后台采集线程"""
+        if self.capture_thread is not None:
+            return
+        # 只保留驱动中最新的一帧，减少排队延迟
+        self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        self.ring = FrameRing(CAMERA_CAPTURE['ring_size'], (CAMERA_HEIGHT, CAMERA_WIDTH, 3))
+        self.running = True
+        self.capture_thread = threading.Thread(target=self._capture_loop)
+        self.capture_thread.daemon = True
+        self.capture_thread.start()
+        self.logger.info(f"Capture thread started (ring size: {self.ring.size})")
+
+    def _capture_loop(self):
+        """持续采集帧写入环形缓冲区"""
+        ComputeScheduler.get().register_thread('camera')
+        while self.running:
+            if not self.cap.grab():
+                time.sleep(0.01)
+                continue
+            timestamp = time.monotonic()
+            slot, buffer = self.ring.next_buffer()
+            ret, frame = self.cap.retrieve(buffer)
+            if not ret:
+                continue
+            self.ring.commit(slot, frame, timestamp)
+            with self.stats_lock:
+                self.captured_count += 1
+        self.ring.close()
+
+    def _deliver(self, entry):
+        """记录交付给消费者的帧并统计跳过的帧"""
+        seq = entry[0]
+        with self.stats_lock:
+            if seq > self.delivered_seq:
+                self.dropped_count += seq - self.delivered_seq - 1
+                self.delivered_seq = seq
+        return entry
+
+    def _is_stale(self, timestamp):
+        return time.monotonic() - timestamp > self.max_frame_age
+
+    def read_latest(self):
+        """获取最新帧，返回 (seq, timestamp, frame)，无新帧（已交付过或过期）时返回None
+
+        frame是环形缓冲区的槽位，会在之后的采集中被覆盖。
+        """
+        with self.ring.cond:
+            entry = self.ring.get(self.ring.latest_seq)
+        if entry is None or entry[0] <= self.delivered_seq:
+            return None
+        if self._is_stale(entry[1]):
+            with self.stats_lock:
+                self.stale_count += 1
+            return None
+        return self._deliver(entry)
+
+    def read_next(self, after_seq, timeout=None):
+        """获取序号大于after_seq的下一帧，跳过已覆盖或过期的帧"""
+        timeout = CAMERA_CAPTURE['read_timeout'] if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        with self.ring.cond:
+            while True:
+                latest = self.ring.latest_seq
+                stale = 0
+                for seq in range(max(after_seq + 1, latest - self.ring.size + 2), latest + 1):
+                    entry = self.ring.get(seq)
+                    if entry is None:
+                        continue
+                    if self._is_stale(entry[1]):
+                        stale += 1
+                        continue
+                    if stale:
+                        with self.stats_lock:
+                            self.stale_count += stale
+                    return self._deliver(entry)
+                remaining = deadline - time.monotonic()
+                if self.ring.closed or remaining <= 0:
+                    return None
+                self.ring.cond.wait(remaining)
+
     def read_frame(self):
+        """获取一帧新帧（拷贝，可在推理期间安全使用）"""
+        if self.threaded:
+            entry = self.read_latest()
+            if entry is None:
+                entry = self.read_next(self.delivered_seq)
+            if entry is None:
+                return None
+            # 拷贝在环形缓冲区锁内完成，期间槽位不会被采集线程覆盖
+            with self.ring.cond:
+                if self.ring.get(entry[0]) is None:
+                    return None
+                frame = entry[2].copy()
+            self.last_seq = entry[0]
+            return frame
         ret, frame = self.cap.read()
         if not ret:
             return None
+        self.last_seq += 1
         return frame
-    
+
+    def get_stats(self):
+        """获取采集统计信息"""
+        with self.stats_lock:
+            return {
+                'captured': self.captured_count,
+                'dropped': self.dropped_count,
+                'stale': self.stale_count,
+                'latest_seq': self.ring.latest_seq if self.ring else -1
+            }
+
     def release(self):
-        self.cap.release() 
\ No newline at end of file
+        if self.capture_thread is not None:
+            self.running = False
+            self.capture_thread.join()
+            self.capture_thread = None
+            stats = self.get_stats()
+            self.logger.info(f"Capture stopped: {stats}")
+        self.cap.release()
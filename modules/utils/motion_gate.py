@@ -0,0 +1,153 @@
+import threading
+import time
+import cv2
+import numpy as np
+from config.config import MOTION_GATE
+from modules.utils.logger import Logger
+from modules.utils.perf import StageStats
+
+# check() 的返回值
+GATE_SKIP = 0     # 画面静止，跳过本次推理
+GATE_RUN = 1      # 按各阶段自身的间隔运行
+GATE_TRIGGER = 2  # 刚检测到运动，立即运行（忽略自身间隔）
+
+class GatedStage:
+    """单个被门控阶段的统计"""
+    def __init__(self, idle_interval):
+        self.idle_interval = idle_interval
+        self.last_run = float('-inf')  # 启动后第一次检查总会运行
+        self.pending_trigger = False
+        self.checks = 0
+        self.runs = 0
+        self.skips = 0
+        self.triggers = 0
+        self.cost = StageStats()
+        self.wake_latency = StageStats()
+
+class MotionGate:
+    """基于缩小帧差分的运动/场景变化门控
+
+    每帧缩小为灰度小图，与滑动平均背景做差分，变化像素占比超过阈值即认为
+    有运动。有运动（及之后hold_time秒内）时各阶段正常运行；静止时每个阶段
+    只每隔idle_interval秒运行一次；运动开始后各阶段的下一次检查立即触发。
+    人脸和行为检测共用一个门控，调用方传入帧序号(frame_id)，同一序号只计算
+    一次差分；不传序号时每次调用都会更新。帧数组可能被复用，不能按对象去重。
+    """
+    def __init__(self):
+        self.logger = Logger.get_logger("MotionGate")
+        width, height = MOTION_GATE['size']
+        self.size = (width, height)
+        self._small = np.empty((height, width, 3), dtype=np.uint8)
+        self._gray = np.empty((height, width), dtype=np.uint8)
+        self._background_u8 = np.empty((height, width), dtype=np.uint8)
+        self._diff = np.empty((height, width), dtype=np.uint8)
+        self._background = None
+        self.pixel_count = width * height
+
+        self.lock = threading.Lock()
+        self.stages = {name: GatedStage(interval)
+                       for name, interval in MOTION_GATE['idle_interval'].items()}
+        self._last_frame_id = None
+        self.motion = False
+        self.motion_ratio = 0.0
+        self.last_motion_time = float('-inf')
+        self.onset_time = None
+        self.frames = 0
+        self.motion_frames = 0
+        self.gate_stats = StageStats()
+
+    def observe(self, frame, now=None, frame_id=None):
+        """更新运动状态，同一帧序号只计算一次，返回是否处于活动状态"""
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            if frame_id is None or frame_id != self._last_frame_id:
+                self._last_frame_id = frame_id
+                self._update(frame, now)
+            return self._active(now)
+
+    def _update(self, frame, now):
+        start = time.perf_counter()
+        cv2.resize(frame, self.size, dst=self._small, interpolation=cv2.INTER_AREA)
+        cv2.cvtColor(self._small, cv2.COLOR_BGR2GRAY, dst=self._gray)
+        if self._background is None:
+            self._background = self._gray.astype(np.float32)
+        cv2.convertScaleAbs(self._background, dst=self._background_u8)
+        cv2.absdiff(self._gray, self._background_u8, dst=self._diff)
+        cv2.threshold(self._diff, MOTION_GATE['pixel_threshold'], 255, cv2.THRESH_BINARY, dst=self._diff)
+        self.motion_ratio = cv2.countNonZero(self._diff) / self.pixel_count
+        cv2.accumulateWeighted(self._gray, self._background, MOTION_GATE['background_alpha'])
+
+        was_active = self._active(now)
+        motion = self.motion_ratio >= MOTION_GATE['min_area']
+        if motion:
+            self.last_motion_time = now
+            self.motion_frames += 1
+            if not was_active:
+                # 从静止转为运动：各阶段的下一次检查立即触发
+                self.onset_time = now
+                for stage in self.stages.values():
+                    stage.pending_trigger = True
+        self.motion = motion
+        self.frames += 1
+        self.gate_stats.add(start, time.perf_counter())
+
+    def _active(self, now):
+        return now - self.last_motion_time <= MOTION_GATE['hold_time']
+
+    def check(self, stage_name, frame, ready=True, now=None, frame_id=None):
+        """决定该阶段本帧是否运行，返回GATE_SKIP/GATE_RUN/GATE_TRIGGER
+
+        ready表示阶段自身的运行间隔是否已到；未到时只有刚检测到运动才返回
+        GATE_TRIGGER，其余情况直接跳过且不计入统计。
+        """
+        now = time.monotonic() if now is None else now
+        active = self.observe(frame, now, frame_id)
+        with self.lock:
+            stage = self.stages[stage_name]
+            if stage.pending_trigger:
+                stage.pending_trigger = False
+                stage.checks += 1
+                stage.triggers += 1
+                stage.runs += 1
+                stage.last_run = now
+                stage.wake_latency.add(self.onset_time, now)
+                return GATE_TRIGGER
+            if not ready:
+                return GATE_SKIP
+            stage.checks += 1
+            if active or now - stage.last_run >= stage.idle_interval:
+                stage.runs += 1
+                stage.last_run = now
+                return GATE_RUN
+            stage.skips += 1
+            return GATE_SKIP
+
+    def record_run(self, stage_name, start, end):
+        """记录该阶段一次实际运行的起止时间(perf_counter)，用于估算节省的CPU时间"""
+        with self.lock:
+            self.stages[stage_name].cost.add(start, end)
+
+    def get_stats(self):
+        """门控统计：运行/跳过次数、估算节省的CPU时间、运动开始到阶段运行的延迟"""
+        with self.lock:
+            gate = self.gate_stats.summary()
+            stats = {
+                'frames': self.frames,
+                'motion_frames': self.motion_frames,
+                'gate_mean_ms': gate.get('mean_ms', 0.0),
+                'stages': {}
+            }
+            for name, stage in self.stages.items():
+                mean_cost = stage.cost.total / stage.cost.count if stage.cost.count else 0.0
+                wake = stage.wake_latency.summary()
+                stats['stages'][name] = {
+                    'checks': stage.checks,
+                    'runs': stage.runs,
+                    'skips': stage.skips,
+                    'triggers': stage.triggers,
+                    'duty_cycle': stage.runs / stage.checks if stage.checks else 1.0,
+                    'cpu_saved_s': stage.skips * mean_cost,
+                    'wake_latency_mean_ms': wake.get('mean_ms', 0.0),
+                    'wake_latency_max_ms': wake.get('max_ms', 0.0)
+                }
+            return stats
@@ -0,0 +1,78 @@
+import collections
+import contextlib
+import threading
+import time
+import numpy as np
+
+class StageStats:
+    """单个处理阶段的耗时统计"""
+    def __init__(self, window=1000):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.first_start = None
+        self.last_end = None
+        self.latencies = collections.deque(maxlen=window)
+
+    def add(self, start, end):
+        elapsed = end - start
+        self.count += 1
+        self.total += elapsed
+        self.max = max(self.max, elapsed)
+        self.latencies.append(elapsed)
+        if self.first_start is None:
+            self.first_start = start
+        self.last_end = end
+
+    def summary(self):
+        if self.count == 0:
+            return {'count': 0}
+        latencies = np.array(self.latencies) * 1000
+        wall = self.last_end - self.first_start
+        return {
+            'count': self.count,
+            'fps': self.count / wall if wall > 0 else 0.0,
+            'mean_ms': self.total / self.count * 1000,
+            'p50_ms': float(np.percentile(latencies, 50)),
+            'p95_ms': float(np.percentile(latencies, 95)),
+            'max_ms': self.max * 1000
+        }
+
+class PerfRecorder:
+    """按阶段记录吞吐量和延迟"""
+    def __init__(self, window=1000):
+        self.window = window
+        self.stages = collections.OrderedDict()
+        self.lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """计时上下文：with recorder.stage('face'): ..."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, start, time.perf_counter())
+
+    def record(self, name, start, end):
+        with self.lock:
+            stats = self.stages.get(name)
+            if stats is None:
+                stats = self.stages[name] = StageStats(self.window)
+            stats.add(start, end)
+
+    def report(self):
+        """返回 {stage: summary}"""
+        with self.lock:
+            return {name: stats.summary() for name, stats in self.stages.items()}
+
+    def format_report(self):
+        """格式化为文本表格"""
+        lines = [f"{'stage':<20} {'count':>7} {'fps':>8} {'mean_ms':>9} {'p50_ms':>9} {'p95_ms':>9} {'max_ms':>9}"]
+        for name, s in self.report().items():
+            if s['count'] == 0:
+                lines.append(f"{name:<20} {0:>7}")
+                continue
+            lines.append(f"{name:<20} {s['count']:>7} {s['fps']:>8.2f} {s['mean_ms']:>9.2f} "
+                         f"{s['p50_ms']:>9.2f} {s['p95_ms']:>9.2f} {s['max_ms']:>9.2f}")
+        return '\n'.join(lines)
@@ -0,0 +1,86 @@
+import time
+import cv2
+import speech_recognition as sr
+from config.config import CAMERA_FPS
+from modules.utils.logger import Logger
+
+class Pacer:
+    """按媒体时间戳控制回放节奏，realtime按原速，max不等待"""
+    def __init__(self, pacing='realtime'):
+        if pacing not in ('realtime', 'max'):
+            raise ValueError(f"Unknown pacing mode: {pacing}")
+        self.pacing = pacing
+        self.start = None
+
+    def wait(self, media_time):
+        """等待到媒体时间media_time（秒）对应的墙钟时刻"""
+        if self.start is None:
+            self.start = time.monotonic() - media_time
+        if self.pacing == 'realtime':
+            delay = self.start + media_time - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+
+class VideoFileSource:
+    """回放MP4/MJPEG等录像文件，接口与Camera一致"""
+    def __init__(self, path, pacing='realtime', loop=False):
+        self.logger = Logger.get_logger("VideoFileSource")
+        self.path = path
+        self.loop = loop
+        self.cap = cv2.VideoCapture(path)
+        if not self.cap.isOpened():
+            raise IOError(f"Cannot open video file: {path}")
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or CAMERA_FPS
+        self.pacer = Pacer(pacing)
+        self.frame_index = 0
+        self.logger.info(f"Replaying {path} at {self.fps:.1f} fps ({pacing})")
+
+    def read_frame(self):
+        """读取下一帧，文件结束时返回None"""
+        ret, frame = self.cap.read()
+        if not ret and self.loop:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = self.cap.read()
+        if not ret:
+            return None
+        self.pacer.wait(self.frame_index / self.fps)
+        self.frame_index += 1
+        return frame
+
+    def release(self):
+        self.cap.release()
+
+class WavFileSource(sr.AudioFile):
+    """回放WAV录音，可直接替代sr.Microphone传给Recognizer.listen
+
+    每次进入with块时从文件开头读取；realtime节奏下读取音频块的速度
+    不会快于录音本身，与麦克风的行为一致。
+    """
+    def __init__(self, path, pacing='realtime'):
+        super().__init__(path)
+        self.pacing = pacing
+
+    def __enter__(self):
+        super().__enter__()
+        self.stream = _PacedStream(self.stream, self.SAMPLE_RATE,
+                                   self.SAMPLE_WIDTH, Pacer(self.pacing))
+        return self
+
+class _PacedStream:
+    """包装音频流，按已读取的采样数控制节奏"""
+    def __init__(self, stream, sample_rate, sample_width, pacer):
+        self.stream = stream
+        self.bytes_per_second = sample_rate * sample_width
+        self.pacer = pacer
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+        data = self.stream.read(size)
+        self.bytes_read += len(data)
+        self.pacer.wait(self.bytes_read / float(self.bytes_per_second))
+        return data
+
+    @property
+    def media_time(self):
+        """已回放的音频时长（秒）"""
+        return self.bytes_read / float(self.bytes_per_second)
@@ -0,0 +1,108 @@
+import json
+import os
+import speech_recognition as sr
+from config.config import ASR_CONFIG, LANGUAGE
+from config.model_config import MODEL_CONFIG
+from modules.utils.logger import Logger
+
+def normalize_text(text):
+    """去掉识别结果中的空格（Vosk中文模型按词输出，词间有空格）"""
+    return ''.join(text.split())
+
+class BufferedStream:
+    """不支持流式的后端：累积音频，结束时整段识别，没有部分结果"""
+    def __init__(self, backend, sample_rate, sample_width):
+        self.backend = backend
+        self.sample_rate = sample_rate
+        self.sample_width = sample_width
+        self.chunks = []
+
+    def feed(self, pcm):
+        self.chunks.append(pcm)
+        return ''
+
+    def finish(self):
+        audio = sr.AudioData(b''.join(self.chunks), self.sample_rate, self.sample_width)
+        return self.backend.transcribe(audio)
+
+class GoogleBackend:
+    """Google Web Speech云端识别，需要联网"""
+    name = 'google'
+    streaming = False
+
+    def __init__(self, recognizer):
+        self.recognizer = recognizer
+
+    def transcribe(self, audio):
+        return self.recognizer.recognize_google(audio, language=LANGUAGE)
+
+    def start(self, sample_rate, sample_width=2):
+        return BufferedStream(self, sample_rate, sample_width)
+
+class VoskStream:
+    """Vosk流式识别会话，feed返回当前的部分识别结果"""
+    def __init__(self, recognizer):
+        self.recognizer = recognizer
+        self.segments = []
+
+    def feed(self, pcm):
+        if self.recognizer.AcceptWaveform(pcm):
+            # Vosk在内部检测到停顿时会先给出一段最终结果
+            self.segments.append(json.loads(self.recognizer.Result())['text'])
+            partial = ''
+        else:
+            partial = json.loads(self.recognizer.PartialResult())['partial']
+        return normalize_text(''.join(self.segments) + partial)
+
+    def finish(self):
+        self.segments.append(json.loads(self.recognizer.FinalResult())['text'])
+        text = normalize_text(''.join(self.segments))
+        if not text:
+            raise sr.UnknownValueError()
+        return text
+
+class VoskBackend:
+    """Vosk (Kaldi) 本地流式识别，CPU运行，无需联网，边说边给出部分结果"""
+    name = 'vosk'
+    streaming = True
+
+    def __init__(self, recognizer):
+        from vosk import KaldiRecognizer, Model, SetLogLevel
+        model_path = MODEL_CONFIG['voice']['asr']['path']
+        if not os.path.isdir(model_path):
+            raise FileNotFoundError(model_path)
+        SetLogLevel(-1)
+        self._recognizer_class = KaldiRecognizer
+        self.model = Model(model_path)
+
+    def start(self, sample_rate, sample_width=2):
+        if sample_width != 2:
+            raise ValueError("Vosk expects 16-bit PCM")
+        return VoskStream(self._recognizer_class(self.model, sample_rate))
+
+    def transcribe(self, audio):
+        stream = self.start(ASR_CONFIG['sample_rate'])
+        stream.feed(audio.get_raw_data(convert_rate=ASR_CONFIG['sample_rate'], convert_width=2))
+        return stream.finish()
+
+BACKENDS = {backend.name: backend for backend in (GoogleBackend, VoskBackend)}
+
+def create_backend(name=None, recognizer=None):
+    """按名称创建识别后端，不可用时退回ASR_CONFIG['fallback']
+
+    所有后端都提供transcribe(audio)整段识别和start(sample_rate)流式会话，
+    识别失败时与speech_recognition一致抛出UnknownValueError/RequestError。
+    """
+    logger = Logger.get_logger("ASR")
+    name = name or ASR_CONFIG['backend']
+    recognizer = recognizer or sr.Recognizer()
+    for candidate in dict.fromkeys([name, ASR_CONFIG['fallback']]):
+        if candidate not in BACKENDS:
+            raise ValueError(f"Unknown ASR backend: {candidate}")
+        try:
+            backend = BACKENDS[candidate](recognizer)
+            logger.info(f"Using ASR backend: {candidate}")
+            return backend
+        except (ImportError, OSError) as e:
+            logger.warning(f"ASR backend {candidate} unavailable: {str(e)}")
+    raise RuntimeError(f"No usable ASR backend among {name}, {ASR_CONFIG['fallback']}")
@@ -0,0 +1,155 @@
+import threading
+import time
+import speech_recognition as sr
+from config.config import AUDIO_STREAM
+from modules.utils.logger import Logger
+from modules.system.compute_scheduler import ComputeScheduler
+
+class AudioRingBuffer:
+    """固定大小的PCM环形缓冲区，单写多读
+
+    位置用累计写入的字节数表示，各读者维护自己的读取位置互不影响；
+    读者落后超过缓冲区容量时跳到最旧的可用数据并返回丢弃的字节数。
+    """
+    def __init__(self, seconds, sample_rate, sample_width):
+        self.frame_bytes = sample_width
+        self.bytes_per_second = sample_rate * sample_width
+        self.capacity = int(seconds * sample_rate) * sample_width
+        self.buffer = bytearray(self.capacity)
+        self.written = 0
+        self.closed = False
+        self.cond = threading.Condition()
+
+    def write(self, data):
+        data = memoryview(data)
+        with self.cond:
+            if len(data) > self.capacity:
+                self.written += len(data) - self.capacity
+                data = data[-self.capacity:]
+            offset = self.written % self.capacity
+            first = min(len(data), self.capacity - offset)
+            self.buffer[offset:offset + first] = data[:first]
+            self.buffer[:len(data) - first] = data[first:]
+            self.written += len(data)
+            self.cond.notify_all()
+
+    def read(self, position, size):
+        """从position读取size字节，数据不足时阻塞，关闭后返回剩余数据
+
+        返回 (数据, 新位置, 因落后被丢弃的字节数)。
+        """
+        with self.cond:
+            while self.written - position < size and not self.closed:
+                self.cond.wait()
+            dropped = max(0, self.written - self.capacity - position)
+            position += dropped
+            size = min(size, self.written - position)
+            offset = position % self.capacity
+            first = min(size, self.capacity - offset)
+            data = bytes(self.buffer[offset:offset + first]) + bytes(self.buffer[:size - first])
+            return data, position + size, dropped
+
+    def seconds_to_bytes(self, seconds):
+        return int(seconds * self.bytes_per_second) // self.frame_bytes * self.frame_bytes
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+class RingReader:
+    """环形缓冲区的一个读取位置，read接口与PyAudio流一致"""
+    def __init__(self, ring, position):
+        self.ring = ring
+        self.position = position
+        self.min_position = position
+        self.lock = threading.Lock()
+        self.logger = Logger.get_logger("AudioStream")
+
+    def read(self, size):
+        """读取size个采样帧，与PyAudio和speech_recognition的CHUNK单位一致"""
+        with self.lock:
+            position = max(self.position, self.min_position)
+        data, position, dropped = self.ring.read(position, size * self.ring.frame_bytes)
+        with self.lock:
+            self.position = position
+        if dropped:
+            self.logger.warning(f"Audio reader fell behind, dropped {dropped / self.ring.bytes_per_second:.2f}s")
+        return data
+
+    @property
+    def lag(self):
+        """已采集但尚未读取的音频时长（秒）"""
+        return (self.ring.written - self.position) / float(self.ring.bytes_per_second)
+
+    @property
+    def media_time(self):
+        """已读到的音频时间（秒），与采集流的起点对齐"""
+        return self.position / float(self.ring.bytes_per_second)
+
+    def discard_until(self, position):
+        """丢弃position之前尚未读取的音频（可从其他线程调用）"""
+        with self.lock:
+            self.min_position = max(self.min_position, position)
+
+class RingSource(sr.AudioSource):
+    """可直接传给Recognizer.listen的音频源，从常驻采集流的环形缓冲区读取"""
+    def __init__(self, ring, position, chunk, sample_rate, sample_width):
+        self.CHUNK = chunk
+        self.SAMPLE_RATE = sample_rate
+        self.SAMPLE_WIDTH = sample_width
+        self.stream = RingReader(ring, position)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+class MicrophoneStream:
+    """常驻的麦克风采集线程，持续写入环形缓冲区
+
+    麦克风只打开一次，分段、唤醒词检测和识别从缓冲区各自读取，识别或播报期间
+    采集不中断，两次监听之间的语音也不会丢失。新读者从pre_roll秒之前开始读取，
+    避免截掉第一个字。
+    """
+    def __init__(self, device_index=None):
+        self.logger = Logger.get_logger("AudioStream")
+        self.microphone = sr.Microphone(device_index=device_index)
+        self.source = self.microphone.__enter__()
+        self.ring = AudioRingBuffer(AUDIO_STREAM['buffer_seconds'],
+                                    self.source.SAMPLE_RATE, self.source.SAMPLE_WIDTH)
+        self.overflows = 0
+        self.running = True
+        self.capture_thread = threading.Thread(target=self._capture_loop, name="MicrophoneCapture")
+        self.capture_thread.daemon = True
+        self.capture_thread.start()
+
+    @property
+    def position(self):
+        """当前已采集的位置（累计字节数）"""
+        return self.ring.written
+
+    def open_reader(self, pre_roll=None):
+        """创建一个新的读取源，从pre_roll秒之前的音频开始"""
+        pre_roll = AUDIO_STREAM['pre_roll'] if pre_roll is None else pre_roll
+        position = max(0, self.ring.written - self.ring.seconds_to_bytes(pre_roll))
+        return RingSource(self.ring, position, self.source.CHUNK,
+                          self.source.SAMPLE_RATE, self.source.SAMPLE_WIDTH)
+
+    def _capture_loop(self):
+        ComputeScheduler.get().register_thread('speech')
+        while self.running:
+            try:
+                self.ring.write(self.source.stream.read(self.source.CHUNK))
+            except OSError as e:
+                # 输入溢出等错误：记录后继续采集
+                self.overflows += 1
+                self.logger.warning(f"Microphone read error: {str(e)}")
+                time.sleep(0.01)
+
+    def close(self):
+        self.running = False
+        self.ring.close()
+        self.capture_thread.join(timeout=1.0)
+        self.microphone.__exit__(None, None, None)
@@ -3,34 +3,119 @@ import pyttsx3
 from config.config import (
     MICROPHONE_INDEX, 
     WAKE_WORD, 
-    LANGUAGE, 
     VOICE_COMMANDS,
     SPEECH_RATE,
     SPEECH_VOLUME,
     VOICE_RESPONSES,
+    VOICE_FRONTEND,
+    ASR_CONFIG,
+    AUDIO_STREAM,
     WEATHER_API
 )
+import collections
 import threading
 import queue
 from modules.utils.logger import Logger
+from modules.system.compute_scheduler import ComputeScheduler
+from modules.voice.asr_backends import create_backend
+from modules.voice.audio_stream import MicrophoneStream
+from modules.voice.voice_frontend import VoiceFrontend, WAKE, pcm_rms
 import random
 import asyncio
 
+def parse_command(text, require_wake_word=True):
+    """从识别文本中解析唤醒词后的命令类型，未唤醒或不是已知命令时返回None
+
+    本地前端已确认唤醒时require_wake_word为False，文本中没有唤醒词也按命令解析。
+    """
+    if require_wake_word and WAKE_WORD not in text:
+        return None
+    return VOICE_COMMANDS.get(text.replace(WAKE_WORD, "").strip())
+
+def recognize_streaming(source, asr, energy_threshold, frontend=None, chat_mode=False,
+                        require_wake_word=True, active=None):
+    """边录边识别：语音开始后逐块送入本地流式识别后端
+
+    source为RingSource等带stream.read(帧数)和stream.media_time的音频源。启用本地
+    前端时，先把语音开头的gate_seconds秒交给VAD和唤醒词检测，未通过则跳过这句话、
+    不启动识别，与整句识别的路径一致。部分结果已构成命令时立即返回，不等句尾的
+    停顿。1秒内没有语音或active()为False时返回None。
+    """
+    active = active or (lambda: True)
+    with source:
+        chunk_seconds = source.CHUNK / float(source.SAMPLE_RATE)
+        pre_roll = collections.deque(maxlen=max(1, int(ASR_CONFIG['pre_roll'] / chunk_seconds)))
+        waited = 0.0
+        while True:
+            pcm = source.stream.read(source.CHUNK)
+            pre_roll.append(pcm)
+            if pcm_rms(pcm) > energy_threshold:
+                break
+            waited += chunk_seconds
+            if waited >= 1 or not active():
+                return None
+
+        chunks = list(pre_roll)
+        silence = elapsed = 0.0
+        if frontend is not None:
+            # 攒够开头一段音频后交给本地前端，通过后才启动识别
+            while elapsed < ASR_CONFIG['gate_seconds'] and silence < ASR_CONFIG['pause_threshold']:
+                pcm = source.stream.read(source.CHUNK)
+                chunks.append(pcm)
+                elapsed += chunk_seconds
+                silence = silence + chunk_seconds if pcm_rms(pcm) <= energy_threshold else 0.0
+            audio = sr.AudioData(b''.join(chunks), source.SAMPLE_RATE, source.SAMPLE_WIDTH)
+            if frontend.process(audio, require_wake=not chat_mode,
+                                now=source.stream.media_time) != WAKE:
+                # 跳过这句话的剩余部分，避免从句中重新触发
+                while silence < ASR_CONFIG['pause_threshold'] and elapsed < 5 and active():
+                    pcm = source.stream.read(source.CHUNK)
+                    elapsed += chunk_seconds
+                    silence = silence + chunk_seconds if pcm_rms(pcm) <= energy_threshold else 0.0
+                return None
+
+        stream = asr.start(source.SAMPLE_RATE, source.SAMPLE_WIDTH)
+        partial = ''
+        for pcm in chunks:
+            partial = stream.feed(pcm)
+        if ASR_CONFIG['partial_commands'] and not chat_mode and parse_command(partial, require_wake_word):
+            return partial
+        while silence < ASR_CONFIG['pause_threshold'] and elapsed < 5:
+            pcm = source.stream.read(source.CHUNK)
+            elapsed += chunk_seconds
+            silence = silence + chunk_seconds if pcm_rms(pcm) <= energy_threshold else 0.0
+            partial = stream.feed(pcm)
+            if ASR_CONFIG['partial_commands'] and not chat_mode and parse_command(partial, require_wake_word):
+                Logger.get_logger("SpeechRecognizer").debug(f"Command from partial result: {partial}")
+                return partial
+    return stream.finish()
+
 class SpeechRecognizer:
     def __init__(self):
         self.logger = Logger.get_logger("SpeechRecognizer")
         self.logger.info("Initializing speech recognizer")
         self.recognizer = sr.Recognizer()
-        self.microphone = sr.Microphone(device_index=MICROPHONE_INDEX)
+        # 常驻采集流：麦克风只打开一次，监听和对话都从同一个环形缓冲区读取
+        self.mic_stream = MicrophoneStream(MICROPHONE_INDEX)
+        self.audio_source = self.mic_stream.open_reader()
         self.engine = pyttsx3.init()
         self.engine.setProperty('rate', SPEECH_RATE)
         self.engine.setProperty('volume', SPEECH_VOLUME/100)
         
         # 命令队列
         self.command_queue = queue.Queue()
+        # 其他线程（如行为报警）排队的播报，由监听线程在两句之间播出
+        self.announcements = queue.Queue()
+        # pyttsx3引擎不是线程安全的，所有播报串行执行
+        self.speak_lock = threading.Lock()
+
+        # 本地VAD和唤醒词检测，通过后才调用云端识别
+        self.frontend = VoiceFrontend() if VOICE_FRONTEND['enabled'] else None
+        # 识别后端（云端或本地流式）
+        self.asr = create_backend(recognizer=self.recognizer)
         
         # 调整麦克风噪声阈值
-        with self.microphone as source:
+        with self.audio_source as source:
             self.recognizer.adjust_for_ambient_noise(source)
             
         # 启动语音识别线程
@@ -158,9 +243,9 @@ class SpeechRecognizer:
     def _get_user_input(self):
         """获取用户语音输入"""
         try:
-            with self.microphone as source:
+            with self.audio_source as source:
                 audio = self.recognizer.listen(source, timeout=5)
-                text = self.recognizer.recognize_google(audio, language=LANGUAGE)
+                text = self.asr.transcribe(audio)
                 return text
         except Exception as e:
             self.logger.error(f"Error getting user input: {str(e)}")
@@ -168,25 +253,34 @@ class SpeechRecognizer:
     
     def _listen_loop(self):
         """持续监听语音命令的循环"""
+        ComputeScheduler.get().register_thread('speech')
         while self.is_listening:
             try:
-                with self.microphone as source:
-                    audio = self.recognizer.listen(source, timeout=1, phrase_time_limit=5)
-                
+                self._speak_announcements()
+                chat_mode = self.chat_assistant is not None and self.chat_assistant.is_chat_mode()
                 try:
-                    text = self.recognizer.recognize_google(audio, language=LANGUAGE)
+                    require_wake_word = self.frontend is None or not self.frontend.verifies_wake
+                    if self.asr.streaming:
+                        text = self._recognize_streaming(chat_mode, require_wake_word)
+                    else:
+                        text = self._recognize_phrase(chat_mode)
+                    if text is None:
+                        continue
                     self.logger.debug(f"Recognized speech: {text}")
+                    # 识别期间采集继续写入缓冲区，积压太久的语音不再当作命令执行
+                    age = self.audio_source.stream.lag
+                    if not chat_mode and age > AUDIO_STREAM['max_command_age']:
+                        self.logger.warning(f"Dropping stale speech ({age:.1f}s old): {text}")
+                        continue
                     
-                    if self.chat_assistant and self.chat_assistant.is_chat_mode():
+                    if chat_mode:
                         if "退出聊天" in text:
                             self.chat_assistant.exit_chat_mode()
                         else:
                             asyncio.run(self._process_chat_input(text))
-                    elif WAKE_WORD in text:
-                        command = text.replace(WAKE_WORD, "").strip()
-                        
-                        if command in VOICE_COMMANDS:
-                            command_type = VOICE_COMMANDS[command]
+                    else:
+                        command_type = parse_command(text, require_wake_word)
+                        if command_type:
                             if command_type == "chat_mode":
                                 self.chat_assistant.enter_chat_mode()
                             else:
@@ -204,6 +298,23 @@ class SpeechRecognizer:
                 self.logger.error(f"Error in listen loop: {str(e)}")
                 continue
     
+    def _recognize_phrase(self, chat_mode):
+        """录完一整句后识别；本地前端未通过时返回None，不调用识别后端"""
+        with self.audio_source as source:
+            audio = self.recognizer.listen(source, timeout=1, phrase_time_limit=5)
+        # 唤醒窗口按短语在采集流中的结束时间计算
+        if self.frontend is not None and \
+                self.frontend.process(audio, require_wake=not chat_mode,
+                                      now=self.audio_source.stream.media_time) != WAKE:
+            return None
+        return self.asr.transcribe(audio)
+    
+    def _recognize_streaming(self, chat_mode, require_wake_word=True):
+        """从常驻采集流边录边识别，见recognize_streaming"""
+        return recognize_streaming(self.audio_source, self.asr, self.recognizer.energy_threshold,
+                                   self.frontend, chat_mode, require_wake_word,
+                                   lambda: self.is_listening)
+    
     def get_command(self):
         """获取最新的语音命令"""
         try:
@@ -211,37 +322,48 @@ class SpeechRecognizer:
         except queue.Empty:
             return None
     
+    def announce(self, text):
+        """排队一条播报并立即返回，可在任意线程调用，由监听线程播出"""
+        self.announcements.put(text)
+    
+    def _speak_announcements(self):
+        while True:
+            try:
+                text = self.announcements.get_nowait()
+            except queue.Empty:
+                return
+            self.speak(text)
+    
     def speak(self, text):
         """文本转语音输出"""
-        # 设置语音参数
-        self.engine.setProperty('rate', SPEECH_RATE)     # 语速
-        self.engine.setProperty('volume', SPEECH_VOLUME) # 音量
-        self.engine.setProperty('voice', VOICE_ID)       # 声音类型
-        
-        # 执行语音合成
-        self.engine.say(text)
-        self.engine.runAndWait()
+        with self.speak_lock:
+            # 设置语音参数
+            self.engine.setProperty('rate', SPEECH_RATE)     # 语速
+            self.engine.setProperty('volume', SPEECH_VOLUME / 100) # 音量(0-1)
+            
+            # 执行语音合成
+            try:
+                self.engine.say(text)
+                self.engine.runAndWait()
+            finally:
+                # 丢弃播报期间采集到的自身语音，之后的对话输入从播报结束处开始
+                self.audio_source.stream.discard_until(self.mic_stream.position)
     
     def cleanup(self):
         """清理资源"""
         self.is_listening = False
+        # 关闭采集流，唤醒阻塞在缓冲区上的读取
+        self.mic_stream.close()
         self.listen_thread.join() 
 
     def listen(self):
-        with sr.Microphone() as source:
+        # 独立的读取位置，不影响监听线程
+        with self.mic_stream.open_reader() as source:
             print("听取命令中...")
             audio = self.recognizer.listen(source)
             try:
-                # 可以选择不同的识别引擎:
-                # 1. Google Speech Recognition (默认)
-                text = self.recognizer.recognize_google(audio, language='zh-CN')
-                
-                # 2. 百度语音识别
-                # text = self.recognizer.recognize_baidu(audio, api_key, secret_key)
-                
-                # 3. 科大讯飞
-                # text = self.recognizer.recognize_xfyun(audio, api_id, api_key)
-                
+                # 识别引擎由ASR_CONFIG['backend']选择，见asr_backends
+                text = self.asr.transcribe(audio)
                 return text
             except sr.UnknownValueError:
                 return None
@@ -0,0 +1,258 @@
+import glob
+import os
+import time
+import wave
+import numpy as np
+from config.config import VOICE_FRONTEND
+from config.model_config import MODEL_CONFIG
+from modules.utils.logger import Logger
+from modules.utils.perf import StageStats
+
+# process() 的判定结果
+NOISE = 'noise'      # VAD未检测到足够的语音，丢弃
+NO_WAKE = 'no_wake'  # 有语音但没有唤醒词，丢弃
+WAKE = 'wake'        # 检测到唤醒词（或处于唤醒窗口内），送入识别
+
+def pcm_to_float(pcm):
+    """16位PCM字节转为[-1, 1]的float32数组"""
+    return np.frombuffer(pcm, dtype=np.int16).astype(np.float32) / 32768.0
+
+def pcm_rms(pcm):
+    """16位PCM字节的RMS，单位与speech_recognition的energy_threshold一致"""
+    samples = np.frombuffer(pcm, dtype=np.int16).astype(np.float32)
+    return float(np.sqrt(np.mean(samples * samples))) if len(samples) else 0.0
+
+def load_wav(path, sample_rate):
+    """读取16位WAV为float32单声道，采样率不同时线性插值重采样"""
+    with wave.open(path, 'rb') as wav:
+        if wav.getsampwidth() != 2:
+            raise ValueError(f"Only 16-bit WAV is supported: {path}")
+        samples = pcm_to_float(wav.readframes(wav.getnframes()))
+        channels, rate = wav.getnchannels(), wav.getframerate()
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1)
+    if rate != sample_rate:
+        positions = np.arange(0, len(samples), rate / float(sample_rate))
+        samples = np.interp(positions, np.arange(len(samples)), samples).astype(np.float32)
+    return samples
+
+class EnergyVAD:
+    """基于短时能量的语音检测，噪声底随非语音帧自适应更新"""
+    name = 'energy'
+
+    def __init__(self, sample_rate):
+        self.frame_length = int(sample_rate * VOICE_FRONTEND['vad_frame_ms'] / 1000)
+        self.noise_floor = None
+
+    def speech_frames(self, samples):
+        """返回每帧是否为语音的布尔数组"""
+        n = len(samples) // self.frame_length
+        if n == 0:
+            return np.zeros(0, dtype=bool)
+        frames = samples[:n * self.frame_length].reshape(n, self.frame_length)
+        rms = np.sqrt(np.einsum('ij,ij->i', frames, frames) / self.frame_length)
+        floor = float(np.percentile(rms, 10))
+        self.noise_floor = floor if self.noise_floor is None else \
+            min(floor, 0.9 * self.noise_floor + 0.1 * floor)
+        threshold = max(self.noise_floor * VOICE_FRONTEND['energy_ratio'], VOICE_FRONTEND['min_energy'])
+        return rms > threshold
+
+class WebRtcVAD:
+    """WebRTC VAD（需要安装webrtcvad），对非语音噪声更稳健"""
+    name = 'webrtc'
+
+    def __init__(self, sample_rate):
+        import webrtcvad
+        self.vad = webrtcvad.Vad(VOICE_FRONTEND['webrtc_aggressiveness'])
+        self.sample_rate = sample_rate
+        self.frame_length = int(sample_rate * VOICE_FRONTEND['vad_frame_ms'] / 1000)
+
+    def speech_frames(self, samples):
+        pcm = (np.clip(samples, -1.0, 1.0) * 32767).astype(np.int16).tobytes()
+        step = self.frame_length * 2
+        return np.array([self.vad.is_speech(pcm[i:i + step], self.sample_rate)
+                         for i in range(0, len(pcm) - step + 1, step)], dtype=bool)
+
+class SnowboySpotter:
+    """Snowboy唤醒词检测，模型路径来自MODEL_CONFIG['voice']['wake_word']"""
+    name = 'snowboy'
+
+    def __init__(self, sample_rate):
+        import snowboydetect
+        model_path = MODEL_CONFIG['voice']['wake_word']['path']
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(model_path)
+        self.detector = snowboydetect.SnowboyDetect(
+            resource_filename=VOICE_FRONTEND['snowboy_resource'].encode(),
+            model_str=model_path.encode()
+        )
+        self.detector.SetSensitivity(str(VOICE_FRONTEND['snowboy_sensitivity']).encode())
+        self.chunk = sample_rate // 10
+
+    def detect(self, samples):
+        pcm = (np.clip(samples, -1.0, 1.0) * 32767).astype(np.int16)
+        self.detector.Reset()
+        for i in range(0, len(pcm), self.chunk):
+            if self.detector.RunDetection(pcm[i:i + self.chunk].tobytes()) > 0:
+                return True
+        return False
+
+class TemplateSpotter:
+    """基于MFCC和子序列DTW的模板匹配唤醒词检测，纯numpy实现
+
+    template_dir下放几条唤醒词录音（16位WAV），短语中任意位置与任一模板的
+    归一化DTW距离低于阈值即认为唤醒。
+    """
+    name = 'template'
+
+    def __init__(self, sample_rate, n_fft=512, n_mels=26, n_ceps=13):
+        self.sample_rate = sample_rate
+        self.n_fft = n_fft
+        self.win = int(0.025 * sample_rate)
+        self.hop = int(0.010 * sample_rate)
+        self.window = np.hamming(self.win).astype(np.float32)
+        self.mel_fb = self._mel_filterbank(n_mels)
+        # DCT-II矩阵，去掉第0阶（能量）
+        k = np.arange(1, n_ceps + 1)[:, None]
+        n = np.arange(n_mels)[None, :]
+        self.dct = np.cos(np.pi * k * (2 * n + 1) / (2 * n_mels)).astype(np.float32)
+        self.threshold = VOICE_FRONTEND['template_threshold']
+        paths = sorted(glob.glob(os.path.join(VOICE_FRONTEND['template_dir'], '*.wav')))
+        if not paths:
+            raise FileNotFoundError(f"No wake word templates in {VOICE_FRONTEND['template_dir']}")
+        self.templates = [self.mfcc(load_wav(path, sample_rate)) for path in paths]
+
+    def _mel_filterbank(self, n_mels):
+        def hz_to_mel(hz):
+            return 2595.0 * np.log10(1.0 + hz / 700.0)
+        mel_points = np.linspace(hz_to_mel(0), hz_to_mel(self.sample_rate / 2), n_mels + 2)
+        hz_points = 700.0 * (10 ** (mel_points / 2595.0) - 1.0)
+        bins = np.floor((self.n_fft + 1) * hz_points / self.sample_rate).astype(int)
+        fb = np.zeros((n_mels, self.n_fft // 2 + 1), dtype=np.float32)
+        for m in range(1, n_mels + 1):
+            left, center, right = bins[m - 1], bins[m], bins[m + 1]
+            fb[m - 1, left:center] = (np.arange(left, center) - left) / max(center - left, 1)
+            fb[m - 1, center:right] = (right - np.arange(center, right)) / max(right - center, 1)
+        return fb
+
+    def mfcc(self, samples):
+        """返回 (帧数, n_ceps) 的MFCC，按句做均值归一化"""
+        if len(samples) < self.win:
+            samples = np.pad(samples, (0, self.win - len(samples)))
+        emphasized = np.append(samples[0], samples[1:] - 0.97 * samples[:-1])
+        n = 1 + (len(emphasized) - self.win) // self.hop
+        frames = np.lib.stride_tricks.as_strided(
+            emphasized, shape=(n, self.win),
+            strides=(emphasized.strides[0] * self.hop, emphasized.strides[0])
+        ) * self.window
+        power = np.abs(np.fft.rfft(frames, self.n_fft)) ** 2
+        features = np.log(power @ self.mel_fb.T + 1e-10) @ self.dct.T
+        return features - features.mean(axis=0)
+
+    @staticmethod
+    def subsequence_dtw(template, query):
+        """模板在查询序列任意位置的最小归一化DTW距离
+
+        步进模式(1,0)/(1,1)/(1,2)只依赖上一行，每行可整体向量化计算。
+        """
+        cost = np.sqrt(((template[:, None, :] - query[None, :, :]) ** 2).sum(axis=2))
+        acc = cost[0].copy()
+        for i in range(1, len(template)):
+            prev = acc
+            best = prev.copy()
+            best[1:] = np.minimum(best[1:], prev[:-1])
+            best[2:] = np.minimum(best[2:], prev[:-2])
+            acc = cost[i] + best
+        return float(acc.min()) / len(template)
+
+    def detect(self, samples):
+        query = self.mfcc(samples)
+        return any(self.subsequence_dtw(t, query) < self.threshold
+                   for t in self.templates if len(query) >= len(t) // 2)
+
+class PassthroughSpotter:
+    """不做唤醒词检测，所有语音短语都送入识别"""
+    name = 'none'
+
+    def __init__(self, sample_rate):
+        pass
+
+    def detect(self, samples):
+        return True
+
+VADS = {vad.name: vad for vad in (EnergyVAD, WebRtcVAD)}
+SPOTTERS = {spotter.name: spotter for spotter in (SnowboySpotter, TemplateSpotter, PassthroughSpotter)}
+
+class VoiceFrontend:
+    """云端识别前的本地语音前端：VAD过滤噪声，唤醒词检测后才调用识别
+
+    唤醒后wake_window秒内的后续短语不需要再说唤醒词。唤醒词检测器不可用
+    （缺少snowboy或模板）时依次退回template和none。
+    """
+    def __init__(self):
+        self.logger = Logger.get_logger("VoiceFrontend")
+        self.sample_rate = VOICE_FRONTEND['sample_rate']
+        self.vad = self._create(VADS, VOICE_FRONTEND['vad'], ['energy'])
+        self.spotter = self._create(SPOTTERS, VOICE_FRONTEND['spotter'], ['template', 'none'])
+        self.min_speech_frames = VOICE_FRONTEND['min_speech_ms'] / VOICE_FRONTEND['vad_frame_ms']
+        # 本地已确认唤醒词时，识别文本里不必再包含唤醒词
+        self.verifies_wake = self.spotter.name != 'none'
+        self.awake_until = float('-inf')
+        self.speech_end = 0.0  # 最近一个短语中最后一个语音帧结束的位置(秒)
+        self.counts = {NOISE: 0, NO_WAKE: 0, WAKE: 0}
+        self.vad_stats = StageStats()
+        self.spotter_stats = StageStats()
+        self.logger.info(f"Voice frontend: vad={self.vad.name}, spotter={self.spotter.name}")
+
+    def _create(self, registry, name, fallbacks):
+        for candidate in [name] + [f for f in fallbacks if f != name]:
+            try:
+                return registry[candidate](self.sample_rate)
+            except (ImportError, OSError, ValueError) as e:
+                self.logger.warning(f"{candidate} unavailable: {str(e)}")
+        raise RuntimeError(f"No usable voice frontend component among {[name] + fallbacks}")
+
+    def process(self, audio, require_wake=True, now=None):
+        """判定一段sr.AudioData短语，返回NOISE/NO_WAKE/WAKE
+
+        now为短语结束处的音频时间（秒），唤醒窗口按音频时间计算，不受处理
+        延迟影响；不传时使用当前时钟。
+        """
+        now = time.monotonic() if now is None else now
+        samples = pcm_to_float(audio.get_raw_data(convert_rate=self.sample_rate, convert_width=2))
+
+        start = time.perf_counter()
+        mask = self.vad.speech_frames(samples)
+        self.vad_stats.add(start, time.perf_counter())
+        voiced = np.flatnonzero(mask)
+        self.speech_end = (voiced[-1] + 1) * self.vad.frame_length / self.sample_rate if len(voiced) else 0.0
+        if len(voiced) < self.min_speech_frames:
+            self.counts[NOISE] += 1
+            return NOISE
+
+        if require_wake and now > self.awake_until:
+            start = time.perf_counter()
+            woke = self.spotter.detect(samples)
+            self.spotter_stats.add(start, time.perf_counter())
+            if not woke:
+                self.counts[NO_WAKE] += 1
+                return NO_WAKE
+            self.awake_until = now + VOICE_FRONTEND['wake_window']
+        self.counts[WAKE] += 1
+        return WAKE
+
+    def reset_wake(self):
+        """结束唤醒窗口，之后的短语需要重新说唤醒词"""
+        self.awake_until = float('-inf')
+
+    def get_stats(self):
+        phrases = sum(self.counts.values())
+        return {
+            'phrases': phrases,
+            'dropped_noise': self.counts[NOISE],
+            'dropped_no_wake': self.counts[NO_WAKE],
+            'forwarded': self.counts[WAKE],
+            'asr_call_rate': self.counts[WAKE] / phrases if phrases else 0.0,
+            'vad': self.vad_stats.summary(),
+            'spotter': self.spotter_stats.summary()
+        }
@@ -0,0 +1,164 @@
+import argparse
+import json
+import os
+import time
+import numpy as np
+import speech_recognition as sr
+from config.config import ASR_CONFIG
+from modules.voice.asr_backends import BACKENDS, create_backend
+from modules.voice.speech_recognizer import parse_command
+from modules.voice.voice_frontend import EnergyVAD, load_wav
+from scripts.generate_asr_testset import DEFAULT_OUTPUT, generate_missing
+
+DEFAULT_MANIFEST = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'asr_testset', 'manifest.jsonl')
+
+def edit_distance(ref, hyp):
+    """字符级编辑距离"""
+    row = list(range(len(hyp) + 1))
+    for i, r in enumerate(ref, 1):
+        prev, row[0] = row[0], i
+        for j, h in enumerate(hyp, 1):
+            prev, row[j] = row[j], min(row[j] + 1, row[j - 1] + 1, prev + (r != h))
+    return row[-1]
+
+def load_manifest(path, synth_dir=None):
+    """读取测试集清单，优先使用清单目录下的真人录音，其次synth_dir中的合成录音
+
+    返回 (有音频的条目, 缺少音频的条目)，合成录音的条目带 synthetic=True。
+    """
+    base = os.path.dirname(path)
+    entries, missing = [], []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            entry['path'] = os.path.join(base, entry['audio'])
+            entry['synthetic'] = False
+            if not os.path.exists(entry['path']) and synth_dir is not None:
+                entry['path'] = os.path.join(synth_dir, entry['audio'])
+                entry['synthetic'] = True
+            (entries if os.path.exists(entry['path']) else missing).append(entry)
+    return entries, missing
+
+def run_utterance(backend, entry, chunk_seconds):
+    """识别一条录音，返回识别文本、耗时和部分结果给出命令的时间"""
+    rate = ASR_CONFIG['sample_rate']
+    samples = load_wav(entry['path'], rate)
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767).astype(np.int16).tobytes()
+    duration = len(samples) / float(rate)
+    vad = EnergyVAD(rate)
+    voiced = np.flatnonzero(vad.speech_frames(samples))
+    speech_end = (voiced[-1] + 1) * vad.frame_length / rate if len(voiced) else duration
+    expected = parse_command(entry['text'])
+    result = {'duration': duration, 'speech_end': speech_end, 'command_at': None}
+
+    if not backend.streaming:
+        start = time.perf_counter()
+        try:
+            result['text'] = backend.transcribe(sr.AudioData(pcm, rate, 2))
+        except sr.UnknownValueError:
+            result['text'] = ''
+        result['compute_s'] = result['final_latency_s'] = time.perf_counter() - start
+        return result
+
+    # 按块送入流式识别，模拟边录边识别
+    stream = backend.start(rate)
+    step = int(chunk_seconds * rate) * 2
+    compute = 0.0
+    for offset in range(0, len(pcm), step):
+        start = time.perf_counter()
+        partial = stream.feed(pcm[offset:offset + step])
+        compute += time.perf_counter() - start
+        if result['command_at'] is None and expected and parse_command(partial) == expected:
+            # 该块录完的时间 + 处理该块的耗时
+            result['command_at'] = min(offset + step, len(pcm)) / 2.0 / rate + time.perf_counter() - start
+    start = time.perf_counter()
+    try:
+        result['text'] = stream.finish()
+    except sr.UnknownValueError:
+        result['text'] = ''
+    result['final_latency_s'] = time.perf_counter() - start
+    result['compute_s'] = compute + result['final_latency_s']
+    return result
+
+def benchmark(name, entries, chunk_seconds, verbose):
+    start = time.perf_counter()
+    backend = create_backend(name)
+    load_s = time.perf_counter() - start
+    if backend.name != name:
+        print(f"{name}: unavailable, skipped")
+        return
+
+    errors = chars = correct_commands = 0
+    compute = audio = 0.0
+    finals, leads = [], []
+    for entry in entries:
+        try:
+            r = run_utterance(backend, entry, chunk_seconds)
+        except sr.RequestError as e:
+            print(f"{name}: request failed for {entry['audio']}: {e}")
+            continue
+        ref = ''.join(entry['text'].split())
+        errors += edit_distance(ref, r['text'])
+        chars += len(ref)
+        correct_commands += parse_command(r['text']) == parse_command(entry['text'])
+        compute += r['compute_s']
+        audio += r['duration']
+        # 说完到拿到命令：流式取部分结果给出命令的时刻，否则为最终结果
+        finals.append(r['final_latency_s'] + (r['duration'] - r['speech_end']))
+        if r['command_at'] is not None:
+            leads.append(r['command_at'] - r['speech_end'])
+        if verbose:
+            print(f"  {entry['audio']}: '{r['text']}' (ref '{ref}')")
+
+    print(f"{name}: load {load_s:.2f}s, CER {errors / max(chars, 1) * 100:.1f}%, "
+          f"command accuracy {correct_commands}/{len(entries)}, RTF {compute / max(audio, 1e-6):.3f}")
+    if finals:
+        finals = np.array(finals) * 1000
+        print(f"  end of speech -> final result: mean {finals.mean():.0f}ms p95 {np.percentile(finals, 95):.0f}ms")
+    if leads:
+        leads = np.array(leads) * 1000
+        print(f"  end of speech -> command from partial: mean {leads.mean():.0f}ms "
+              f"(negative = before end of speech), {len(leads)} utterances")
+
+def main():
+    parser = argparse.ArgumentParser(description="在测试集上比较语音识别后端的字错误率、实时率和命令延迟")
+    parser.add_argument('--manifest', default=DEFAULT_MANIFEST,
+                        help="测试集清单(jsonl: audio, text)，audio为相对清单目录的16位WAV路径")
+    parser.add_argument('--backends', default=','.join(BACKENDS),
+                        help="逗号分隔的后端列表")
+    parser.add_argument('--chunk', type=float, default=0.1, help="流式识别每块音频的时长(秒)")
+    parser.add_argument('--voice', help="合成缺少的录音时使用的pyttsx3语音ID，默认自动选择中文语音")
+    parser.add_argument('--synth-dir', default=DEFAULT_OUTPUT, help="合成录音的目录（源码树之外）")
+    parser.add_argument('--no-generate', action='store_true',
+                        help="不用TTS合成缺少的录音，只评估已有录音")
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args()
+
+    synth_dir = None if args.no_generate else args.synth_dir
+    entries, missing = load_manifest(args.manifest, synth_dir)
+    if missing and not args.no_generate:
+        # 仓库只带测试句清单，缺少的录音先用本地中文TTS合成，真人录音放在清单目录下同名文件即可替换
+        print(f"Synthesizing {len(missing)} missing recordings with local TTS into {args.synth_dir}")
+        try:
+            generate_missing(args.manifest, args.synth_dir, args.voice)
+        except RuntimeError as e:
+            raise SystemExit(f"Cannot synthesize the test set: {e}")
+        entries, missing = load_manifest(args.manifest, synth_dir)
+    synthetic = sum(e['synthetic'] for e in entries)
+    if synthetic:
+        print(f"{synthetic}/{len(entries)} recordings are synthesized; "
+              f"numbers on TTS audio are only a smoke test, use real recordings for accuracy")
+    if missing:
+        print(f"{len(missing)} manifest entries have no recording yet: "
+              f"{', '.join(e['audio'] for e in missing)}")
+    if not entries:
+        print("No recordings to benchmark; record the manifest sentences as 16-bit WAV next to the manifest "
+              "or run scripts.generate_asr_testset")
+        return
+    for name in args.backends.split(','):
+        benchmark(name.strip(), entries, args.chunk, args.verbose)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+import argparse
+import glob
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+
+def load_inputs(images_dir, count, seed):
+    """加载评估图像，返回 (BGR图像列表, 标签下标或None)
+
+    images_dir下按BEHAVIOR_CLASSES中的类别名分子目录；未提供时使用固定种子的
+    随机图像，只比较各后端与eager的输出一致性。
+    """
+    import cv2
+    from config.config import BEHAVIOR_CLASSES
+    if not images_dir:
+        rng = np.random.default_rng(seed)
+        return [rng.integers(0, 256, (480, 640, 3), dtype=np.uint8) for _ in range(count)], None
+    images, labels = [], []
+    for label, name in enumerate(BEHAVIOR_CLASSES):
+        for path in sorted(glob.glob(os.path.join(images_dir, name, '*'))):
+            image = cv2.imread(path)
+            if image is not None:
+                images.append(image)
+                labels.append(label)
+    return images, np.array(labels)
+
+def probe(args):
+    """子进程中运行单个后端：测量启动耗时、推理延迟和常驻内存，并保存输出概率"""
+    start = time.perf_counter()
+    import torch
+    from modules.behavior.behavior_model import INPUT_SIZE
+    from modules.behavior.inference_backends import create_backend
+    from modules.behavior.preprocessing import FramePreprocessor
+    backend = create_backend(args.probe)
+    load_time = time.perf_counter() - start
+    backend(torch.zeros(1, 3, INPUT_SIZE, INPUT_SIZE))
+    ttfi = time.perf_counter() - start
+
+    # 与BehaviorDetector相同的预处理，保证各后端输入一致
+    preprocessor = FramePreprocessor()
+    images, _ = load_inputs(args.images, args.count, args.seed)
+    batches = [preprocessor(image).clone() for image in images]
+
+    latencies = []
+    probabilities = []
+    for _ in range(args.repeat):
+        probabilities = []
+        for batch in batches:
+            t0 = time.perf_counter()
+            logits = backend(batch)
+            latencies.append(time.perf_counter() - t0)
+            probabilities.append(torch.softmax(logits.float(), dim=1)[0].numpy())
+    np.save(args.output, np.stack(probabilities))
+
+    latencies = np.array(latencies) * 1000
+    print(json.dumps({
+        'backend': args.probe,
+        'load_ms': load_time * 1000,
+        'ttfi_ms': ttfi * 1000,
+        'mean_ms': float(latencies.mean()),
+        'p95_ms': float(np.percentile(latencies, 95)),
+        'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    }))
+
+def main():
+    parser = argparse.ArgumentParser(description="行为分类推理后端的一致性测试和性能对比")
+    parser.add_argument('--backends', default='eager,torchscript,int8,onnx')
+    parser.add_argument('--images', help="按类别分子目录的评估图像，用于计算准确率")
+    parser.add_argument('--count', type=int, default=32, help="未提供图像时的随机输入数量")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--min-agreement', type=float, default=0.95,
+                        help="与eager后端top-1一致率下限")
+    parser.add_argument('--max-accuracy-drop', type=float, default=0.02,
+                        help="相对eager后端的准确率下降上限")
+    parser.add_argument('--probe', help=argparse.SUPPRESS)
+    parser.add_argument('--output', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.probe:
+        probe(args)
+        return
+
+    backends = [b.strip() for b in args.backends.split(',') if b.strip()]
+    if 'eager' not in backends:
+        backends.insert(0, 'eager')
+    _, labels = load_inputs(args.images, args.count, args.seed)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for name in backends:
+            # 每个后端在独立进程中运行，RSS和启动耗时互不影响
+            output = os.path.join(temp_dir, f"{name}.npy")
+            command = [sys.executable, '-m', 'scripts.benchmark_behavior_backends',
+                       '--probe', name, '--output', output, '--count', str(args.count),
+                       '--seed', str(args.seed), '--repeat', str(args.repeat)]
+            if args.images:
+                command += ['--images', args.images]
+            proc = subprocess.run(command, capture_output=True, text=True)
+            if proc.returncode != 0:
+                error = (proc.stderr.strip().splitlines() or ['unknown error'])[-1]
+                print(f"{name}: unavailable: {error}")
+                continue
+            stats = json.loads(proc.stdout.strip().splitlines()[-1])
+            stats['probabilities'] = np.load(output)
+            results[name] = stats
+
+    if 'eager' not in results:
+        print("Eager backend failed; cannot check parity")
+        sys.exit(1)
+    reference = results['eager']['probabilities']
+    reference_top1 = reference.argmax(axis=1)
+    reference_accuracy = float((reference_top1 == labels).mean()) if labels is not None else None
+
+    print(f"{'backend':<12} {'load_ms':>8} {'ttfi_ms':>8} {'mean_ms':>8} {'p95_ms':>8} "
+          f"{'rss_mb':>7} {'agree':>6} {'max_dp':>7} {'acc':>6}  parity")
+    failed = False
+    for name, r in results.items():
+        probabilities = r['probabilities']
+        top1 = probabilities.argmax(axis=1)
+        agreement = float((top1 == reference_top1).mean())
+        max_diff = float(np.abs(probabilities - reference).max())
+        accuracy = float((top1 == labels).mean()) if labels is not None else None
+        passed = agreement >= args.min_agreement
+        if accuracy is not None:
+            passed = passed and reference_accuracy - accuracy <= args.max_accuracy_drop
+        failed = failed or not passed
+        acc_text = f"{accuracy:>6.3f}" if accuracy is not None else f"{'-':>6}"
+        print(f"{name:<12} {r['load_ms']:>8.0f} {r['ttfi_ms']:>8.0f} {r['mean_ms']:>8.1f} "
+              f"{r['p95_ms']:>8.1f} {r['max_rss_mb']:>7.0f} {agreement:>6.3f} {max_diff:>7.4f} "
+              f"{acc_text}  {'PASS' if passed else 'FAIL'}")
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+import argparse
+import time
+import tracemalloc
+import numpy as np
+import torch
+from torchvision import transforms
+from modules.behavior.behavior_model import INPUT_SIZE
+from modules.behavior.preprocessing import FramePreprocessor, MEAN, STD
+
+def measure(fn, frames, repeat):
+    """返回 (每帧耗时ms, 每帧Python堆分配峰值KiB)"""
+    for frame in frames[:3]:
+        fn(frame)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for frame in frames:
+            fn(frame)
+    per_frame_ms = (time.perf_counter() - start) * 1000 / (repeat * len(frames))
+
+    tracemalloc.start()
+    peaks = []
+    for frame in frames:
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        fn(frame)
+        peaks.append(tracemalloc.get_traced_memory()[1] - before)
+    tracemalloc.stop()
+    return per_frame_ms, float(np.mean(peaks)) / 1024
+
+def main():
+    parser = argparse.ArgumentParser(description="比较torchvision/PIL预处理与OpenCV预分配缓冲区预处理")
+    parser.add_argument('--width', type=int, default=640)
+    parser.add_argument('--height', type=int, default=480)
+    parser.add_argument('--frames', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    frames = [rng.integers(0, 256, (args.height, args.width, 3), dtype=np.uint8)
+              for _ in range(args.frames)]
+
+    # 原有路径：BGR帧直接送入PIL流程
+    transform = transforms.Compose([
+        transforms.ToPILImage(),
+        transforms.Resize((INPUT_SIZE, INPUT_SIZE)),
+        transforms.ToTensor(),
+        transforms.Normalize(mean=MEAN.tolist(), std=STD.tolist())
+    ])
+    preprocessor = FramePreprocessor()
+
+    paths = [
+        ('torchvision (BGR)', lambda f: transform(f).unsqueeze(0)),
+        ('torchvision (RGB)', lambda f: transform(np.ascontiguousarray(f[:, :, ::-1])).unsqueeze(0)),
+        ('opencv buffer', preprocessor)
+    ]
+    print(f"{'path':<20} {'ms/frame':>9} {'alloc_kib':>10}")
+    for name, fn in paths:
+        per_frame_ms, alloc_kib = measure(fn, frames, args.repeat)
+        print(f"{name:<20} {per_frame_ms:>9.3f} {alloc_kib:>10.1f}")
+
+    # 数值差异：与颜色顺序正确的torchvision路径比较，差异来自缩放插值
+    diffs = []
+    for frame in frames:
+        reference = paths[1][1](frame)
+        diffs.append(torch.abs(preprocessor(frame) - reference))
+    diffs = torch.stack(diffs)
+    print(f"vs torchvision (RGB): max abs diff {diffs.max().item():.4f}, "
+          f"mean abs diff {diffs.mean().item():.4f} (normalized units)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+import argparse
+import time
+import numpy as np
+from modules.face_recognition.face_matcher import FaceMatcher
+
+try:
+    from sklearn.neighbors import KDTree
+except ImportError:
+    KDTree = None
+
+def make_gallery(num_templates, templates_per_identity, dim, rng):
+    """生成模拟人脸库：每个身份一个中心，模板在中心附近扰动"""
+    num_ids = max(1, num_templates // templates_per_identity)
+    centers = rng.normal(scale=0.1, size=(num_ids, dim)).astype(np.float32)
+    ids = np.arange(num_templates) % num_ids
+    encodings = centers[ids] + rng.normal(scale=0.02, size=(num_templates, dim)).astype(np.float32)
+    names = [f"person_{i}" for i in ids]
+    return names, encodings, centers
+
+def timed(func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    return (time.perf_counter() - start) / repeat * 1000, result
+
+def main():
+    parser = argparse.ArgumentParser(description="FaceMatcher与KDTree匹配性能对比")
+    parser.add_argument('--sizes', default='10,100,1000,10000,100000', help="模板数量列表")
+    parser.add_argument('--templates-per-identity', type=int, default=5)
+    parser.add_argument('--queries', type=int, default=4, help="每次查询的人脸数")
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--dim', type=int, default=128)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'templates':>10} {'kdtree_build':>13} {'kdtree_query':>13} {'blas_build':>11} {'blas_query':>11} {'agree':>6}")
+    for size in [int(s) for s in args.sizes.split(',')]:
+        names, encodings, centers = make_gallery(size, args.templates_per_identity, args.dim, rng)
+        picks = rng.integers(0, len(centers), size=args.queries)
+        queries = centers[picks] + rng.normal(scale=0.02, size=(args.queries, args.dim)).astype(np.float32)
+
+        matcher = FaceMatcher()
+        blas_build, _ = timed(lambda: matcher.set_templates(names, encodings), 1)
+        blas_query, results = timed(lambda: matcher.query(queries, k=1), args.repeat)
+        blas_names = [r[0][0] for r in results]
+
+        if KDTree is not None:
+            tree = [None]
+            kd_build, _ = timed(lambda: tree.__setitem__(0, KDTree(encodings)), 1)
+            kd_query, (_, indices) = timed(lambda: tree[0].query(queries, k=1), args.repeat)
+            kd_names = [names[i[0]] for i in indices]
+            agree = sum(a == b for a, b in zip(blas_names, kd_names)) / len(queries)
+            print(f"{size:>10} {kd_build:>11.2f}ms {kd_query:>11.3f}ms "
+                  f"{blas_build:>9.2f}ms {blas_query:>9.3f}ms {agree:>6.0%}")
+        else:
+            print(f"{size:>10} {'n/a':>13} {'n/a':>13} {blas_build:>9.2f}ms {blas_query:>9.3f}ms {'n/a':>6}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+import argparse
+import tempfile
+import time
+import numpy as np
+from config.config import FACE_MATCHER
+from modules.face_recognition.face_matcher import FaceMatcher
+from scripts.benchmark_face_matcher import make_gallery
+
+def build_matcher(storage, names, encodings):
+    matcher = FaceMatcher(dict(FACE_MATCHER, storage=storage))
+    start = time.perf_counter()
+    matcher.set_templates(names, encodings)
+    return matcher, (time.perf_counter() - start) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description="压缩人脸库的内存占用与召回率对比")
+    parser.add_argument('--templates', type=int, default=20000)
+    parser.add_argument('--templates-per-identity', type=int, default=3)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--k', type=int, default=5, help="召回率统计的top-k")
+    parser.add_argument('--modes', default='float16,int8,pq')
+    parser.add_argument('--mmap', action='store_true',
+                        help="原始特征放在内存映射文件中（与人脸库路径一致），float32模式也不常驻内存")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    names, encodings, centers = make_gallery(args.templates, args.templates_per_identity, 128, rng)
+    picks = rng.integers(0, len(centers), size=args.queries)
+    queries = centers[picks] + rng.normal(scale=0.02, size=(args.queries, 128)).astype(np.float32)
+    if args.mmap:
+        mapped = np.memmap(tempfile.TemporaryFile(), dtype=np.float32, mode='w+', shape=encodings.shape)
+        mapped[:] = encodings
+        encodings = mapped
+
+    exact, build_ms = build_matcher('float32', names, encodings)
+    start = time.perf_counter()
+    reference = exact.query(queries, k=args.k)
+    exact_ms = (time.perf_counter() - start) * 1000 / args.queries
+    usage = exact.memory_usage()
+    # index_MB为全部常驻内存，其中rerank_MB是常驻的原始特征；压缩模式把重排用的
+    # 原始特征写入内存映射的临时文件，按需分页，不常驻
+    print(f"{'mode':>8} {'index_MB':>9} {'rerank_MB':>9} {'build_ms':>9} {'query_ms':>9} "
+          f"{'recall@1':>9} {f'recall@{args.k}':>9}")
+    print(f"{'float32':>8} {usage['index_bytes'] / 2**20:>9.2f} {usage['rerank_bytes'] / 2**20:>9.2f} "
+          f"{build_ms:>9.1f} {exact_ms:>9.3f} {1.0:>9.3f} {1.0:>9.3f}")
+
+    for mode in args.modes.split(','):
+        matcher, build_ms = build_matcher(mode, names, encodings)
+        start = time.perf_counter()
+        results = matcher.query(queries, k=args.k)
+        query_ms = (time.perf_counter() - start) * 1000 / args.queries
+
+        recall_1 = np.mean([r[0][0] == ref[0][0] for r, ref in zip(results, reference)])
+        recall_k = np.mean([
+            len({n for n, _ in r} & {n for n, _ in ref}) / len(ref)
+            for r, ref in zip(results, reference)
+        ])
+        usage = matcher.memory_usage()
+        print(f"{mode:>8} {usage['index_bytes'] / 2**20:>9.2f} {usage['rerank_bytes'] / 2**20:>9.2f} "
+              f"{build_ms:>9.1f} {query_ms:>9.3f} "
+              f"{recall_1:>9.3f} {recall_k:>9.3f}")
+
+if __name__ == "__main__":
+    main()
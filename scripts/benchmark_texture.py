@@ -0,0 +1,51 @@
+import argparse
+import glob
+import os
+import time
+import cv2
+import numpy as np
+from modules.face_recognition.texture_analysis import TextureAnalyzer
+
+def load_crops(directory):
+    paths = sorted(glob.glob(os.path.join(directory, '*')))
+    crops = []
+    for path in paths:
+        image = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+        if image is not None:
+            crops.append((os.path.basename(path), image))
+    return crops
+
+def main():
+    parser = argparse.ArgumentParser(description="在保存的人脸小图上评估纹理防伪特征和耗时")
+    parser.add_argument('--live', required=True, help="真人人脸小图目录")
+    parser.add_argument('--spoof', help="照片/屏幕翻拍人脸小图目录")
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args()
+
+    analyzer = TextureAnalyzer()
+    groups = [('live', args.live)] + ([('spoof', args.spoof)] if args.spoof else [])
+    for label, directory in groups:
+        crops = load_crops(directory)
+        if not crops:
+            print(f"No images found in {directory}")
+            continue
+
+        features = []
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            features = [analyzer.analyze_crop(crop) for _, crop in crops]
+        per_crop_ms = (time.perf_counter() - start) * 1000 / (args.repeat * len(crops))
+
+        if args.verbose:
+            for (name, _), f in zip(crops, features):
+                print(f"  {label} {name}: entropy={f['lbp_entropy']:.2f} "
+                      f"hf={f['high_freq_ratio']:.3f} score={f['score']:.2f}")
+        scores = np.array([f['score'] for f in features])
+        print(f"{label}: {len(crops)} crops, {per_crop_ms:.3f}ms/crop, "
+              f"entropy={np.mean([f['lbp_entropy'] for f in features]):.2f}, "
+              f"hf={np.mean([f['high_freq_ratio'] for f in features]):.3f}, "
+              f"score mean={scores.mean():.2f} min={scores.min():.2f} max={scores.max():.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+import argparse
+import glob
+import os
+import time
+import numpy as np
+import speech_recognition as sr
+from config.config import VOICE_FRONTEND
+from modules.utils.replay import WavFileSource
+from modules.voice.voice_frontend import VoiceFrontend, WAKE
+
+def run_file(path, frontend, recognizer, pacing):
+    """回放一个WAV文件，返回 (短语数, 送去识别的短语数, 唤醒延迟列表秒, 前端CPU秒)"""
+    frontend.reset_wake()
+    phrases = forwarded = 0
+    latencies = []
+    cpu = 0.0
+    source = WavFileSource(path, pacing=pacing)
+    with source:
+        recognizer.adjust_for_ambient_noise(source, duration=0.5)
+        while source.stream.media_time < source.DURATION:
+            try:
+                audio = recognizer.listen(source, timeout=1, phrase_time_limit=5)
+            except sr.WaitTimeoutError:
+                continue
+            if not audio.frame_data:
+                break
+            phrases += 1
+            returned_at = source.stream.media_time
+            duration = len(audio.frame_data) / float(audio.sample_rate * audio.sample_width)
+            cpu_start = time.process_time()
+            start = time.perf_counter()
+            decision = frontend.process(audio, now=returned_at)
+            elapsed = time.perf_counter() - start
+            cpu += time.process_time() - cpu_start
+            if decision == WAKE:
+                forwarded += 1
+                # 说完到开始识别：分段结束的静音等待 + 本地前端处理
+                speech_end = returned_at - duration + frontend.speech_end
+                latencies.append(returned_at - speech_end + elapsed)
+    return phrases, forwarded, latencies, cpu, source.DURATION
+
+def run_set(name, directory, frontend, pacing, verbose):
+    paths = sorted(glob.glob(os.path.join(directory, '*.wav')))
+    recognizer = sr.Recognizer()
+    totals = {'files': len(paths), 'woken_files': 0, 'phrases': 0, 'forwarded': 0,
+              'cpu_s': 0.0, 'media_s': 0.0, 'latencies': []}
+    for path in paths:
+        phrases, forwarded, latencies, cpu, media = run_file(path, frontend, recognizer, pacing)
+        totals['woken_files'] += forwarded > 0
+        totals['phrases'] += phrases
+        totals['forwarded'] += forwarded
+        totals['cpu_s'] += cpu
+        totals['media_s'] += media
+        totals['latencies'] += latencies
+        if verbose:
+            print(f"  {os.path.basename(path)}: {forwarded}/{phrases} phrases sent to ASR")
+
+    print(f"{name}: {totals['files']} files, {totals['media_s']:.1f}s audio")
+    if totals['phrases']:
+        print(f"  ASR calls {totals['forwarded']}/{totals['phrases']} phrases "
+              f"({totals['forwarded'] / totals['phrases'] * 100:.1f}%, "
+              f"{totals['forwarded'] / max(totals['media_s'], 1e-6) * 60:.1f}/min; "
+              f"without frontend {totals['phrases'] / max(totals['media_s'], 1e-6) * 60:.1f}/min)")
+    if totals['files']:
+        label = 'wake detection rate' if name == 'wake' else 'false wake rate'
+        print(f"  {label} {totals['woken_files']}/{totals['files']} files")
+    print(f"  frontend CPU {totals['cpu_s']:.3f}s "
+          f"({totals['cpu_s'] / max(totals['media_s'], 1e-6) * 100:.2f}% of audio duration)")
+    if totals['latencies']:
+        latencies = np.array(totals['latencies']) * 1000
+        print(f"  wake latency (end of speech -> ASR) mean {latencies.mean():.0f}ms "
+              f"p95 {np.percentile(latencies, 95):.0f}ms max {latencies.max():.0f}ms")
+
+def main():
+    parser = argparse.ArgumentParser(description="用录制的WAV评估本地VAD/唤醒词前端：识别调用率、CPU开销和唤醒延迟")
+    parser.add_argument('--wake', help="包含唤醒词的WAV录音目录")
+    parser.add_argument('--negative', help="不含唤醒词的WAV录音目录（环境噪声、普通谈话）")
+    parser.add_argument('--vad', choices=['energy', 'webrtc'], help="覆盖VOICE_FRONTEND['vad']")
+    parser.add_argument('--spotter', choices=['snowboy', 'template', 'none'],
+                        help="覆盖VOICE_FRONTEND['spotter']")
+    parser.add_argument('--pacing', choices=['realtime', 'max'], default='max')
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args()
+    if not args.wake and not args.negative:
+        parser.error("at least one of --wake / --negative is required")
+    if args.vad:
+        VOICE_FRONTEND['vad'] = args.vad
+    if args.spotter:
+        VOICE_FRONTEND['spotter'] = args.spotter
+
+    frontend = VoiceFrontend()
+    print(f"vad={frontend.vad.name}, spotter={frontend.spotter.name}")
+    if args.wake:
+        run_set('wake', args.wake, frontend, args.pacing, args.verbose)
+    if args.negative:
+        run_set('negative', args.negative, frontend, args.pacing, args.verbose)
+
+    stats = frontend.get_stats()
+    print(f"per phrase: vad mean {stats['vad'].get('mean_ms', 0.0):.2f}ms, "
+          f"spotter mean {stats['spotter'].get('mean_ms', 0.0):.2f}ms "
+          f"p95 {stats['spotter'].get('p95_ms', 0.0):.2f}ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,18 @@
+import argparse
+import sys
+from scripts.model_manager import ModelManager
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="导出行为模型为TorchScript/ONNX，各后端的启动耗时和性能用scripts.benchmark_behavior_backends比较")
+    parser.add_argument('--format', choices=['torchscript', 'onnx'], action='append', required=True,
+                        help="导出格式，可重复指定")
+    args = parser.parse_args()
+
+    manager = ModelManager()
+    for model_format in args.format:
+        if manager.export_behavior_model(model_format) is None:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+import argparse
+import json
+import os
+import tempfile
+import wave
+import numpy as np
+from config.config import ASR_CONFIG, SPEECH_RATE
+from modules.voice.voice_frontend import load_wav
+
+DEFAULT_MANIFEST = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'asr_testset', 'manifest.jsonl')
+# 合成的录音放在源码树之外；真人录音放在清单目录下，优先使用
+DEFAULT_OUTPUT = os.path.join(tempfile.gettempdir(), 'asr_testset_tts')
+CHINESE_TAGS = ('zh', 'cmn', 'chinese', 'mandarin')
+
+def find_chinese_voice(engine):
+    """返回第一个中文语音的ID，没有时返回None"""
+    for voice in engine.getProperty('voices'):
+        languages = [l.decode('utf-8', 'ignore') if isinstance(l, bytes) else str(l)
+                     for l in (voice.languages or [])]
+        labels = ' '.join(languages + [voice.id or '', voice.name or '']).lower()
+        if any(tag in labels for tag in CHINESE_TAGS):
+            return voice.id
+    return None
+
+def save_wav(path, samples, sample_rate):
+    """float32单声道写为16位WAV"""
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767).astype(np.int16)
+    with wave.open(path, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(pcm.tobytes())
+
+def synthesize(engine, text, sample_rate):
+    """用pyttsx3合成一句话，返回float32采样"""
+    fd, temp_path = tempfile.mkstemp(suffix='.wav')
+    os.close(fd)
+    try:
+        engine.save_to_file(text, temp_path)
+        engine.runAndWait()
+        return load_wav(temp_path, sample_rate)
+    finally:
+        os.unlink(temp_path)
+
+def generate_missing(manifest, output_dir=DEFAULT_OUTPUT, voice=None, noise=0.0, padding=0.5,
+                     seed=0, overwrite=False):
+    """为清单中尚无真人录音的条目合成录音到output_dir，返回生成的文件数
+
+    未指定voice时自动选择中文语音，没有中文语音时抛出RuntimeError：用英文
+    语音朗读中文句子得到的只是噪声，评估结果没有意义。语音前后各补padding秒
+    静音，使端点检测和说完后的延迟有意义；noise为叠加的高斯白噪声幅度
+    (相对满幅)，0表示不加噪声。
+    """
+    import pyttsx3
+    base = os.path.dirname(manifest)
+    os.makedirs(output_dir, exist_ok=True)
+    rate = ASR_CONFIG['sample_rate']
+    rng = np.random.default_rng(seed)
+    engine = None
+    generated = 0
+    with open(manifest, encoding='utf-8') as f:
+        entries = [json.loads(line) for line in f if line.strip()]
+    for entry in entries:
+        path = os.path.join(output_dir, entry['audio'])
+        if os.path.exists(os.path.join(base, entry['audio'])) or (os.path.exists(path) and not overwrite):
+            continue
+        if engine is None:
+            engine = pyttsx3.init()
+            engine.setProperty('rate', SPEECH_RATE)
+            voice = voice or find_chinese_voice(engine)
+            if voice is None:
+                raise RuntimeError("No Chinese TTS voice installed (e.g. espeak-ng 'zh'); "
+                                   "record the test set or pass --voice")
+            engine.setProperty('voice', voice)
+        speech = synthesize(engine, entry['text'], rate)
+        silence = np.zeros(int(padding * rate), dtype=np.float32)
+        samples = np.concatenate([silence, speech, silence])
+        if noise > 0:
+            samples = samples + rng.normal(0.0, noise, len(samples)).astype(np.float32)
+        save_wav(path, samples, rate)
+        generated += 1
+        print(f"  {entry['audio']}: {entry['text']} ({len(samples) / rate:.1f}s)")
+    return generated
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="用本地TTS(pyttsx3，树莓派上为espeak)合成ASR测试集中缺少的录音，供scripts.benchmark_asr使用")
+    parser.add_argument('--manifest', default=DEFAULT_MANIFEST)
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help="合成录音的输出目录，不要放在源码树中")
+    parser.add_argument('--voice', help="pyttsx3语音ID，默认自动选择中文语音")
+    parser.add_argument('--noise', type=float, default=0.0, help="叠加白噪声的幅度(相对满幅)，如0.01")
+    parser.add_argument('--padding', type=float, default=0.5, help="语音前后补的静音(秒)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--overwrite', action='store_true', help="重新合成已存在的录音")
+    args = parser.parse_args()
+
+    try:
+        generated = generate_missing(args.manifest, args.output, args.voice, args.noise,
+                                     args.padding, args.seed, args.overwrite)
+    except RuntimeError as e:
+        raise SystemExit(str(e))
+    print(f"Generated {generated} recordings in {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,26 @@
+import argparse
+import os
+import sys
+from config.config import FACE_DATABASE
+from modules.face_recognition.face_gallery import FaceGallery
+
+def main():
+    parser = argparse.ArgumentParser(description="将旧版pickle人脸库迁移为内存映射人脸库")
+    parser.add_argument('--source', default=FACE_DATABASE['legacy_file'], help="旧版face_database.pkl路径")
+    parser.add_argument('--gallery', default=FACE_DATABASE['gallery_dir'], help="目标人脸库目录")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.source):
+        print(f"Source database not found: {args.source}")
+        sys.exit(1)
+
+    gallery = FaceGallery(args.gallery, FACE_DATABASE['embedding_dim'])
+    if len(gallery) > 0:
+        print(f"Gallery {args.gallery} already contains {len(gallery)} templates, skipping migration.")
+        sys.exit(0)
+
+    count = gallery.migrate_from_pickle(args.source)
+    print(f"Migrated {count} faces into {args.gallery}")
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,7 @@ import os
 import requests
 import bz2
 import shutil
+import zipfile
 import hashlib
 from tqdm import tqdm
 from config.model_config import MODEL_CONFIG, MODEL_DIRS
@@ -50,6 +51,17 @@ class ModelManager:
             self.logger.error(f"Error extracting {source_path}: {str(e)}")
             return False
             
+    def _extract_zip(self, source_path, dest_path):
+        """解压zip压缩的模型目录（如Vosk模型），压缩包内顶层目录名应与dest_path一致"""
+        try:
+            with zipfile.ZipFile(source_path) as archive:
+                archive.extractall(os.path.dirname(dest_path))
+            os.remove(source_path)
+            return os.path.isdir(dest_path)
+        except Exception as e:
+            self.logger.error(f"Error extracting {source_path}: {str(e)}")
+            return False
+            
     def download_models(self):
         """下载所有必需的模型"""
         for category, models in MODEL_CONFIG.items():
@@ -77,6 +89,8 @@ class ModelManager:
                 # 处理bz2压缩文件
                 if model_info['url'].endswith('.bz2'):
                     success = self._extract_bz2(temp_path, dest_path)
+                elif model_info['url'].endswith('.zip'):
+                    success = self._extract_zip(temp_path, dest_path)
                 else:
                     os.rename(temp_path, dest_path)
                     
@@ -94,6 +108,18 @@ class ModelManager:
                     
         return missing_models
         
+    def export_behavior_model(self, model_format):
+        """将行为模型导出为TorchScript或ONNX，启动更快、常驻内存更低"""
+        # 延迟导入，只下载模型时不需要加载torch
+        from modules.behavior.behavior_model import export_behavior_model
+        try:
+            path = export_behavior_model(model_format)
+            self.logger.info(f"Exported behavior model to {path}")
+            return path
+        except Exception as e:
+            self.logger.error(f"Error exporting behavior model to {model_format}: {str(e)}")
+            return None
+            
     def cleanup_temp_files(self):
         """清理临时文件"""
         temp_dir = 'models/temp'
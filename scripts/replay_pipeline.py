@@ -0,0 +1,232 @@
+import argparse
+import threading
+import time
+import speech_recognition as sr
+from config.config import ASR_CONFIG, AUDIO_STREAM, BEHAVIOR_DETECTION, MOTION_GATE, VOICE_FRONTEND
+from modules.utils.motion_gate import MotionGate
+from modules.utils.perf import PerfRecorder
+from modules.utils.replay import VideoFileSource, WavFileSource
+from modules.voice.asr_backends import BACKENDS as ASR_BACKENDS, create_backend
+
+def replay_video(args, perf):
+    """视频回放：逐帧经过人脸识别和行为检测"""
+    stages = args.stages
+    face_detector = behavior_detector = None
+    motion_gate = MotionGate() if MOTION_GATE['enabled'] and not args.no_motion_gate else None
+    if 'face' in stages:
+        from modules.face_recognition.face_detector import FaceDetector
+        face_detector = FaceDetector(motion_gate)
+    if 'behavior' in stages:
+        from modules.behavior.behavior_detector import BehaviorDetector
+        if args.behavior_interval is not None:
+            BEHAVIOR_DETECTION['detection_interval'] = args.behavior_interval
+        if args.person_detector is not None:
+            BEHAVIOR_DETECTION['person_detector'] = None if args.person_detector == 'none' else args.person_detector
+        behavior_detector = BehaviorDetector(motion_gate=motion_gate)
+
+    source = VideoFileSource(args.video, pacing=args.pacing)
+    start = time.perf_counter()
+    frames = 0
+    try:
+        while True:
+            with perf.stage('video_source'):
+                frame = source.read_frame()
+            if frame is None:
+                break
+            frames += 1
+            with perf.stage('frame_total'):
+                if face_detector is not None:
+                    with perf.stage('face'):
+                        face_detector.detect_and_identify_faces(frame, frames)
+                if behavior_detector is not None and args.behavior_async:
+                    # 异步模式只统计提交耗时，推理统计见get_stats
+                    with perf.stage('behavior_submit'):
+                        behavior_detector.submit_frame(frame, frames)
+                elif behavior_detector is not None:
+                    ran_before = behavior_detector.last_detection_time
+                    t0 = time.perf_counter()
+                    behavior_detector.detect_behavior(frame, frames)
+                    # 只统计真正执行了推理的调用
+                    if behavior_detector.last_detection_time != ran_before:
+                        perf.record('behavior', t0, time.perf_counter())
+    finally:
+        source.release()
+        if behavior_detector is not None:
+            if args.behavior_async:
+                print(f"behavior worker: {behavior_detector.get_stats()}")
+            behavior_detector.cleanup()
+
+    wall = time.perf_counter() - start
+    media = frames / source.fps
+    print(f"video: {frames} frames, media {media:.1f}s, wall {wall:.1f}s, "
+          f"realtime factor {media / wall if wall > 0 else 0:.2f}x")
+    if face_detector is not None and face_detector.get_cache_stats():
+        print(f"face embedding cache: {face_detector.get_cache_stats()}")
+    if motion_gate is not None:
+        gate = motion_gate.get_stats()
+        print(f"motion gate: {gate['motion_frames']}/{gate['frames']} motion frames, "
+              f"{gate['gate_mean_ms']:.2f}ms/frame")
+        for name, s in gate['stages'].items():
+            print(f"  {name}: ran {s['runs']}/{s['checks']} (duty {s['duty_cycle']:.2f}), "
+                  f"{s['triggers']} motion triggers, saved ~{s['cpu_saved_s']:.1f}s CPU, "
+                  f"wake latency mean {s['wake_latency_mean_ms']:.1f}ms max {s['wake_latency_max_ms']:.1f}ms")
+
+def replay_audio(args, perf):
+    """音频回放：语音分段 -> 本地VAD/唤醒词 -> 识别 -> 命令解析"""
+    from modules.voice.speech_recognizer import parse_command
+    from modules.voice.voice_frontend import VoiceFrontend, WAKE
+    frontend = VoiceFrontend() if VOICE_FRONTEND['enabled'] and not args.no_voice_frontend else None
+    recognizer = sr.Recognizer()
+    asr = create_backend(args.asr, recognizer) if args.asr != 'none' else None
+    if asr is not None and asr.name != args.asr:
+        # 回退到其他后端会让延迟和调用次数对比失去意义
+        raise SystemExit(f"ASR backend '{args.asr}' is unavailable (would fall back to '{asr.name}'); "
+                         f"install it or pass --asr {asr.name}")
+    if asr is not None and asr.streaming:
+        replay_audio_streaming(args, perf, recognizer, asr, frontend)
+        return
+    source = WavFileSource(args.wav, pacing=args.pacing)
+    segments = commands = 0
+    start = time.perf_counter()
+    with source:
+        recognizer.adjust_for_ambient_noise(source, duration=0.5)
+        while source.stream.media_time < source.DURATION:
+            try:
+                with perf.stage('speech_listen'):
+                    audio = recognizer.listen(source, timeout=1, phrase_time_limit=5)
+            except sr.WaitTimeoutError:
+                continue
+            if not audio.frame_data:
+                break
+            segments += 1
+            if frontend is not None:
+                with perf.stage('speech_frontend'):
+                    decision = frontend.process(audio, now=source.stream.media_time)
+                if decision != WAKE:
+                    continue
+            if asr is None:
+                continue
+            try:
+                with perf.stage('speech_asr'):
+                    text = asr.transcribe(audio)
+            except sr.UnknownValueError:
+                continue
+            except sr.RequestError as e:
+                print(f"ASR request failed: {e}")
+                continue
+            with perf.stage('speech_command'):
+                command = parse_command(text, frontend is None or not frontend.verifies_wake)
+            if command:
+                commands += 1
+            if args.verbose:
+                print(f"  [{source.stream.media_time:7.2f}s] {text} -> {command}")
+
+    wall = time.perf_counter() - start
+    print(f"audio: {segments} segments, {commands} commands, media {source.DURATION:.1f}s, "
+          f"wall {wall:.1f}s, realtime factor {source.DURATION / wall if wall > 0 else 0:.2f}x")
+    if frontend is not None:
+        stats = frontend.get_stats()
+        print(f"voice frontend: {stats['forwarded']}/{stats['phrases']} phrases sent to ASR "
+              f"({stats['dropped_noise']} noise, {stats['dropped_no_wake']} without wake word)")
+
+def replay_audio_streaming(args, perf, recognizer, asr, frontend):
+    """流式后端的音频回放：WAV按回放节奏写入环形缓冲区，与运行时一样经过
+    speech_recognizer.recognize_streaming（本地前端门控 -> 流式识别 -> 部分结果出命令）"""
+    from modules.voice.audio_stream import AudioRingBuffer, RingSource
+    from modules.voice.speech_recognizer import parse_command, recognize_streaming
+    wav = WavFileSource(args.wav, pacing=args.pacing)
+    wav.__enter__()
+    ring = AudioRingBuffer(AUDIO_STREAM['buffer_seconds'], wav.SAMPLE_RATE, wav.SAMPLE_WIDTH)
+
+    def feed():
+        # 代替麦克风采集线程
+        try:
+            while True:
+                data = wav.stream.read(wav.CHUNK)
+                if not data:
+                    break
+                ring.write(data)
+        finally:
+            ring.close()
+            wav.__exit__(None, None, None)
+
+    feeder = threading.Thread(target=feed, daemon=True)
+    start = time.perf_counter()
+    feeder.start()
+    source = RingSource(ring, 0, wav.CHUNK, wav.SAMPLE_RATE, wav.SAMPLE_WIDTH)
+    recognizer.adjust_for_ambient_noise(source, duration=0.5)
+    require_wake_word = frontend is None or not frontend.verifies_wake
+    decodes = commands = 0
+    while not (ring.closed and source.stream.position >= ring.written):
+        try:
+            with perf.stage('speech_asr'):
+                text = recognize_streaming(source, asr, recognizer.energy_threshold, frontend,
+                                           require_wake_word=require_wake_word)
+        except sr.UnknownValueError:
+            decodes += 1
+            continue
+        except sr.RequestError as e:
+            print(f"ASR request failed: {e}")
+            continue
+        if text is None:
+            continue
+        decodes += 1
+        with perf.stage('speech_command'):
+            command = parse_command(text, require_wake_word)
+        if command:
+            commands += 1
+        if args.verbose:
+            print(f"  [{source.stream.media_time:7.2f}s] {text} -> {command}")
+    feeder.join()
+
+    wall = time.perf_counter() - start
+    print(f"audio ({asr.name} streaming): {decodes} decodes, {commands} commands, media {wav.DURATION:.1f}s, "
+          f"wall {wall:.1f}s, realtime factor {wav.DURATION / wall if wall > 0 else 0:.2f}x")
+    if frontend is not None:
+        stats = frontend.get_stats()
+        print(f"voice frontend: {stats['forwarded']}/{stats['phrases']} phrases sent to ASR "
+              f"({stats['dropped_noise']} noise, {stats['dropped_no_wake']} without wake word)")
+
+def main():
+    parser = argparse.ArgumentParser(description="用录制的视频/音频文件回放感知流水线并统计各阶段帧率和延迟，无需摄像头、麦克风和GPIO")
+    parser.add_argument('--video', help="MP4/MJPEG等录像文件")
+    parser.add_argument('--wav', help="WAV录音文件")
+    parser.add_argument('--pacing', choices=['realtime', 'max'], default='realtime',
+                        help="realtime按原始速度回放，max尽可能快")
+    parser.add_argument('--stages', default='face,behavior',
+                        help="视频经过的处理阶段，逗号分隔: face,behavior")
+    parser.add_argument('--behavior-interval', type=float,
+                        help="覆盖行为检测间隔(秒)，max回放时可设为0")
+    parser.add_argument('--person-detector', choices=['none', 'hog', 'ssd'],
+                        help="覆盖行为检测的人员检测方式，none为整帧分类")
+    parser.add_argument('--behavior-async', action='store_true',
+                        help="行为检测走后台推理线程（submit_frame），与实际运行方式一致")
+    parser.add_argument('--no-motion-gate', action='store_true',
+                        help="关闭运动门控，用于对比节省的CPU")
+    parser.add_argument('--no-voice-frontend', action='store_true',
+                        help="关闭本地VAD和唤醒词检测，所有语音分段都送去识别")
+    parser.add_argument('--asr', choices=list(ASR_BACKENDS) + ['none'], default=ASR_CONFIG['backend'],
+                        help="语音识别后端，none只统计语音分段")
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args()
+    args.stages = set(s.strip() for s in args.stages.split(',') if s.strip())
+    if not args.video and not args.wav:
+        parser.error("at least one of --video / --wav is required")
+
+    perf = PerfRecorder()
+    # 音视频并行回放，与实际运行时的线程竞争一致
+    threads = []
+    if args.wav:
+        threads.append(threading.Thread(target=replay_audio, args=(args, perf)))
+    if args.video:
+        threads.append(threading.Thread(target=replay_video, args=(args, perf)))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    print()
+    print(perf.format_report())
+
+if __name__ == "__main__":
+    main()
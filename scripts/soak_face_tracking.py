@@ -0,0 +1,105 @@
+import argparse
+import sys
+import tracemalloc
+from config.config import FACE_TRACKING
+from modules.face_recognition.face_detector import FaceDetector
+from modules.utils.replay import VideoFileSource
+
+def per_track_sizes(detector):
+    """FaceDetector中所有按轨迹保存的状态的大小"""
+    sizes = {
+        'tracker': len(detector.tracker.tracks) if detector.tracker is not None else 0,
+        'quality': len(detector.quality_assessor.track_cache),
+        'liveness': len(detector.liveness_detector.sessions),
+        'confirm': len(detector.track_states)
+    }
+    if detector.embedding_cache is not None:
+        sizes['embedding'] = len(detector.embedding_cache.entries)
+    return sizes
+
+def check_bounds(detector, track_ids, sizes):
+    """返回违反上限的状态描述列表"""
+    errors = []
+    active = set(track_ids)
+    # 每帧retain之后，这些状态只能包含当前画面中的轨迹
+    maps = {
+        'quality': detector.quality_assessor.track_cache,
+        'liveness': detector.liveness_detector.sessions
+    }
+    if detector.embedding_cache is not None:
+        maps['embedding'] = detector.embedding_cache.entries
+    for name, entries in maps.items():
+        if None in entries:
+            errors.append(f"{name} holds a shared entry for track None")
+        if detector.tracker is not None:
+            stale = set(entries) - active
+            if stale:
+                errors.append(f"{name} keeps {len(stale)} tracks no longer in frame")
+    if sizes['confirm'] > FACE_TRACKING['max_tracks']:
+        errors.append(f"confirm states {sizes['confirm']} exceed max_tracks {FACE_TRACKING['max_tracks']}")
+    return errors
+
+def main():
+    parser = argparse.ArgumentParser(description="循环回放录像长时间驱动人脸识别流水线，检查各轨迹状态和内存是否有界")
+    parser.add_argument('--video', required=True, help="包含多人进出画面的录像文件")
+    parser.add_argument('--loops', type=int, default=20, help="录像循环回放的次数")
+    parser.add_argument('--report-every', type=int, default=500, help="每隔多少帧采样一次内存")
+    parser.add_argument('--tolerance', type=float, default=64, help="后段相对前段允许的内存峰值增长(KiB)")
+    args = parser.parse_args()
+
+    detector = FaceDetector()
+    source = VideoFileSource(args.video, pacing='max')
+    tracemalloc.start()
+    samples = []
+    peaks = {}
+    max_faces = 0
+    frames = loops = 0
+    try:
+        while loops < args.loops:
+            frame = source.read_frame()
+            if frame is None:
+                # 重新打开录像，轨迹ID继续递增
+                source.release()
+                source = VideoFileSource(args.video, pacing='max')
+                loops += 1
+                continue
+            frames += 1
+            detector.detect_and_identify_faces(frame, frames)
+            track_ids = [t.track_id for t in detector.tracker.tracks] if detector.tracker is not None else []
+            max_faces = max(max_faces, len(track_ids))
+
+            sizes = per_track_sizes(detector)
+            for name, size in sizes.items():
+                peaks[name] = max(peaks.get(name, 0), size)
+            errors = check_bounds(detector, track_ids, sizes)
+            if errors:
+                print(f"FAIL at frame {frames}: " + "; ".join(errors))
+                sys.exit(1)
+
+            if frames % args.report_every == 0:
+                current, _ = tracemalloc.get_traced_memory()
+                samples.append(current)
+                print(f"frame {frames:>7} loop {loops:>3}: " +
+                      " ".join(f"{name}={size}" for name, size in sizes.items()) +
+                      f" traced={current / 1024:.1f}KiB")
+    finally:
+        source.release()
+        tracemalloc.stop()
+
+    print(f"{frames} frames, at most {max_faces} faces per frame, peak sizes: {peaks}")
+    if len(samples) < 3:
+        print("Not enough samples for a memory trend; use a longer video or more --loops")
+        return
+    # 跳过第一段预热，比较前后两段的内存峰值
+    third = max(1, len(samples) // 3)
+    early_peak = max(samples[1:1 + third] or samples)
+    late_peak = max(samples[-third:])
+    growth_kib = (late_peak - early_peak) / 1024
+    print(f"early peak {early_peak / 1024:.1f}KiB, late peak {late_peak / 1024:.1f}KiB ({growth_kib:+.1f}KiB)")
+    if growth_kib > args.tolerance:
+        print("FAIL: face tracking state memory keeps growing")
+        sys.exit(1)
+    print("PASS: per-track state is bounded and memory is flat")
+
+if __name__ == "__main__":
+    main()